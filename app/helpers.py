@@ -1,8 +1,9 @@
 """Contains helper functions for the API"""
 
-from typing import Tuple
+from typing import List, Tuple
+from urllib.parse import urlencode
 
-from cleanbay.torrent import Category
+from cleanbay.torrent import Category, Torrent
 
 from app.schemas import SearchIn, CATEGORY_MAP
 
@@ -25,3 +26,99 @@ def parse_search_query(sq: SearchIn) -> Tuple:
     e_sites = sq.exclude_sites
 
     return (s_term, i_cats, e_cats, i_sites, e_sites)
+
+
+def normalize_term(search_term: str) -> str:
+    """Lowercases the search term and collapses its whitespace."""
+    return " ".join(search_term.lower().split())
+
+
+def canonical_query(sq: SearchIn) -> str:
+    """Builds the canonical query string for a GET search.
+
+    Parameters come in a fixed order, lists are expected to be sorted and empty
+    or default values are left out.
+
+    """
+    params = [("search_term", sq.search_term)]
+    for name in [
+        "include_categories",
+        "exclude_categories",
+        "include_sites",
+        "exclude_sites",
+    ]:
+        params.extend((name, value) for value in getattr(sq, name))
+    if sq.compact:
+        params.append(("compact", "true"))
+    if sq.mode != "live":
+        params.append(("mode", sq.mode))
+    if sq.quorum is not None:
+        params.append(("quorum", sq.quorum))
+    if sq.deadline is not None:
+        params.append(("deadline", canonical_number(sq.deadline)))
+    if sq.depth != 1:
+        params.append(("depth", sq.depth))
+    if sq.debug:
+        params.append(("debug", "true"))
+
+    return urlencode(params)
+
+
+def canonical_number(value: float) -> str:
+    """Writes a number the shortest way, eg. 2 rather than 2.0."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def listing_rows(listings: List[Torrent]) -> List[dict]:
+    """Turns the listings into dicts matching `TorrentOut`, skipping pydantic."""
+    return [
+        {
+            "name": torrent.name,
+            "magnet": torrent.magnet,
+            "seeders": torrent.seeders,
+            "leechers": torrent.leechers,
+            "size": torrent.size,
+            "uploader": torrent.uploader,
+            "uploaded_at": torrent.uploaded_at,
+        }
+        for torrent in listings
+    ]
+
+
+def compact_listings(listings: List[Torrent]) -> Tuple[List, List]:
+    """Splits the listings into a tracker table and rows that index into it.
+
+    Returns:
+      A tuple of the form (trackers, rows). `trackers` is a list of tracker URL
+      lists and `rows` a list of dicts matching `CompactTorrentOut`.
+
+    """
+    tracker_ids = {}
+    trackers = []
+    rows = []
+    for torrent in listings:
+        row = {
+            "name": torrent.name,
+            "seeders": torrent.seeders,
+            "leechers": torrent.leechers,
+            "size": torrent.size,
+            "uploader": torrent.uploader,
+            "uploaded_at": torrent.uploaded_at,
+        }
+
+        if torrent.trackers is None:
+            row["link"] = torrent.link
+        else:
+            # by their URLs: listings parsed in worker processes each come
+            # back with a TrackerSet of their own
+            urls = torrent.trackers.urls
+            tracker_id = tracker_ids.get(urls)
+            if tracker_id is None:
+                tracker_id = tracker_ids[urls] = len(trackers)
+                trackers.append(list(urls))
+            row["info_hash"] = torrent.link
+            row["trackers"] = tracker_id
+
+        rows.append(row)
+
+    return trackers, rows
@@ -1,10 +1,21 @@
 """Serves the API that enables searching the backend"""
 
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from itertools import chain
-from datetime import datetime
+from secrets import compare_digest
+from time import perf_counter
+from datetime import datetime, timedelta
+from typing import List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.middleware.cors import CORSMiddleware
 
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -13,18 +24,143 @@ from slowapi.errors import RateLimitExceeded
 
 from cleanbay.backend import Backend, InvalidSearchError
 from cleanbay.plugins_manager import NoPluginsError, PluginsManager
-from cleanbay.cache_manager import LFUCache
+from cleanbay.cache_manager import LFUCache, DerivationPolicy
+from cleanbay.torrent_index import TorrentIndex
+from cleanbay.suggest_index import SuggestIndex
+from cleanbay.admission import AdmissionController, OverloadedError
+from cleanbay.timings import Timings, current as current_timings, phase
 
 from app.settings import settings
-from app.schemas import SearchIn, SearchOut, SearchError, StatusOut
-from app.helpers import parse_search_query
+from app.profiler import Profiler
+from app.schemas import (
+    CATEGORY_MAP,
+    SearchIn,
+    SearchOut,
+    SearchCompactOut,
+    SearchError,
+    StatusOut,
+    SuggestOut,
+    BatchSearchIn,
+    BatchSearchOut,
+    ProfilerIn,
+    ProfilerOut,
+)
+from app.helpers import (
+    parse_search_query,
+    listing_rows,
+    compact_listings,
+    normalize_term,
+    canonical_query,
+)
+from app.responses import (
+    MIN_COMPRESS_SIZE,
+    FastJSONResponse,
+    encode_body,
+    encode_json,
+    encoded_response,
+    etag_matches,
+    finish_json,
+    make_etag,
+    negotiate_encoding,
+    not_modified,
+    open_json,
+    precompress,
+)
+
+OVERLOADED_MSG = "The server is overloaded, please try again later."
+BATCH_UNSUPPORTED_MSG = "Quorum, deadline and debug can't be used in a batch."
+
+logger = logging.getLogger(__name__)
 
 # initialize tha app and the backend
-cache_manager = LFUCache(settings.cache_size, settings.cache_timeout)
-plugins_manager = PluginsManager(settings.plugins_directory)
-backend = Backend(settings.session_timeout, cache_manager, plugins_manager)
+derivation = DerivationPolicy(
+    settings.derive_enabled,
+    settings.derive_max_extra_tokens,
+    settings.derive_min_results,
+)
+cache_manager = LFUCache(
+    settings.cache_size,
+    settings.cache_timeout,
+    derivation,
+    {
+        CATEGORY_MAP[category]: timeout
+        for category, timeout in settings.cache_category_timeouts.items()
+    },
+    columnar=settings.cache_columnar,
+)
+# the plugins are probed on startup, or before forking (see gunicorn.conf.py)
+plugins_manager = PluginsManager(settings.plugins_directory, probe=False)
+limiter_options = None
+if settings.limiter_enabled:
+    limiter_options = {
+        "initial_limit": settings.limiter_initial,
+        "max_limit": settings.limiter_max,
+        "max_queue": settings.limiter_queue,
+        "latency_target": settings.limiter_latency_target,
+    }
+admission = None
+if settings.admission_enabled:
+    admission = AdmissionController(
+        settings.admission_max_lag,
+        settings.admission_max_fan_outs,
+        settings.admission_retry_after,
+        settings.admission_stale_at,
+    )
+refresh_options = None
+if settings.refresh_enabled:
+    refresh_options = {
+        "top_k": settings.refresh_top_k,
+        "lead_time": settings.refresh_lead_time,
+        "budget": settings.refresh_budget,
+        "interval": settings.refresh_interval,
+    }
+fetch_options = {
+    "retries": settings.fetch_retries,
+    "backoff": settings.fetch_backoff,
+    "parse_workers": settings.parse_workers,
+    "response_cache_size": settings.response_cache_size,
+    "hedge_percentile": settings.hedge_percentile,
+}
+torrent_index = None
+if settings.index_path:
+    torrent_index = TorrentIndex(settings.index_path, settings.index_max_size)
+backend = Backend(
+    settings.session_timeout,
+    cache_manager,
+    plugins_manager,
+    torrent_index,
+    settings.index_limit,
+    SuggestIndex(settings.suggest_size),
+    limiter_options,
+    admission,
+    refresh_options,
+    fetch_options,
+)
+
+
+profiler = Profiler(settings.profile_sample_rate, settings.profile_interval)
+
+search_seconds = backend.metrics.histogram(
+    "cleanbay_search_seconds", "Time taken to resolve searches.", "cache"
+)
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(fastapi_app: FastAPI):  # pylint: disable=unused-argument
+    """Probes the plugins, runs the refresher and stops the parse workers"""
+    if settings.probe_plugins and not plugins_manager.probed:
+        await asyncio.to_thread(plugins_manager.probe)
+
+    task = None
+    if backend.refresher is not None:
+        task = asyncio.create_task(backend.refresher.run())
+    yield
+    if task is not None:
+        task.cancel()
+    backend.fetcher.close()
+
+
+app = FastAPI(lifespan=lifespan)
 limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -42,7 +178,9 @@ app.add_middleware(
 def http_exception_handler(
     req: Request, exc: HTTPException  # pylint: disable=unused-argument
 ) -> JSONResponse:
-    return JSONResponse({"status": "error", "msg": exc.detail}, exc.status_code)
+    return JSONResponse(
+        {"status": "error", "msg": exc.detail}, exc.status_code, exc.headers
+    )
 
 
 # routes
@@ -55,48 +193,460 @@ def status(request: Request, response: Response):  # pylint: disable=unused-argu
     plugins, is_ok = backend.state()
     status_word = "ok" if is_ok else "not ok"
 
-    return StatusOut(status=status_word, plugins=list(plugins))
+    return FastJSONResponse({"status": status_word, "plugins": list(plugins)})
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(x_admin_token: str = Header("")):
+    """Returns the metrics of the search pipeline in the Prometheus text format"""
+    # async so that the counters aren't rendered in a thread while the searches
+    # on the event loop add to them
+    if not settings.metrics_public:
+        check_admin(x_admin_token)
+    return PlainTextResponse(
+        backend.metrics.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/api/v1/suggest", response_model=SuggestOut)
+@limiter.limit(settings.suggest_rate_limit)
+async def suggest(
+    request: Request,
+    response: Response,
+    q: str,
+    limit: int = Query(10, ge=1, le=50),
+):  # pylint: disable=unused-argument
+    """Returns the most popular searches and torrent names starting with `q`"""
+    # async so that it runs on the event loop, between the searches that add to
+    # the index, rather than in a thread while they do
+    suggestions = backend.suggestions.complete(q, limit)
+    return FastJSONResponse({"status": "ok", "suggestions": suggestions})
 
 
 @app.post(
     "/api/v1/search",
-    response_model=SearchOut,
-    responses={422: {"model": SearchError}},
+    response_model=Union[SearchOut, SearchCompactOut],
+    responses={422: {"model": SearchError}, 503: {"model": SearchError}},
 )
 @limiter.limit(settings.rate_limit)
 async def search(
     request: Request, response: Response, sq: SearchIn
 ):  # pylint: disable=unused-argument
     """Searches the relevant plugins for torrents"""
-    is_valid, msg = validate(sq)
+    return await profiled(request, run_search(request, response, sq))
+
+
+@app.get(
+    "/api/v1/search",
+    response_model=Union[SearchOut, SearchCompactOut],
+    responses={422: {"model": SearchError}, 503: {"model": SearchError}},
+)
+@limiter.limit(settings.rate_limit)
+async def search_get(
+    request: Request,
+    response: Response,
+    search_term: str,
+    include_categories: List[str] = Query([]),
+    exclude_categories: List[str] = Query([]),
+    include_sites: List[str] = Query([]),
+    exclude_sites: List[str] = Query([]),
+    compact: bool = False,
+    mode: str = "live",
+    quorum: Optional[int] = None,
+    deadline: Optional[float] = None,
+    depth: int = 1,
+    debug: bool = False,
+):  # pylint: disable=too-many-arguments
+    """Searches the relevant plugins for torrents, cacheable by CDNs and proxies
+
+    Requests whose query string isn't in canonical form are redirected to it, so
+    that caches in front of the app see a single URL per search.
+
+    """
+    sq = SearchIn(
+        search_term=normalize_term(search_term),
+        include_categories=sorted(set(include_categories)),
+        exclude_categories=sorted(set(exclude_categories)),
+        include_sites=sorted(set(include_sites)),
+        exclude_sites=sorted(set(exclude_sites)),
+        compact=compact,
+        mode=mode,
+        quorum=quorum,
+        deadline=deadline,
+        depth=depth,
+        debug=debug,
+    )
+
+    query = canonical_query(sq)
+    if request.url.query != query:
+        return RedirectResponse(f"{request.url.path}?{query}", status_code=301)
+
+    return await profiled(request, run_search(request, response, sq, cacheable=True))
+
+
+async def profiled(request: Request, handler):
+    """Awaits the handler, under the profiler if this request is to be profiled.
+
+    Requests are picked at the profiler's sample rate, or by an `X-Profile`
+    header holding the admin token.
+
+    """
+    marker = request.headers.get("x-profile")
+    if not (profiler.sampled() if marker is None else is_admin(marker)):
+        return await handler
+
+    with profiler.profiling():
+        return await handler
+
+
+async def run_search(
+    request: Request, response: Response, sq: SearchIn, cacheable: bool = False
+) -> Response:
+    """Validates the search, runs it on the backend and renders the response.
+
+    Arguments:
+      cacheable (bool): Add `Cache-Control` headers for shared caches, based on
+        how long the cache entry has left to live.
+
+    """
+    # each request is handled in a task of its own, so this doesn't leak into
+    # other requests
+    timings = Timings()
+    current_timings.set(timings)
+    start = perf_counter()
+
+    with phase("validate"):
+        is_valid, msg = validate(sq)
     if not is_valid:
         response.status_code = 422
         raise HTTPException(status_code=422, detail=msg)
 
     s_term, i_cats, e_cats, i_sites, e_sites = parse_search_query(sq)
 
+    # a client whose copy is still current needn't wait for the search
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and not sq.debug and sq.mode == "live":
+        entry = backend.cached_entry(s_term, i_cats, e_cats, i_sites, e_sites, sq.depth)
+        if entry is not None:
+            etag = make_etag(entry, response_variant(sq))
+            if etag_matches(if_none_match, etag):
+                resp = not_modified(etag)
+                if cacheable:
+                    resp.headers["Cache-Control"] = cache_control(entry)
+                return resp
+
     start_time = datetime.now()
     try:
-        listings, cache_hit = await backend.search(
+        listings, cache_hit, entry = await backend.search(
             search_term=s_term,
             include_categories=i_cats,
             exclude_categories=e_cats,
             include_sites=i_sites,
             exclude_sites=e_sites,
+            mode=sq.mode,
+            quorum=sq.quorum,
+            deadline=sq.deadline,
+            depth=sq.depth,
         )
     except NoPluginsError as exc:
         raise HTTPException(status_code=500, detail="No searchable plugins.") from exc
     except InvalidSearchError as exc:
         response.status_code = 400
         raise HTTPException(status_code=422, detail="Invalid search.") from exc
+    except OverloadedError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=OVERLOADED_MSG,
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
     elapsed = datetime.now() - start_time
+    search_seconds.labels("hit" if cache_hit else "miss").observe(
+        elapsed.total_seconds()
+    )
+
+    with phase("render"):
+        if sq.debug:
+            # timings differ every time: no ETag, and no reusing rendered bytes
+            resp = render_search(
+                request, sq, listings, cache_hit, None, elapsed, timings
+            )
+        else:
+            resp = render_search(request, sq, listings, cache_hit, entry, elapsed)
+
+    if sq.debug:
+        # the timings are this request's own, for no one else to reuse
+        resp.headers["Cache-Control"] = "no-store"
+    elif cacheable:
+        resp.headers["Cache-Control"] = cache_control(entry)
+    if settings.server_timing:
+        timings.add("total", perf_counter() - start)
+        resp.headers["Server-Timing"] = timings.header()
+    return resp
 
-    return SearchOut(
-        status="ok", data=listings, cache_hit=cache_hit, elapsed=elapsed.total_seconds()
+
+def render_search(
+    request: Request,
+    sq: SearchIn,
+    listings: list,
+    cache_hit: bool,
+    entry: dict,
+    elapsed: timedelta,
+    timings: Timings = None,
+) -> Response:  # pylint: disable=too-many-arguments
+    """Renders the search response, honouring If-None-Match and Accept-Encoding
+
+    Arguments:
+      timings (Timings): Phases of the search so far, to add to the response.
+
+    """
+    variant = response_variant(sq)
+    etag = make_etag(entry, variant) if entry is not None else None
+    if etag is not None and etag_matches(
+        request.headers.get("if-none-match", ""), etag
+    ):
+        return not_modified(etag)
+
+    accept_encoding = request.headers.get("accept-encoding", "")
+    fields = request_content(cache_hit, elapsed, timings)
+    if not cache_hit or entry is None:
+        body = encode_json({**listings_content(sq, listings), **fields})
+        encoding = negotiate_encoding(accept_encoding)
+        return encoded_response(*encode_body(body, encoding), etag)
+
+    # on a hit, the listings are serialized and compressed once per variant and
+    # encoding, on the first hit, and dropped along with the entry. Only the
+    # fields that differ from one request to the next are added every time.
+    encoding, head = cached_head(
+        entry, sq, listings, negotiate_encoding(accept_encoding, finishable=True)
     )
+    return encoded_response(finish_json(head, fields, encoding), encoding, etag)
+
+
+def cached_head(entry: dict, sq: SearchIn, listings: list, encoding: str) -> tuple:
+    """Returns the listings part of a response, precompressed and kept on the entry.
+
+    Returns:
+      A tuple of the form (encoding, head), `head` being what `precompress()`
+      returned. The encoding is "identity" if the listings are too short to be
+      worth compressing.
+
+    """
+    variant, encoded = response_variant(sq), entry["encoded"]
+    if (variant, encoding) not in encoded:
+        # every encoding is compressed from the same serialized listings
+        if (variant, "identity") not in encoded:
+            body = open_json(listings_content(sq, listings))
+            encoded[(variant, "identity")] = ("identity", precompress(body, "identity"))
+        body = encoded[(variant, "identity")][1][0]
+        used = encoding if len(body) >= MIN_COMPRESS_SIZE else "identity"
+        encoded[(variant, encoding)] = (used, precompress(body, used))
+
+    return encoded[(variant, encoding)]
+
+
+def response_variant(sq: SearchIn) -> str:
+    return "compact" if sq.compact else "full"
+
+
+def search_content(
+    sq: SearchIn, listings: list, cache_hit: bool, elapsed: timedelta
+) -> dict:
+    """Builds the body of a search response as plain python objects.
+
+    The listings come from our own plugins, so the response is written straight
+    to JSON instead of being validated into `SearchOut` again.
+
+    """
+    return {
+        **listings_content(sq, listings),
+        **request_content(cache_hit, elapsed),
+    }
+
+
+def listings_content(sq: SearchIn, listings: list) -> dict:
+    """Builds the part of a search response that only depends on the listings."""
+    content = {"status": "ok"}
+    if sq.compact:
+        content["trackers"], content["data"] = compact_listings(listings)
+    else:
+        content["data"] = listing_rows(listings)
+    content["length"] = len(content["data"])
+
+    return content
+
+
+def request_content(
+    cache_hit: bool, elapsed: timedelta, timings: Timings = None
+) -> dict:
+    """Builds the part of a search response that differs with every request."""
+    content = {"cache_hit": cache_hit, "elapsed": elapsed.total_seconds()}
+    if timings is not None:
+        content["timings"] = timings.milliseconds()
+    return content
+
+
+def cache_control(entry: dict) -> str:
+    if entry is None:
+        return "public, max-age=0"
+
+    max_age = int(backend.cache.ttl_remaining(entry))
+    swr = settings.stale_while_revalidate
+    return f"public, max-age={max_age}, stale-while-revalidate={swr}"
+
+
+def counted_batch(request: Request, bq: BatchSearchIn) -> BatchSearchIn:
+    """Notes the size of a batch, for the rate limit to charge it per search."""
+    request.state.batch_size = len(bq.searches)
+    return bq
+
+
+def batch_cost(request: Request) -> int:
+    return max(getattr(request.state, "batch_size", 1), 1)
+
+
+@app.post("/api/v1/search/batch", response_model=BatchSearchOut)
+@limiter.limit(settings.rate_limit, cost=batch_cost)
+async def search_batch(
+    request: Request, response: Response, bq: BatchSearchIn = Depends(counted_batch)
+):  # pylint: disable=unused-argument
+    """Runs many searches in one request
+
+    Cached searches are answered straight away and identical searches are only
+    fetched once. Results are keyed by the position of their search in the
+    request. With `stream`, they are sent as newline-delimited JSON objects (each
+    with an `index` field) as soon as each one is resolved.
+
+    Each search counts against the rate limit as a request of its own.
+
+    """
+    if len(bq.searches) > settings.batch_max_size:
+        raise HTTPException(
+            status_code=422,
+            detail=f"No more than {settings.batch_max_size} searches per batch.",
+        )
+
+    results = resolve_batch(bq.searches)
+    if bq.stream:
+        return StreamingResponse(
+            (
+                FastJSONResponse({"index": i, **content}).body + b"\n"
+                async for i, content in results
+            ),
+            media_type="application/x-ndjson",
+        )
+
+    contents = {str(i): content async for i, content in results}
+    ordered = {str(i): contents[str(i)] for i in range(len(bq.searches))}
+    return FastJSONResponse({"status": "ok", "results": ordered})
+
+
+async def resolve_batch(searches: list):
+    """Resolves a batch of searches, yielding (index, content) as they finish"""
+    start_time = datetime.now()
+
+    valid = []
+    for i, sq in enumerate(searches):
+        # searches answered early or timed aren't merged with the others
+        if sq.quorum is not None or sq.deadline is not None or sq.debug:
+            yield i, {"status": "error", "msg": BATCH_UNSUPPORTED_MSG}
+            continue
+
+        is_valid, msg = validate(sq)
+        if not is_valid:
+            yield i, {"status": "error", "msg": msg}
+            continue
+
+        s_term, i_cats, e_cats, i_sites, e_sites = parse_search_query(sq)
+        valid.append(
+            (
+                i,
+                {
+                    "search_term": s_term,
+                    "include_categories": i_cats,
+                    "exclude_categories": e_cats,
+                    "include_sites": i_sites,
+                    "exclude_sites": e_sites,
+                    "mode": sq.mode,
+                    "depth": sq.depth,
+                },
+            )
+        )
+
+    resolved = backend.search_many(
+        [kwargs for _, kwargs in valid], settings.batch_concurrency
+    )
+    async for j, result in resolved:
+        i = valid[j][0]
+        if isinstance(result, NoPluginsError):
+            yield i, {"status": "error", "msg": "No searchable plugins."}
+        elif isinstance(result, OverloadedError):
+            yield i, {"status": "error", "msg": OVERLOADED_MSG}
+        elif isinstance(result, InvalidSearchError):
+            yield i, {"status": "error", "msg": "Invalid search."}
+        elif isinstance(result, Exception):
+            logger.error("batched search failed", exc_info=result)
+            yield i, {"status": "error", "msg": "The search failed."}
+        else:
+            listings, cache_hit, _ = result
+            elapsed = datetime.now() - start_time
+            yield i, search_content(searches[i], listings, cache_hit, elapsed)
+
+
+def is_admin(token: str) -> bool:
+    return bool(settings.admin_token) and compare_digest(token, settings.admin_token)
+
+
+def check_admin(token: str):
+    if not is_admin(token):
+        raise HTTPException(status_code=403, detail="Not allowed.")
+
+
+@app.get("/admin/profiler", response_model=ProfilerOut, include_in_schema=False)
+def profiler_state(x_admin_token: str = Header("")):
+    """Returns the profiler's sample rate and the number of samples taken"""
+    check_admin(x_admin_token)
+    return FastJSONResponse(
+        {
+            "status": "ok",
+            "sample_rate": profiler.sample_rate,
+            "samples": profiler.samples,
+        }
+    )
+
+
+@app.put("/admin/profiler", response_model=ProfilerOut, include_in_schema=False)
+def profiler_switch(pq: ProfilerIn, x_admin_token: str = Header("")):
+    """Sets the fraction of searches to profile (0 switches the profiler off)"""
+    check_admin(x_admin_token)
+    profiler.sample_rate = pq.sample_rate
+    return profiler_state(x_admin_token)
+
+
+@app.get(
+    "/admin/profiler/stacks",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+def profiler_stacks(x_admin_token: str = Header("")):
+    """Returns the profiled stacks in the collapsed format used by flamegraphs"""
+    check_admin(x_admin_token)
+    return PlainTextResponse(profiler.collapsed())
+
+
+@app.delete("/admin/profiler/stacks", include_in_schema=False)
+def profiler_reset(x_admin_token: str = Header("")):
+    """Drops the profiled stacks"""
+    check_admin(x_admin_token)
+    profiler.reset()
+    return FastJSONResponse({"status": "ok"})
 
 
 def validate(sq: SearchIn) -> bool:
+    if sq.mode != "live" and backend.index is None:
+        return False, f'The "{sq.mode}" mode needs the torrent index to be enabled.'
+    if sq.depth > settings.max_depth:
+        return False, f"No more than {settings.max_depth} pages per tracker."
+
     indexed_sites = list(backend.state()[0])
     for site in chain(sq.include_sites, sq.exclude_sites):
         if site not in indexed_sites:
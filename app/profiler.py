@@ -0,0 +1,165 @@
+"""Contains the sampling profiler for live search requests"""
+
+import asyncio
+import sys
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from random import random
+from time import sleep
+
+# deepest stack kept, counted from the leaf: deeper stacks lose their root
+# frames, which are replaced by TRUNCATED
+MAX_DEPTH = 96
+TRUNCATED = "..."
+
+
+def frame_name(code, module: str) -> str:
+    return f"{module}:{code.co_qualname}"
+
+
+def frame_stack(frame) -> list:
+    """Returns the names of the frame and its callers, root first."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(frame_name(frame.f_code, frame.f_globals.get("__name__", "?")))
+        frame = frame.f_back
+    if frame is not None:
+        names.append(TRUNCATED)
+    names.reverse()
+    return names
+
+
+def await_stack(coro) -> list:
+    """Returns the names of the coroutines a suspended coroutine is awaiting.
+
+    The chain is followed through `cr_await` down to the innermost coroutine (or
+    whatever it awaits, eg. a future), outermost first.
+
+    """
+    # the innermost coroutines are the ones worth keeping, and they come last
+    names = deque(maxlen=MAX_DEPTH)
+    depth = 0
+    while coro is not None:
+        depth += 1
+        frame = getattr(coro, "cr_frame", None)
+        if frame is None:
+            names.append(type(coro).__qualname__)
+            break
+        names.append(frame_name(frame.f_code, frame.f_globals.get("__name__", "?")))
+        coro = getattr(coro, "cr_await", None)
+    if depth > MAX_DEPTH:
+        return [TRUNCATED, *names]
+    return list(names)
+
+
+class Profiler:
+    """Samples the event loop while profiled requests are being handled.
+
+    A thread wakes up every `interval` seconds while at least one profiled
+    request is in progress. It records two kinds of stacks:
+
+    - `cpu;...`: what the event loop thread is running, eg. a plugin parsing a
+      page with BeautifulSoup (`cpu;idle` when it's waiting for I/O)
+    - `await;...`: for every suspended task, the chain of coroutines it is
+      awaiting through, eg. a plugin's `search()` waiting on its tracker
+
+    Stacks are counted, not kept, so memory only grows with the number of
+    distinct stacks. They come out as collapsed stacks (`a;b;c count`), which
+    flamegraph.pl, speedscope and most flamegraph tools take as is.
+
+    When nothing is profiled, the thread is parked and a request only costs a
+    comparison against a zero `sample_rate`.
+
+    Attributes:
+      sample_rate (float): Fraction of requests profiled.
+      interval (float): Seconds between samples.
+      stacks (Counter): Number of samples per collapsed stack.
+      samples (int): Number of samples taken.
+      active (int): Number of profiled requests in progress.
+
+    """
+
+    def __init__(self, sample_rate: float = 0.0, interval: float = 0.005):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.active = 0
+        self.loop = None
+        self.loop_thread = None
+        self.lock = threading.Lock()
+        self.wanted = threading.Event()
+        self.thread = None
+
+    def sampled(self) -> bool:
+        """Whether to profile a request, picked at random at `sample_rate`."""
+        return self.sample_rate > 0 and random() < self.sample_rate
+
+    @contextmanager
+    def profiling(self):
+        """Samples the event loop for the duration of the `with` block.
+
+        Must be entered from the event loop thread.
+
+        """
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self.run, name="profiler", daemon=True
+            )
+            self.thread.start()
+
+        self.active += 1
+        self.wanted.set()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if not self.active:
+                self.wanted.clear()
+
+    def run(self):
+        while True:
+            self.wanted.wait()
+            self.sample()
+            sleep(self.interval)
+
+    def sample(self):
+        """Records the running stack of the loop and the stacks of its tasks."""
+        stacks = []
+
+        frame = sys._current_frames().get(  # pylint: disable=protected-access
+            self.loop_thread
+        )
+        running = frame_stack(frame)
+        # a loop waiting for I/O sits in its selector
+        if not running or "selectors:" in running[-1]:
+            stacks.append("cpu;idle")
+        else:
+            stacks.append("cpu;" + ";".join(running))
+
+        try:
+            tasks = list(asyncio.all_tasks(self.loop))
+        except RuntimeError:  # the set of tasks changed while being copied
+            tasks = []
+        for task in tasks:
+            stack = await_stack(task.get_coro())
+            if stack:
+                stacks.append("await;" + ";".join(stack))
+
+        with self.lock:
+            self.stacks.update(stacks)
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Returns the stacks as `a;b;c count` lines, most sampled first."""
+        with self.lock:
+            counts = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in counts)
+
+    def reset(self):
+        with self.lock:
+            self.stacks.clear()
+            self.samples = 0
@@ -0,0 +1,156 @@
+"""Contains the response classes and helpers used by the API"""
+
+import gzip
+import struct
+import zlib
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    from fastapi.responses import ORJSONResponse
+    import orjson  # pylint: disable=unused-import
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    ORJSONResponse = None
+
+# Writes already-trusted content straight to bytes. Uses orjson when it is
+# installed, which is considerably faster for large listings.
+FastJSONResponse = ORJSONResponse or JSONResponse
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, only gzip is offered without it
+    brotli = None
+
+# bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+# the header of a gzip member with no name, no timestamp and an unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def negotiate_encoding(accept_encoding: str, finishable: bool = False) -> str:
+    """Picks the best content encoding the client accepts.
+
+    Arguments:
+      accept_encoding (str): The value of the request's Accept-Encoding header.
+      finishable (bool): Only pick encodings whose bodies can be precompressed
+        and finished later (see `precompress()`).
+
+    Returns:
+      "br", "gzip" or "identity".
+
+    """
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip())
+
+    if brotli is not None and not finishable and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def make_etag(entry: dict, variant: str) -> str:
+    """Makes a weak ETag from the cache entry's version and response variant."""
+    return f'W/"{entry["version"]}-{variant}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Checks an If-None-Match header against an ETag (weak comparison)."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+def encoded_response(body: bytes, encoding: str, etag: str = None) -> Response:
+    """Wraps an already encoded JSON body into a response with matching headers."""
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    if etag is not None:
+        headers["ETag"] = etag
+
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def encode_json(content: dict) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def encode_body(body: bytes, encoding: str) -> tuple:
+    """Compresses a serialized response body, if worthwhile.
+
+    Returns:
+      A tuple of the form (bytes, encoding), the encoding being the one actually
+      used.
+
+    """
+    if len(body) < MIN_COMPRESS_SIZE:
+        return body, "identity"
+    return compress(body, encoding), encoding
+
+
+def open_json(content: dict) -> bytes:
+    """Serializes a JSON object without its closing brace, to add fields to.
+
+    See `finish_json()`. `content` must have at least one field.
+
+    """
+    return encode_json(content)[:-1] + b","
+
+
+def precompress(head: bytes, encoding: str) -> tuple:
+    """Compresses the start of a body, so that it can be finished many times.
+
+    Only gzip bodies can be finished without compressing their head again:
+    the head is deflated up to a byte boundary, and the rest of the body is
+    deflated after it, in the same gzip member. Other encodings are kept
+    as they are.
+
+    Returns:
+      A tuple of the form (bytes, crc, size) to pass to `finish_json()`, `crc`
+      and `size` being the CRC-32 and length of the uncompressed head.
+
+    """
+    if encoding != "gzip":
+        return head, None, len(head)
+    deflate = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = deflate.compress(head) + deflate.flush(zlib.Z_SYNC_FLUSH)
+    return GZIP_HEADER + deflated, zlib.crc32(head), len(head)
+
+
+def finish_json(head: tuple, content: dict, encoding: str) -> bytes:
+    """Adds the fields of `content` to a precompressed JSON head and closes it.
+
+    Arguments:
+      head (tuple): What `precompress()` returned for the `open_json()` bytes.
+      content (dict): Fields that the head doesn't have, at least one.
+      encoding (str): The encoding `head` was precompressed with.
+
+    """
+    start, crc, size = head
+    tail = encode_json(content)[1:]
+    if encoding != "gzip":
+        return start + tail
+    deflate = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    trailer = struct.pack("<II", zlib.crc32(tail, crc), (size + len(tail)) & 0xFFFFFFFF)
+    return start + deflate.compress(tail) + deflate.flush() + trailer
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
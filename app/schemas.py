@@ -1,12 +1,20 @@
 """Contains the request and response models for the API"""
 
-from typing import List
+from typing import Dict, List, Optional, Union
 
 from fastapi import HTTPException
 
-from pydantic import BaseModel, field_validator, model_validator, computed_field
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    field_validator,
+    model_validator,
+    computed_field,
+)
 
-from cleanbay.torrent import Category, Torrent
+from cleanbay.backend import SEARCH_MODES
+from cleanbay.torrent import Category
 
 CATEGORY_MAP = {
     "all": Category.ALL,
@@ -27,6 +35,16 @@ class SearchIn(BaseModel):
       exclude_categories (list): Categories in which to not search
       include_sites (list): Plugins/services to search
       exclude_sites (list): Plugins/services to not search
+      compact (bool): Return info hashes and a shared tracker table instead of
+        full magnets
+      mode (str): "live" to search the plugins, "index" to search the local
+        index of seen torrents, "blended" for both
+      quorum (int): Answer once this many plugins have, leaving the others to
+        finish in the background
+      deadline (float): Answer after this many seconds with whatever plugins
+        have answered, leaving the others to finish in the background
+      depth (int): Pages of results to fetch from each tracker that has them
+      debug (bool): Add how long each phase of the search took to the response
 
     """
 
@@ -35,6 +53,12 @@ class SearchIn(BaseModel):
     exclude_categories: List[str] = []
     include_sites: List[str] = []
     exclude_sites: List[str] = []
+    compact: bool = False
+    mode: str = "live"
+    quorum: Optional[int] = None
+    deadline: Optional[float] = None
+    depth: int = 1
+    debug: bool = False
 
     @field_validator("search_term")
     @classmethod
@@ -59,6 +83,34 @@ class SearchIn(BaseModel):
             )
         return category_list
 
+    @field_validator("mode")
+    @classmethod
+    def validate_mode(cls, mode: str) -> str:
+        if mode not in SEARCH_MODES:
+            raise HTTPException(
+                status_code=422,
+                detail=(
+                    f"No such mode: {mode}. Perhaps you meant live, index or blended"
+                ),
+            )
+        return mode
+
+    @field_validator("quorum", "deadline")
+    @classmethod
+    def validate_positive(cls, value):
+        if value is not None and value <= 0:
+            raise HTTPException(
+                status_code=422, detail="Quorum and deadline must be positive."
+            )
+        return value
+
+    @field_validator("depth")
+    @classmethod
+    def validate_depth(cls, depth: int) -> int:
+        if depth < 1:
+            raise HTTPException(status_code=422, detail="Depth must be positive.")
+        return depth
+
     @model_validator(mode="after")
     def validate_filter_variant_exclusivity(self) -> "SearchIn":
         if self.include_categories and self.exclude_categories:
@@ -73,11 +125,59 @@ class SearchIn(BaseModel):
         return self
 
 
+class TorrentOut(BaseModel):
+    """Serializes a `Torrent`, building its magnet from the shared trackers"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    magnet: str
+    seeders: int
+    leechers: int
+    size: str
+    uploader: str
+    uploaded_at: str
+
+
 class SearchOut(BaseModel):
     status: str = "ok"
     cache_hit: bool
     elapsed: float
-    data: List[Torrent]
+    data: List[TorrentOut]
+    timings: Optional[Dict[str, float]] = None
+
+    @computed_field
+    @property
+    def length(self) -> int:
+        return len(self.data)
+
+
+class CompactTorrentOut(BaseModel):
+    """A listing whose magnet is left for the client to build.
+
+    `trackers` indexes into `SearchCompactOut.trackers`. Listings that have no
+    shared tracker set carry their full magnet or download URL in `link`.
+
+    """
+
+    name: str
+    info_hash: Optional[str] = None
+    trackers: Optional[int] = None
+    link: Optional[str] = None
+    seeders: int
+    leechers: int
+    size: str
+    uploader: str
+    uploaded_at: str
+
+
+class SearchCompactOut(BaseModel):
+    status: str = "ok"
+    cache_hit: bool
+    elapsed: float
+    trackers: List[List[str]]
+    data: List[CompactTorrentOut]
+    timings: Optional[Dict[str, float]] = None
 
     @computed_field
     @property
@@ -85,11 +185,52 @@ class SearchOut(BaseModel):
         return len(self.data)
 
 
+class SuggestOut(BaseModel):
+    status: str = "ok"
+    suggestions: List[str]
+
+
 class SearchError(BaseModel):
     status: str
     msg: str
 
 
+class ProfilerIn(BaseModel):
+    """Used to switch the profiler on or off
+
+    Attributes:
+      sample_rate (float): Fraction of searches to profile, 0 to stop
+
+    """
+
+    sample_rate: float = Field(ge=0, le=1)
+
+
+class ProfilerOut(BaseModel):
+    status: str = "ok"
+    sample_rate: float
+    samples: int
+
+
+class BatchSearchIn(BaseModel):
+    """Used to deserialize a batch of searches
+
+    Attributes:
+      searches (list): The searches to run
+      stream (bool): Send each result as soon as it is ready, as
+        newline-delimited JSON
+
+    """
+
+    searches: List[SearchIn]
+    stream: bool = False
+
+
+class BatchSearchOut(BaseModel):
+    status: str = "ok"
+    results: Dict[str, Union[SearchOut, SearchCompactOut, SearchError]]
+
+
 class StatusOut(BaseModel):
     status: str
     plugins: List[str]
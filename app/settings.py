@@ -1,27 +1,146 @@
 """Contains the app settings"""
 
+from typing import Dict
+
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
+from .schemas import CATEGORY_MAP
+
 
 class Settings(BaseSettings):
     """Loads and represents app config from environment variables.
 
     Attributes:
       plugins_directory (str): The directory where plugin files are stored
+      probe_plugins (bool): Check on startup which plugins' services are up, and
+        leave out the others
       cache_size (int): Size for the cache
       cache_timeout (int): How long the cache maintains an entry (in seconds)
+      cache_category_timeouts (dict): Time in seconds after which listings of
+        plugins of a category are invalidated, hashed by category name. Plugins
+        may declare their own in `info()`
+      cache_columnar (bool): Store cached listings in array-backed columns
+      stale_while_revalidate (int): How long shared caches may serve a GET search
+        after it expires, while revalidating it (in seconds)
+      derive_enabled (bool): Answer searches by filtering broader cached ones
+      derive_max_extra_tokens (int): How many more tokens than the cached search
+        a derived search may have
+      derive_min_results (int): Fewest listings a derived answer must have to be
+        served instead of fetching
+      index_path (str): Where to keep the full-text index of every torrent seen.
+        Empty to disable it
+      index_limit (int): Maximum number of listings to return from the index
+      index_max_size (int): Maximum number of listings kept in the index, the
+        ones seen least recently being dropped first. 0 to keep them all
+      suggest_size (int): Maximum number of terms kept for suggestions
+      batch_max_size (int): Maximum number of searches in a batch
+      max_depth (int): Most pages of results a search may ask each tracker for
+      batch_concurrency (int): Maximum number of plugin searches a batch runs at
+        a time
+      limiter_enabled (bool): Adapt the number of concurrent requests to each
+        tracker to how it responds
+      limiter_initial (int): Concurrent requests allowed to a tracker at first
+      limiter_max (int): Most concurrent requests ever allowed to a tracker
+      limiter_queue (int): Requests that may wait for a tracker before being
+        turned away (or served from an expired cache entry)
+      limiter_latency_target (float): Responses slower than this (in seconds)
+        count as the tracker being overloaded
+      admission_enabled (bool): Shed cache misses when the server is saturated
+      admission_max_lag (float): Misses are shed while the event loop lags
+        behind by more than this (in seconds)
+      admission_max_fan_outs (int): Maximum number of misses searching the
+        plugins at a time
+      admission_retry_after (int): Seconds clients turned away are told to wait
+      admission_stale_at (float): Fraction of the limits from which
+        misses are served expired cache entries rather than searched
+      refresh_enabled (bool): Refresh trending searches before they expire
+      refresh_top_k (int): How many of the most requested searches are kept warm
+      refresh_lead_time (float): How long (in seconds) before expiry an entry is
+        refreshed
+      refresh_budget (float): Maximum number of refreshes per minute
+      refresh_interval (float): Seconds between rounds of refreshes
+      server_timing (bool): Send how long each phase of a search took in a
+        `Server-Timing` header
+      admin_token (str): Token for the admin endpoints, sent in the
+        `X-Admin-Token` header. Empty to disable them
+      metrics_public (bool): Serve the metrics without the admin token
+      profile_sample_rate (float): Fraction of searches profiled from the start
+      profile_interval (float): Seconds between profiler samples
       session_timeout (int): Timeout for requests to external services (in seconds)
+      fetch_retries (int): How many times a failed tracker request is made again
+      fetch_backoff (float): Seconds to wait before retrying a failed request,
+        doubled for each next retry
+      parse_workers (int): Number of worker processes parsing tracker responses.
+        0 to parse them on the event loop
+      response_cache_size (int): Number of tracker responses kept to revalidate
+        with conditional requests. 0 to disable
+      hedge_percentile (float): Latency percentile of a tracker's requests after
+        which a request is also sent to its next fastest mirror. 0 to disable
       rate_limit (str): Rate limit descriptor
+      suggest_rate_limit (str): Rate limit descriptor for suggestions, which are
+        requested on every keystroke
       allowed_origin (str): Origin from which requests are allowed
 
     """
 
     plugins_directory: str = "./cleanbay/plugins"
+    probe_plugins: bool = True
     cache_size: int = 128
     cache_timeout: int = 300
+    cache_category_timeouts: Dict[str, int] = {}
+    cache_columnar: bool = False
+    stale_while_revalidate: int = 60
+    derive_enabled: bool = True
+    derive_max_extra_tokens: int = 2
+    derive_min_results: int = 5
+    index_path: str = ""
+    index_limit: int = 100
+    index_max_size: int = 1000000
+    suggest_size: int = 10000
+    batch_max_size: int = 50
+    max_depth: int = 5
+    batch_concurrency: int = 8
+    limiter_enabled: bool = True
+    limiter_initial: int = 4
+    limiter_max: int = 32
+    limiter_queue: int = 16
+    limiter_latency_target: float = 3.0
+    admission_enabled: bool = True
+    admission_max_lag: float = 0.5
+    admission_max_fan_outs: int = 64
+    admission_retry_after: int = 5
+    admission_stale_at: float = 0.75
+    refresh_enabled: bool = True
+    refresh_top_k: int = 20
+    refresh_lead_time: float = 30.0
+    refresh_budget: float = 60.0
+    refresh_interval: float = 5.0
+    server_timing: bool = True
+    admin_token: str = ""
+    metrics_public: bool = False
+    profile_sample_rate: float = 0.0
+    profile_interval: float = 0.005
     session_timeout: int = 8
+    fetch_retries: int = 1
+    fetch_backoff: float = 0.5
+    parse_workers: int = 0
+    response_cache_size: int = 256
+    hedge_percentile: float = 0.95
     rate_limit: str = "100/minute"
+    suggest_rate_limit: str = "600/minute"
     allowed_origin: str = "*"
 
+    @field_validator("cache_category_timeouts")
+    @classmethod
+    def validate_category_names(cls, timeouts: dict) -> dict:
+        invalid_categories = [name for name in timeouts if name not in CATEGORY_MAP]
+        if invalid_categories:
+            raise ValueError(
+                f"No such categories: {', '.join(invalid_categories)}. "
+                f"Categories are {', '.join(CATEGORY_MAP)}"
+            )
+        return timeouts
+
 
 settings = Settings()
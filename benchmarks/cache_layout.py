@@ -0,0 +1,114 @@
+"""Compares the list-of-dataclasses and columnar layouts for cached listings.
+
+Memory is what each layout costs on top of the string payloads, which both
+share. Reading an entry is what a cache hit costs, and serializing it what the
+first hit on an entry costs (the body is kept for the next ones); sorting and
+filtering are by seeders.
+
+Run with `poetry run python -m benchmarks.cache_layout`.
+"""
+
+import random
+import tracemalloc
+from operator import attrgetter
+from time import perf_counter
+
+from app.helpers import listing_rows
+from cleanbay.cache_manager import ColumnarListings, LFUCache
+from cleanbay.torrent import Torrent, TrackerSet
+
+N_TORRENTS = 50_000
+ROUNDS = 20
+UPLOADERS = ["piratebay", "yts", "eztv", "nyaa", "linuxtracker", "libgen"]
+TRACKERS = [TrackerSet((f"udp://tracker{i}.example:1337/announce",)) for i in range(3)]
+
+
+class Plugin:  # pylint: disable=too-few-public-methods
+    def info(self):
+        return {"name": "benchmark", "category": None}
+
+
+def make_listings(n: int) -> list:
+    rng = random.Random(42)
+    return [
+        Torrent(
+            f"Some.Show.S{i % 20:02}E{i % 30:02}.1080p.WEB.x264-GRP{i}",
+            f"{rng.getrandbits(160):040x}",
+            rng.randint(0, 5000),
+            rng.randint(0, 500),
+            f"{rng.uniform(1, 900):.2f} MB",
+            rng.choice(UPLOADERS),
+            f"2023-{rng.randint(1, 12):02}-{rng.randint(1, 28):02} 12:00:00",
+            rng.choice(TRACKERS),
+        )
+        for i in range(n)
+    ]
+
+
+def measure_memory(build) -> int:
+    """Bytes retained by `build()`, not counting the string payloads it shares."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return after - before
+
+
+def throughput(fn, rounds: int = ROUNDS) -> float:
+    start = perf_counter()
+    for _ in range(rounds):
+        fn()
+    return rounds / (perf_counter() - start)
+
+
+def main():
+    rows = make_listings(N_TORRENTS)
+    columns = ColumnarListings(rows)
+
+    fields = [
+        (
+            t.name,
+            t.link,
+            t.seeders,
+            t.leechers,
+            t.size,
+            t.uploader,
+            t.uploaded_at,
+            t.trackers,
+        )
+        for t in rows
+    ]
+    list_bytes = measure_memory(lambda: [Torrent(*f) for f in fields])
+    columnar_bytes = measure_memory(lambda: ColumnarListings(rows))
+
+    plugins = [Plugin()]
+    caches = {"list": LFUCache(1, 300), "columnar": LFUCache(1, 300, columnar=True)}
+    for cache in caches.values():
+        cache.store("some show", plugins, rows)
+
+    results = {}
+    for layout, cache in caches.items():
+        results[f"{layout} hit"] = throughput(
+            lambda c=cache: c.read("some show", plugins), 100_000
+        )
+    for layout, listings in (("list", rows), ("columnar", columns)):
+        results[f"{layout} serialize"] = throughput(lambda l=listings: listing_rows(l))
+    results["list sort"] = throughput(
+        lambda: sorted(rows, key=attrgetter("seeders"), reverse=True)
+    )
+    results["columnar sort"] = throughput(lambda: columns.sorted_by("seeders"))
+    results["list filter"] = throughput(lambda: [t for t in rows if t.seeders >= 100])
+    results["columnar filter"] = throughput(lambda: columns.at_least("seeders", 100))
+
+    print(f"{N_TORRENTS} torrents")
+    print("overhead on top of the (shared) string payloads:")
+    print(f"list of dataclasses: {list_bytes / N_TORRENTS:8.1f} bytes/torrent")
+    print(f"columnar:            {columnar_bytes / N_TORRENTS:8.1f} bytes/torrent")
+    for name, ops in results.items():
+        print(f"{name:20} {ops:12.1f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Writes the tracker responses that `benchmarks.plugin_parsers` feeds the plugins.
+
+The responses are synthesized in the markup each plugin's parser expects,
+surrounded by the kind of page chrome the real trackers send, so that the
+benchmarks run without network access. Every plugin gets a small page and one
+as large as its tracker serves.
+
+Run with `poetry run python -m benchmarks.fixtures` after changing a generator.
+"""
+
+import random
+from pathlib import Path
+
+from benchmarks.torrent_layout import apibay_body, yts_body
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# most results a tracker returns in one page
+PAGE_SIZES = {
+    "piratebay": 100,
+    "yts": 50,
+    "eztv": 100,
+    "nyaa": 75,
+    "libgen": 100,
+    "linuxtracker": 50,
+}
+SMALL_PAGE = 10
+
+
+def page(title: str, body: str) -> str:
+    """Wraps the results in a head, a navigation bar and a footer."""
+    nav = "".join(
+        f'<li class="nav-item"><a href="/section/{i}">Section {i}</a></li>'
+        for i in range(12)
+    )
+    return (
+        "<!DOCTYPE html><html><head>"
+        f'<meta charset="utf-8"><title>{title}</title>'
+        '<link rel="stylesheet" href="/static/style.css">'
+        '<script src="/static/app.js"></script>'
+        "</head><body>"
+        f'<nav><ul class="nav">{nav}</ul></nav>'
+        f'<div class="container">{body}</div>'
+        '<footer><p>Footer text <a href="/about">about</a></p></footer>'
+        "</body></html>"
+    )
+
+
+def info_hash(rng: random.Random) -> str:
+    return f"{rng.getrandbits(160):040x}"
+
+
+def eztv_html(n: int) -> str:
+    rng = random.Random(3)
+    layout = "".join(f"<table><tr><td>layout {i}</td></tr></table>" for i in range(4))
+    rows = "".join(
+        '<tr name="hover" class="forum_header_border">'
+        '<td class="forum_thread_post"><a href="/shows/1/" title="Show">'
+        '<img src="/images/eztv_show.png" alt="Info"></a></td>'
+        f'<td class="forum_thread_post"><a href="/ep/{i}/" class="epinfo">'
+        f" Some Show S01E{i:02d} 1080p WEB x264 </a></td>"
+        f'<td class="forum_thread_post"><a href="magnet:?xt=urn:btih:{info_hash(rng)}'
+        f'&dn=Some.Show" class="magnet" title="Magnet Link"></a>'
+        f'<a href="/torrent/{i}.torrent" class="download_1"></a></td>'
+        f'<td class="forum_thread_post">{rng.randint(100, 4000)} MB</td>'
+        f'<td class="forum_thread_post">{rng.randint(1, 23)}h '
+        f"{rng.randint(1, 59)}m</td>"
+        f'<td class="forum_thread_post"><font color="green">{rng.randint(0, 900)}'
+        "</font></td></tr>"
+        for i in range(n)
+    )
+    header = (
+        '<tr><td class="section_post_header" colspan="6">Results</td></tr>'
+        "<tr><th>Show</th><th>Episode</th><th>Dload</th><th>Size</th>"
+        "<th>Released</th><th>Seeds</th></tr>"
+    )
+    return page(
+        "EZTV", f'{layout}<table class="forum_header_border">{header}{rows}</table>'
+    )
+
+
+def nyaa_html(n: int) -> str:
+    rng = random.Random(4)
+    rows = "".join(
+        '<tr class="default">'
+        '<td><a href="/?c=1_2" title="Anime - English-translated">'
+        '<img src="/static/img/icons/nyaa/1_2.png" class="category-icon"></a></td>'
+        f'<td colspan="2"><a href="/view/{i}#comments" class="comments">'
+        f'<i class="fa fa-comments-o"></i>{rng.randint(0, 30)}</a>'
+        f'<a href="/view/{i}" title="[Group] Some Anime - {i:02d} [1080p]">'
+        f"[Group] Some Anime - {i:02d} [1080p]</a></td>"
+        f'<td class="text-center"><a href="/download/{i}.torrent">'
+        '<i class="fa fa-fw fa-download"></i></a>'
+        f'<a href="magnet:?xt=urn:btih:{info_hash(rng)}&dn=Some+Anime">'
+        '<i class="fa fa-fw fa-magnet"></i></a></td>'
+        f'<td class="text-center">{rng.randint(100, 2000)}.{rng.randint(0, 9)} MiB</td>'
+        f'<td class="text-center" data-timestamp="{1_600_000_000 + i}">'
+        f"2021-0{rng.randint(1, 9)}-1{rng.randint(0, 9)} 12:00</td>"
+        f'<td class="text-center">{rng.randint(0, 2000)}</td>'
+        f'<td class="text-center">{rng.randint(0, 200)}</td>'
+        f'<td class="text-center">{rng.randint(0, 9000)}</td></tr>'
+        for i in range(n)
+    )
+    header = (
+        "<thead><tr><th>Category</th><th>Name</th><th>Link</th><th>Size</th>"
+        "<th>Date</th><th>Seeders</th><th>Leechers</th><th>Completed</th></tr></thead>"
+    )
+    return page(
+        "Nyaa",
+        f'<div class="table-responsive"><table class="torrent-list">{header}'
+        f"<tbody>{rows}</tbody></table></div>",
+    )
+
+
+def libgen_html(n: int) -> str:
+    rng = random.Random(5)
+    layout = (
+        '<table width="100%"><tr><td><form><input name="req"></form></td></tr></table>'
+        '<table width="100%"><tr><td>Found results</td></tr></table>'
+    )
+    rows = "".join(
+        '<tr valign="top" bgcolor="">'
+        f"<td>{100000 + i}</td>"
+        f'<td><a href="search.php?req=Author+{i}&column=author">Author {i}</a></td>'
+        f'<td width="500"><a href="book/index.php?md5={info_hash(rng)[:32]}" '
+        f'title="" id="{i}">Some Book Title, Volume {i}<br>'
+        '<font face="Times" color="green"><i>978-0-00-000000-0</i></font></a></td>'
+        f"<td>Publisher {rng.randint(1, 50)}</td><td>{rng.randint(1950, 2023)}</td>"
+        f"<td>{rng.randint(50, 900)}</td><td>English</td>"
+        f"<td>{rng.randint(1, 60)} Mb</td><td>pdf</td>"
+        f'<td><a href="http://library.lol/main/{info_hash(rng)[:32]}" '
+        'title="Gen.lib.rus.ec">[1]</a></td>'
+        f'<td><a href="http://libgen.li/ads.php?md5={info_hash(rng)[:32]}" '
+        'title="Libgen.li">[2]</a></td><td><a href="#">[edit]</a></td></tr>'
+        for i in range(n)
+    )
+    header = (
+        '<tr valign="top" bgcolor="#C0C0C0"><td>ID</td><td>Author(s)</td>'
+        "<td>Title</td><td>Publisher</td><td>Year</td><td>Pages</td>"
+        "<td>Language</td><td>Size</td><td>Extension</td><td>Mirrors</td>"
+        "<td></td><td>Edit</td></tr>"
+    )
+    return page(
+        "Library Genesis",
+        f'{layout}<table width="100%" cellspacing="1" cellpadding="1" rules="rows" '
+        f'class="c" align="center">{header}{rows}</table>',
+    )
+
+
+def linuxtracker_html(n: int) -> str:
+    rng = random.Random(6)
+    layout = "".join(
+        f'<table class="lista"><tr><td class="header">block {i}</td></tr></table>'
+        for i in range(4)
+    )
+    # the parser picks tags by their position among the cell's descendants:
+    # the name is the 3rd, the details the 8th and the links the 27th
+    filler = "<i></i>" * 18
+    rows = "".join(
+        "<tr>"
+        '<td class="lista"><img src="images/categories/ubuntu.png"></td>'
+        '<td class="lista"><div><span>'
+        f'<a href="index.php?page=torrent-details&id={info_hash(rng)}">'
+        f"Some Distro {i}.04 amd64</a></span></div>"
+        "<p></p><p></p><p></p><p></p>"
+        f"<div>\nDetails\nAdded On: 2023-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}\n"
+        f"Size: {rng.randint(1, 5)}.{rng.randint(0, 9)} GB\n"
+        f"Seeds: {rng.randint(0, 300)}\nLeechers: {rng.randint(0, 40)}\n</div>"
+        f"{filler}"
+        f'<div><a href="download.php?id={i}">torrent</a>'
+        f'<a href="magnet:?xt=urn:btih:{info_hash(rng)}&dn=Some+Distro">magnet</a>'
+        "</div></td></tr>"
+        for i in range(n)
+    )
+    return page(
+        "LinuxTracker",
+        f'{layout}<table class="lista"><tr><td class="header">Torrents</td></tr>'
+        f"{rows}</table>",
+    )
+
+
+GENERATORS = {
+    "piratebay": ("json", lambda n: apibay_body(n).decode()),
+    "yts": ("json", lambda n: yts_body(n).decode()),
+    "eztv": ("html", eztv_html),
+    "nyaa": ("html", nyaa_html),
+    "libgen": ("html", libgen_html),
+    "linuxtracker": ("html", linuxtracker_html),
+}
+
+
+def main():
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for name, (extension, generate) in GENERATORS.items():
+        for rows in (SMALL_PAGE, PAGE_SIZES[name]):
+            path = FIXTURES_DIR / f"{name}_{rows}.{extension}"
+            path.write_text(generate(rows), encoding="utf-8")
+            print(f"wrote {path} ({path.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""Load-tests the search API against simulated trackers.
+
+Every plugin's tracker is replaced by a local aiohttp server that answers each
+request after a random (log-normal) delay, fails a fraction of them with a 503,
+and otherwise serves a generated page of the chosen number of rows (or a 304 to
+conditional requests, with `--etags`). The app runs
+in its own process under uvicorn, with its plugins' requests redirected to those
+servers (the requests to its mirrors too) and rate limiting switched off.
+
+Searches arrive at `--rate` per second (as a Poisson process, so bursts happen)
+for `--duration` seconds. Their terms are drawn from `--terms` distinct ones with
+a Zipf distribution, the way a few popular searches make up most real traffic.
+The run reports throughput, latency percentiles, the cache hit ratio and how many
+requests each tracker got.
+
+Run with eg. `poetry run python -m benchmarks.load_test --rate 50 --duration 30`,
+and set a tracker apart with `--tracker nyaa:latency=2,errors=0.2,rows=75`.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+from collections import Counter
+from importlib import import_module
+from statistics import quantiles
+from time import perf_counter
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.fixtures import GENERATORS, PAGE_SIZES
+
+CONTENT_TYPES = {"json": "application/json", "html": "text/html"}
+
+# seconds to wait for the app to import, probe its plugins and start listening
+STARTUP_TIMEOUT = 120
+
+
+class FakeTracker:
+    """A local server standing in for a plugin's tracker.
+
+    Attributes:
+      name (str): Name of the plugin it stands in for.
+      latency (float): Median delay (in seconds) before answering.
+      jitter (float): Spread of the delay, as the sigma of a log-normal.
+      errors (float): Fraction of requests answered with a 503.
+      body (bytes): What the successful requests are answered with.
+      etag (str): The body's `ETag`, if conditional requests are answered.
+      requests (int): Number of requests received.
+      failed (int): Number of requests answered with a 503.
+      not_modified (int): Number of requests answered with a 304.
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        latency: float,
+        jitter: float,
+        errors: float,
+        rows: int,
+        etags: bool = False,
+    ):  # pylint: disable=too-many-arguments
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.errors = errors
+        extension, generate = GENERATORS[name]
+        self.body = generate(rows).encode()
+        self.content_type = CONTENT_TYPES[extension]
+        self.etag = f'"{hash(self.body):x}"' if etags else None
+        self.requests = 0
+        self.failed = 0
+        self.not_modified = 0
+        self.runner = None
+        self.port = None
+
+    async def handle(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency * random.lognormvariate(0, self.jitter))
+        if random.random() < self.errors:
+            self.failed += 1
+            return web.Response(status=503)
+
+        if self.etag is None:
+            return web.Response(body=self.body, content_type=self.content_type)
+        if request.headers.get("If-None-Match") == self.etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": self.etag})
+        return web.Response(
+            body=self.body, content_type=self.content_type, headers={"ETag": self.etag}
+        )
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class RedirectedSession:
+    """Wraps a session to send the requests for some hosts to local servers.
+
+    Attributes:
+      hosts (dict): Local `host:port` addresses hashed by the hosts they replace.
+
+    """
+
+    def __init__(self, session, hosts: dict):
+        self.session = session
+        self.hosts = hosts
+
+    def get(self, url, *args, **kwargs):
+        parts = urlsplit(str(url))
+        if parts.netloc in self.hosts:
+            url = urlunsplit(("http", self.hosts[parts.netloc], *parts[2:]))
+        return self.session.get(url, *args, **kwargs)
+
+    async def __aenter__(self):
+        await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.session.__aexit__(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def tracker_hosts(name: str) -> list:
+    """Returns the hosts of a tracker's domain and mirrors."""
+    plugin = import_module(f"cleanbay.plugins.{name}").CBPlugin()
+    return [urlsplit(domain).netloc for domain in plugin.domains()]
+
+
+def serve(port: int, hosts: dict, names: list):
+    """Runs the app with the plugins `names`, redirecting their requests."""
+    import uvicorn  # pylint: disable=import-outside-toplevel
+
+    from app import main as app_main  # pylint: disable=import-outside-toplevel
+
+    app_main.limiter.enabled = False
+    app_main.plugins_manager.plugins = {
+        name: import_module(f"cleanbay.plugins.{name}").CBPlugin() for name in names
+    }
+    # the simulated trackers are up, the real ones needn't be
+    app_main.plugins_manager.probed = True
+    make_session = app_main.backend.make_session
+    app_main.backend.make_session = lambda: RedirectedSession(make_session(), hosts)
+
+    uvicorn.run(app_main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(session: aiohttp.ClientSession, url: str, app):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + STARTUP_TIMEOUT
+    while loop.time() < end:
+        if not app.is_alive():
+            raise RuntimeError("the app exited before it started listening")
+        try:
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"the app didn't start within {STARTUP_TIMEOUT} seconds")
+
+
+class Load:
+    """Sends searches at a target rate and records how they're answered.
+
+    Attributes:
+      latencies (list): Seconds each answered search took.
+      statuses (Counter): Number of responses per HTTP status.
+      hits (int): Number of searches answered from the cache.
+      failures (int): Number of searches that got no response at all.
+
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, url: str, terms: list):
+        self.session = session
+        self.url = url
+        self.terms = terms
+        # zipf weights: the k-th most popular term is requested 1/k as often
+        self.weights = [1 / rank for rank in range(1, len(terms) + 1)]
+        self.latencies = []
+        self.statuses = Counter()
+        self.hits = 0
+        self.failures = 0
+
+    async def search(self, term: str):
+        start = perf_counter()
+        try:
+            async with self.session.post(self.url, json={"search_term": term}) as resp:
+                body = await resp.read()
+        except aiohttp.ClientError:
+            self.failures += 1
+            return
+        self.latencies.append(perf_counter() - start)
+        self.statuses[resp.status] += 1
+        if resp.status == 200 and json.loads(body).get("cache_hit"):
+            self.hits += 1
+
+    async def run(self, rate: float, duration: float) -> float:
+        """Sends searches for `duration` seconds, returns how long it all took."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks = set()
+        arrival = start
+        while True:
+            arrival += random.expovariate(rate)
+            if arrival - start >= duration:
+                break
+            await asyncio.sleep(max(arrival - loop.time(), 0))
+            term = random.choices(self.terms, self.weights)[0]
+            task = asyncio.create_task(self.search(term))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+        return loop.time() - start
+
+
+def parse_tracker(value: str) -> tuple:
+    """Parses a `name:key=value,...` tracker override."""
+    name, _, options = value.partition(":")
+    if name not in GENERATORS:
+        raise argparse.ArgumentTypeError(f"no simulated tracker for {name!r}")
+    overrides = {}
+    for option in filter(None, options.split(",")):
+        key, _, number = option.partition("=")
+        if key not in ("latency", "jitter", "errors", "rows"):
+            raise argparse.ArgumentTypeError(f"unknown tracker option {key!r}")
+        overrides[key] = int(number) if key == "rows" else float(number)
+    return name, overrides
+
+
+def report(results: dict):
+    latency = results["latency_ms"]
+    print(
+        f"requests   {results['requests']} sent, "
+        + ", ".join(f"{count} x {status}" for status, count in results["statuses"])
+        + f", {results['failures']} without response"
+    )
+    print(f"throughput {results['throughput']:.1f} req/s")
+    print(
+        f"latency    p50 {latency['p50']:.1f} ms  p95 {latency['p95']:.1f} ms  "
+        f"p99 {latency['p99']:.1f} ms  max {latency['max']:.1f} ms"
+    )
+    print(f"cache      {results['cache_hit_ratio']:.1%} hits")
+    for name, upstream in results["upstream"].items():
+        print(
+            f"upstream   {name:13} {upstream['requests']:5} requests, "
+            f"{upstream['failed']} failed, {upstream['not_modified']} not modified"
+        )
+
+
+async def load_test(args) -> dict:
+    trackers = {}
+    for name in args.plugins:
+        options = {
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "errors": args.errors,
+            "rows": args.rows or PAGE_SIZES[name],
+            "etags": args.etags,
+            **args.overrides.get(name, {}),
+        }
+        trackers[name] = FakeTracker(name, **options)
+    for tracker in trackers.values():
+        await tracker.start()
+
+    hosts = {
+        host: f"127.0.0.1:{tracker.port}"
+        for name, tracker in trackers.items()
+        for host in tracker_hosts(name)
+    }
+    port = free_port()
+    app = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(port, hosts, args.plugins)
+    )
+    app.start()
+
+    base = f"http://127.0.0.1:{port}"
+    connector = aiohttp.TCPConnector(limit=0)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_until_up(session, f"{base}/api/v1/status", app)
+
+            terms = [f"search term {i}" for i in range(args.terms)]
+            load = Load(session, f"{base}/api/v1/search", terms)
+            elapsed = await load.run(args.rate, args.duration)
+    finally:
+        app.terminate()
+        app.join()
+        for tracker in trackers.values():
+            await tracker.stop()
+
+    p50, p95, p99 = (0.0,) * 3
+    if len(load.latencies) > 1:
+        percentiles = quantiles(load.latencies, n=100)
+        p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+
+    answered = len(load.latencies)
+    return {
+        "requests": answered + load.failures,
+        "statuses": sorted(load.statuses.items()),
+        "failures": load.failures,
+        "throughput": answered / elapsed,
+        "latency_ms": {
+            "p50": p50 * 1000,
+            "p95": p95 * 1000,
+            "p99": p99 * 1000,
+            "max": max(load.latencies, default=0.0) * 1000,
+        },
+        "cache_hit_ratio": load.hits / answered if answered else 0.0,
+        "upstream": {
+            name: {
+                "requests": tracker.requests,
+                "failed": tracker.failed,
+                "not_modified": tracker.not_modified,
+            }
+            for name, tracker in trackers.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=20, help="searches per second")
+    parser.add_argument("--duration", type=float, default=30, help="in seconds")
+    parser.add_argument(
+        "--terms", type=int, default=200, help="number of distinct search terms"
+    )
+    parser.add_argument(
+        "--plugins",
+        nargs="+",
+        default=list(GENERATORS),
+        choices=list(GENERATORS),
+        help="plugins to load (default: all)",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.3, help="median tracker delay in seconds"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.5, help="sigma of the log-normal delay"
+    )
+    parser.add_argument(
+        "--errors", type=float, default=0.0, help="fraction of 503s from trackers"
+    )
+    parser.add_argument(
+        "--rows", type=int, help="rows per tracker page (default: its largest page)"
+    )
+    parser.add_argument(
+        "--etags",
+        action="store_true",
+        help="send ETags and answer conditional requests with 304s",
+    )
+    parser.add_argument(
+        "--tracker",
+        type=parse_tracker,
+        action="append",
+        default=[],
+        help="per-tracker overrides, eg. nyaa:latency=2,errors=0.2,rows=10",
+    )
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+    args.overrides = dict(args.tracker)
+
+    results = asyncio.run(load_test(args))
+    report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
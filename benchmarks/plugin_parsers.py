@@ -0,0 +1,160 @@
+"""Measures parse throughput and memory of every plugin on saved tracker responses.
+
+Each response in `benchmarks/fixtures` goes through its plugin's `search()` with a
+fake session, so only parsing is measured and no network access is needed.
+
+Run with `poetry run python -m benchmarks.plugin_parsers --save` to record a
+baseline on your machine, then without `--save` after a change: the run fails if
+a plugin parses slower or peaks higher than the baseline by more than
+`--threshold`. Baselines record where and when they were made, which is printed
+along with the results, and the fixture they were made with: a baseline made with
+another version of a fixture isn't compared against.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import sys
+import tracemalloc
+from datetime import datetime
+from hashlib import sha256
+from importlib import import_module
+from pathlib import Path
+from time import perf_counter
+
+from benchmarks.fixtures import FIXTURES_DIR
+from benchmarks.torrent_layout import FakeSession
+
+BASELINE = Path(__file__).parent / ".parser_baseline.json"
+
+# each fixture is parsed for at least this many seconds, best round kept
+DURATION = 1.0
+ROUNDS = 5
+
+
+def run(plugin, session) -> list:
+    return asyncio.run(plugin.search(session, "some search"))
+
+
+def measure(path: Path) -> dict:
+    plugin = import_module(f"cleanbay.plugins.{path.stem.split('_')[0]}").CBPlugin()
+    session = FakeSession(path.read_bytes())
+    listings = run(plugin, session)  # warm up
+    if not listings:
+        raise ValueError(f"{path.name} parsed to no rows")
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.reset_peak()
+    listings = run(plugin, session)
+    peak = tracemalloc.get_traced_memory()[1]
+    gc.collect()  # parse trees are cyclic, they'd otherwise count as retained
+    retained = tracemalloc.get_traced_memory()[0]
+    blocks = len(tracemalloc.take_snapshot().traces) - blocks
+    tracemalloc.stop()
+
+    best = 0.0
+    for _ in range(ROUNDS):
+        parsed = 0
+        start = perf_counter()
+        while perf_counter() - start < DURATION / ROUNDS:
+            parsed += len(run(plugin, session))
+        best = max(best, parsed / (perf_counter() - start))
+
+    return {
+        "rows": len(listings),
+        "rows_per_sec": best,
+        "peak_kb": (peak - before) / 1024,
+        "retained_kb": (retained - before) / 1024,
+        "retained_blocks": blocks,
+    }
+
+
+def provenance() -> dict:
+    """Describes where and when this run's results are measured."""
+    return {
+        "saved": datetime.now().isoformat(timespec="seconds"),
+        "machine": platform.node(),
+        "python": platform.python_version(),
+    }
+
+
+def fixture_digest(path: Path) -> str:
+    return sha256(path.read_bytes()).hexdigest()
+
+
+def describe(result: dict) -> str:
+    return (
+        f"saved {result.get('saved', 'at an unknown time')} on "
+        f"{result.get('machine', 'an unknown machine')} with Python "
+        f"{result.get('python', '(unknown)')}"
+    )
+
+
+def regressions(name: str, result: dict, baseline: dict, threshold: float) -> list:
+    if name not in baseline:
+        return []
+    found = []
+    slower = 1 - result["rows_per_sec"] / baseline[name]["rows_per_sec"]
+    if slower > threshold:
+        found.append(f"{name}: {slower:.0%} fewer rows/s")
+    larger = result["peak_kb"] / baseline[name]["peak_kb"] - 1
+    if larger > threshold:
+        found.append(f"{name}: {larger:.0%} higher peak memory")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="record a new baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="largest tolerated slowdown or peak memory growth (default: 0.25)",
+    )
+    parser.add_argument("plugins", nargs="*", help="plugins to measure (default: all)")
+    args = parser.parse_args()
+
+    recorded = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    origin = provenance()
+    results = {}
+    baseline = {}
+    found = []
+
+    for path in sorted(FIXTURES_DIR.iterdir()):
+        if args.plugins and path.stem.split("_")[0] not in args.plugins:
+            continue
+        result = results[path.stem] = measure(path)
+        result.update(fixture=fixture_digest(path), **origin)
+        if path.stem in recorded:
+            if recorded[path.stem].get("fixture") == result["fixture"]:
+                baseline[path.stem] = recorded[path.stem]
+            else:
+                print(f"{path.stem}: baseline ignored, made with another fixture")
+        print(
+            f"{path.stem:18} {result['rows']:4} rows {result['rows_per_sec']:9.0f} "
+            f"rows/s {result['peak_kb']:8.1f} KB peak "
+            f"{result['retained_kb']:7.1f} KB in {result['retained_blocks']:5} "
+            "blocks retained"
+        )
+        found += regressions(path.stem, result, baseline, args.threshold)
+
+    for description in sorted({describe(result) for result in baseline.values()}):
+        print(f"baseline {description}")
+
+    if args.save:
+        BASELINE.write_text(json.dumps({**recorded, **results}, indent=2))
+        print(f"baseline saved to {BASELINE}")
+    elif not baseline:
+        print("no baseline for these fixtures yet, record one with --save")
+    elif found:
+        print("\n".join(["regressions:"] + found))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compares the size and serialization time of the search response formats.
+
+Run with `poetry run python -m benchmarks.response_size`.
+"""
+
+import asyncio
+from time import perf_counter
+
+from cleanbay.plugins import piratebay
+
+from app.helpers import compact_listings
+from app.schemas import SearchOut, SearchCompactOut
+
+from benchmarks.torrent_layout import FakeSession, apibay_body
+
+N_ROWS = 500
+ROUNDS = 50
+
+
+def full(listings: list) -> bytes:
+    out = SearchOut(status="ok", data=listings, cache_hit=True, elapsed=0.0)
+    return out.model_dump_json().encode()
+
+
+def compact(listings: list) -> bytes:
+    trackers, rows = compact_listings(listings)
+    out = SearchCompactOut(
+        status="ok", data=rows, trackers=trackers, cache_hit=True, elapsed=0.0
+    )
+    return out.model_dump_json().encode()
+
+
+def main():
+    session = FakeSession(apibay_body(N_ROWS))
+    listings = asyncio.run(piratebay.CBPlugin().search(session, "some movie"))
+
+    for name, render in {"full": full, "compact": compact}.items():
+        size = len(render(listings))
+        start = perf_counter()
+        for _ in range(ROUNDS):
+            render(listings)
+        per_call = (perf_counter() - start) / ROUNDS
+
+        print(f"{name:8} {size:9} bytes {per_call * 1000:8.2f} ms/response")
+
+
+if __name__ == "__main__":
+    main()
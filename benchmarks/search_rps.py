@@ -0,0 +1,46 @@
+"""Measures requests per second of cached `/api/v1/search` responses.
+
+The cache is pre-filled so that every request is a hit, and rate limiting is
+switched off.
+
+Run with `poetry run python -m benchmarks.search_rps`.
+"""
+
+import asyncio
+from time import perf_counter
+
+from fastapi.testclient import TestClient
+
+from cleanbay.plugins import piratebay
+
+from app import main
+
+from benchmarks.torrent_layout import FakeSession, apibay_body
+
+N_ROWS = 500
+N_REQUESTS = 300
+
+
+def run():
+    plugin = piratebay.CBPlugin()
+    main.plugins_manager.plugins = {"piratebay": plugin}
+    main.limiter.enabled = False
+
+    listings = asyncio.run(plugin.search(FakeSession(apibay_body(N_ROWS)), "x"))
+    main.cache_manager.store("some movie", [plugin], listings)
+
+    client = TestClient(main.app)
+    for compact in (False, True):
+        body = {"search_term": "some movie", "compact": compact}
+        assert client.post("/api/v1/search", json=body).json()["cache_hit"]
+
+        start = perf_counter()
+        for _ in range(N_REQUESTS):
+            client.post("/api/v1/search", json=body)
+        rps = N_REQUESTS / (perf_counter() - start)
+
+        print(f"compact={compact!s:5} {N_ROWS} rows/response {rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,161 @@
+"""Measures how long the app takes to import and to serve its first request.
+
+Importing `app.main` is timed in fresh interpreters, and checked for the modules
+that are meant to be imported lazily (by the plugins that probe or parse with
+them, or by the columnar cache). With `--budget`, the run fails if the median
+import takes longer than that many seconds or pulls one of them in, so that it
+can guard the import time in CI.
+
+Then the server is started with `--workers` workers under uvicorn (which imports
+the app and probes the plugins in every worker) and under gunicorn with
+`gunicorn.conf.py` (which does both once, before forking), and timed from launch
+until it answers a first request.
+
+The plugins are probed as they would be in production, so the results depend on
+how fast the trackers answer; `--no-probe` leaves probing out.
+
+Run with eg. `poetry run python -m benchmarks.startup --workers 3 --budget 1`.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from tempfile import TemporaryFile
+from statistics import median
+from time import perf_counter, sleep
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from benchmarks.load_test import free_port
+
+ROOT = Path(__file__).resolve().parent.parent
+
+LAZY_MODULES = ("bs4", "lxml", "requests", "numpy")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": list(sys.modules)}))
+"""
+
+SERVERS = {
+    "uvicorn": "-m uvicorn app.main:app --host 127.0.0.1 --port {port} "
+    "--workers {workers} --log-level warning",
+    "gunicorn": "-m gunicorn app.main:app --bind 127.0.0.1:{port} "
+    "--workers {workers} --log-level warning",
+}
+
+# seconds to wait for a server to answer, probing included
+STARTUP_TIMEOUT = 120
+
+
+def time_import(env: dict) -> tuple:
+    """Imports the app in a fresh interpreter.
+
+    Returns:
+      A tuple of the form (seconds, lazy modules imported anyway).
+
+    """
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    result = json.loads(out.splitlines()[-1])
+    modules = set(result["modules"])
+    return result["seconds"], [name for name in LAZY_MODULES if name in modules]
+
+
+def time_first_request(server: str, workers: int, env: dict) -> float:
+    """Starts a server and returns how long it took to answer a request."""
+    port = free_port()
+    command = SERVERS[server].format(port=port, workers=workers).split()
+    url = f"http://127.0.0.1:{port}/api/v1/status"
+
+    # the servers' logs are only shown if they fail to start, since uvicorn
+    # logs tracebacks for workers stopped while idle
+    with TemporaryFile("w+") as log:
+        start = perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, *command], cwd=ROOT, env=env, stderr=log, stdout=log
+        )
+        try:
+            return wait_for_answer(url, proc, start)
+        except RuntimeError:
+            log.seek(0)
+            sys.stderr.write(log.read())
+            raise
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def wait_for_answer(url: str, proc: subprocess.Popen, start: float) -> float:
+    """Requests `url` until it's answered, returning the seconds since `start`."""
+    while perf_counter() - start < STARTUP_TIMEOUT:
+        if proc.poll() is not None:
+            raise RuntimeError("the server exited before it started listening")
+        try:
+            with urlopen(url, timeout=STARTUP_TIMEOUT):
+                return perf_counter() - start
+        except HTTPError:
+            # an error status is still an answer
+            return perf_counter() - start
+        except URLError:
+            sleep(0.01)
+    raise RuntimeError(f"the server didn't start within {STARTUP_TIMEOUT} seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="runs of each measure")
+    parser.add_argument("--workers", type=int, default=3, help="server workers")
+    parser.add_argument(
+        "--servers",
+        nargs="+",
+        default=list(SERVERS),
+        choices=list(SERVERS),
+        help="servers to start (default: all)",
+    )
+    parser.add_argument(
+        "--no-probe", action="store_true", help="don't probe the plugins' trackers"
+    )
+    parser.add_argument(
+        "--budget", type=float, help="fail if importing takes longer (in seconds)"
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.no_probe:
+        env["PROBE_PLUGINS"] = "false"
+
+    imports = [time_import(env) for _ in range(args.runs)]
+    import_seconds = median(seconds for seconds, _ in imports)
+    eager = sorted({name for _, names in imports for name in names})
+    print(f"{'import app.main':<24}{import_seconds * 1000:8.0f} ms median")
+    if eager:
+        print(f"{'':<24}imported eagerly: {', '.join(eager)}")
+
+    for server in args.servers:
+        times = [
+            time_first_request(server, args.workers, env) for _ in range(args.runs)
+        ]
+        label = f"{server} ({args.workers} workers)"
+        print(
+            f"{label:<24}{median(times) * 1000:8.0f} ms median "
+            f"{min(times) * 1000:8.0f} ms best to the first response"
+        )
+
+    if args.budget is not None and (import_seconds > args.budget or eager):
+        sys.exit(f"over the import budget of {args.budget * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
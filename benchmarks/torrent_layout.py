@@ -0,0 +1,120 @@
+"""Measures bytes per cached torrent and parse throughput of the JSON plugins.
+
+Run with `poetry run python -m benchmarks.torrent_layout`.
+"""
+
+import asyncio
+import json
+import random
+import tracemalloc
+from time import perf_counter
+
+from cleanbay.plugins import piratebay, yts
+
+N_ROWS = 2_000
+ROUNDS = 20
+
+
+class FakeResponse:  # pylint: disable=missing-class-docstring
+    status = 200
+    charset = "utf-8"
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def json(self):
+        return json.loads(self.body)
+
+    async def text(self):
+        return self.body.decode()
+
+    async def read(self):
+        return self.body
+
+
+class FakeSession:
+    """Answers every request with the same canned body."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def get(self, *args, **kwargs):  # pylint: disable=unused-argument
+        return FakeResponse(self.body)
+
+
+def apibay_body(n: int) -> bytes:
+    rng = random.Random(1)
+    return json.dumps(
+        [
+            {
+                "name": f"Some Movie {i} 1080p BluRay x264",
+                "info_hash": f"{rng.getrandbits(160):040X}",
+                "seeders": str(rng.randint(0, 5000)),
+                "leechers": str(rng.randint(0, 500)),
+                "size": str(rng.randint(1, 10**10)),
+                "username": "uploader",
+                "added": str(rng.randint(10**9, 1.7 * 10**9)),
+            }
+            for i in range(n)
+        ]
+    ).encode()
+
+
+def yts_body(n: int) -> bytes:
+    rng = random.Random(2)
+    movies = [
+        {
+            "title_long": f"Some Movie {i} (2001)",
+            "slug": f"some-movie-{i}-2001",
+            "torrents": [
+                {
+                    "quality": quality,
+                    "type": "bluray",
+                    "hash": f"{rng.getrandbits(160):040X}",
+                    "seeds": rng.randint(0, 500),
+                    "peers": rng.randint(0, 50),
+                    "size": "1.2 GB",
+                    "date_uploaded": "2021-01-01 00:00:00",
+                }
+                for quality in ("720p", "1080p")
+            ],
+        }
+        for i in range(n)
+    ]
+    return json.dumps(
+        {"status": "ok", "data": {"movie_count": n, "movies": movies}}
+    ).encode()
+
+
+def run(plugin, session) -> list:
+    return asyncio.run(plugin.search(session, "some movie"))
+
+
+def main():
+    cases = {
+        "piratebay": (piratebay.CBPlugin(), FakeSession(apibay_body(N_ROWS))),
+        "yts": (yts.CBPlugin(), FakeSession(yts_body(N_ROWS))),
+    }
+
+    for name, (plugin, session) in cases.items():
+        run(plugin, session)  # warm up
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        listings = run(plugin, session)
+        retained = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        start = perf_counter()
+        for _ in range(ROUNDS):
+            run(plugin, session)
+        rows_per_sec = ROUNDS * len(listings) / (perf_counter() - start)
+
+        print(
+            f"{name:10} {retained / len(listings):8.1f} bytes/torrent "
+            f"{rows_per_sec:10.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
-"""The module contains the abstract interface for plugins"""
+"""The module contains the abstract interfaces for plugins"""
+
 from abc import ABC, abstractmethod
 import asyncio  # pylint: disable=unused-import
+import json
+from types import MappingProxyType
+from typing import List, Mapping, NamedTuple, Optional
+
 import aiohttp
 
 
@@ -33,7 +38,159 @@ class AbstractPlugin(ABC):
     def info(self) -> dict:
         """Gives metadata about the plugin
 
-        Must include 'name' and 'category' keys.
+        Must include 'name' and 'category' keys. May include a 'ttl' key: how
+        long (in seconds) the plugin's listings stay fresh in the cache, for
+        sources whose listings change more or less often than most.
+
+        """
+        pass
+
+
+class PluginRequest(NamedTuple):
+    """A GET request a plugin needs made to search its service.
+
+    Attributes:
+      url (str): The URL to request, query string included.
+      headers (dict): Headers to send along, if any.
+
+    """
+
+    url: str
+    headers: Optional[dict] = None
+
+
+class PluginResponse(NamedTuple):
+    """What a service answered a `PluginRequest` with.
+
+    Attributes:
+      status (int): The HTTP status.
+      body (bytes): The raw body.
+      charset (str): The charset from the Content-Type header, if any.
+
+    """
+
+    status: int
+    body: bytes
+    charset: Optional[str] = None
+
+    def text(self) -> str:
+        return self.body.decode(self.charset or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class PluginResponseError(Exception):
+    """Indicates that a service answered with an error status.
+
+    Attributes:
+      status (int): The HTTP status.
+
+    """
+
+    def __init__(self, status: int):
+        super().__init__(f"the service answered with HTTP {status}")
+        self.status = status
+
+
+class AbstractPluginV2(AbstractPlugin):
+    """Plugins that describe their requests and parse the responses.
+
+    Instead of searching by themselves, these plugins tell the backend which
+    requests to make and turn the responses into listings. The backend makes the
+    requests, retries the ones that fail, and parses the responses wherever it
+    sees fit, eg. in worker processes. `parse()` must therefore not touch the
+    network or any state shared between searches.
+
+    Plugins only set `INFO` and implement `build_requests()` and `parse()`.
+    `search()` makes the requests and parses the responses in turn, so v2
+    plugins can be used wherever v1 plugins are.
+
+    Every app process imports every plugin, while only some of them parse.
+    Libraries that are slow to import and only needed to probe the service or
+    to parse (eg. `requests`, `bs4`) are imported in the methods using them.
+
+    Requests are built against `INFO["domain"]`. Trackers reachable at several
+    domains list the others under 'mirrors', in order of preference; the
+    backend then sends each request to the mirror answering fastest, and hedges
+    slow requests with the next one.
+
+    Trackers that split their results into pages set 'max_pages' to the number
+    of pages a search may go through, and build the requests for each page with
+    `build_requests()`. The backend fetches the pages a search asks for at once.
+
+    Attributes:
+      INFO (dict): The plugin's metadata. `info()` returns a read-only copy of
+      it, made on the first call, so that callers can't change it for every
+      instance.
+
+    """
+
+    INFO: dict = {}
+    _info: Mapping = None
+
+    def info(self) -> Mapping:
+        if self._info is None:
+            self._info = MappingProxyType(dict(self.INFO))
+        return self._info
+
+    def __getstate__(self) -> dict:
+        # the read-only copy can't be pickled, eg. to send the plugin to a parse
+        # worker, which makes its own
+        state = dict(self.__dict__)
+        state.pop("_info", None)
+        return state
+
+    def domains(self) -> list:
+        """Returns the domains the tracker is reachable at, the main one first."""
+        return [self.INFO["domain"], *self.INFO.get("mirrors", ())]
+
+    def max_pages(self) -> int:
+        """Returns how many pages of results a search can fetch."""
+        return self.INFO.get("max_pages", 1)
+
+    def verify_status(self) -> bool:
+        """Whether any of the tracker's domains is up."""
+        # pylint: disable=import-outside-toplevel
+        from requests import RequestException, get as get_sync
+
+        for domain in self.domains():
+            try:
+                if get_sync(domain, timeout=10).status_code == 200:
+                    return True
+            except RequestException:
+                continue
+        return False
+
+    @abstractmethod
+    def build_requests(self, search_param: str, page: int = 1) -> List[PluginRequest]:
+        """Describes the requests to make to search for `search_param`.
+
+        Arguments:
+          page (int): The page of results to request, from 1 to `max_pages()`.
+            Plugins without pages only ever get asked for the first.
+
+        """
+        pass
+
+    @abstractmethod
+    def parse(self, response: PluginResponse) -> list:
+        """Turns the response to one of the requests into `Torrent`s.
+
+        Raises:
+          Any exception if the response can't be parsed; the search then counts
+          as failed.
 
         """
         pass
+
+    async def search(self, session: aiohttp.ClientSession, search_param: str) -> list:
+        torrents = []
+        for request in self.build_requests(search_param):
+            resp = await session.get(request.url, headers=request.headers)
+            body = await resp.read()
+            if not 200 <= resp.status < 300:
+                raise PluginResponseError(resp.status)
+            response = PluginResponse(resp.status, body, getattr(resp, "charset", None))
+            torrents.extend(self.parse(response))
+        return torrents
@@ -0,0 +1,95 @@
+"""Contains the admission controller that sheds load when the server is saturated"""
+import asyncio
+from time import monotonic
+from typing import Callable
+
+# what a cache miss may do, from the least to the most saturated server
+FETCH = "fetch"
+STALE = "stale"
+SHED = "shed"
+
+
+class OverloadedError(Exception):
+    """Indicates that a search was turned away because the server is saturated.
+
+    Attributes:
+      retry_after (int): Seconds after which the search may be retried.
+
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Decides what a cache miss may do, from how saturated the server is.
+
+    Cache hits never go through the controller: they are always served, ahead of
+    any miss. The load of the server is the highest of the event loop's lag over
+    `max_lag` and of the fan-outs over `max_fan_outs`. Misses are shed in tiers
+    as it grows:
+
+    - below `stale_at`, they search the plugins (`FETCH`);
+    - from `stale_at`, those with an expired cache entry are served it instead,
+      the others still search the plugins (`STALE`);
+    - from 1, those without an expired entry are turned away with
+      `OverloadedError` as well (`SHED`), so that only cached searches are served.
+
+    The lag of the event loop is how long it takes to come back to a task that
+    yields, ie. to run everything else that is ready. It is sampled on every
+    miss, so it recovers as soon as misses are fast to schedule again.
+
+    The controller doesn't count the fan-outs itself: the backend, which starts
+    and ends them, tells it how many there are.
+
+    Attributes:
+      max_lag (float): Misses are shed while the smoothed lag (in seconds) is
+      above this.
+      max_fan_outs (int): Maximum number of misses searching the plugins at a
+      time.
+      retry_after (int): Seconds clients are told to wait when turned away.
+      stale_at (float): Fraction of the limits from which misses are served
+      expired entries rather than searching the plugins.
+      lag (float): Exponentially smoothed lag of the event loop, in seconds.
+
+    """
+
+    # weight of the newest sample in the smoothed lag
+    SMOOTHING = 0.3
+
+    def __init__(
+        self, max_lag: float, max_fan_outs: int, retry_after: int, stale_at=0.75
+    ):
+        self.max_lag = max_lag
+        self.max_fan_outs = max_fan_outs
+        self.retry_after = retry_after
+        self.stale_at = stale_at
+        self.lag = 0.0
+
+    async def measure_lag(self) -> float:
+        """Samples the lag of the event loop and returns the smoothed value."""
+        start = monotonic()
+        await asyncio.sleep(0)
+        sample = monotonic() - start
+
+        self.lag += self.SMOOTHING * (sample - self.lag)
+        return self.lag
+
+    async def tier(self, fan_outs: Callable[[], int]) -> str:
+        """Returns what a miss may do: `FETCH`, `STALE` or `SHED`.
+
+        Arguments:
+          fan_outs (callable): Returns the number of misses searching the
+          plugins. It's called once the lag is measured, since other misses may
+          start or end while measuring.
+
+        """
+        lag = await self.measure_lag()
+        load = max(lag / self.max_lag, fan_outs() / self.max_fan_outs)
+
+        if load >= 1:
+            return SHED
+        if load >= self.stale_at:
+            return STALE
+        return FETCH
@@ -1,13 +1,25 @@
 """Manages the plugins and the cache."""
 
 import asyncio
+from time import perf_counter
 
 from aiohttp import ClientSession, ClientTimeout, TCPConnector
 
 from typing import Tuple
 
 from .cache_manager import AbstractCacheManager
-from .plugins_manager import PluginsManager
+from .plugins_manager import PluginsManager, NoPluginsError
+from .torrent_index import TorrentIndex, info_hash
+from .suggest_index import SuggestIndex
+from .limiter import AdaptiveLimiter, LimitedSession
+from .admission import FETCH, SHED, AdmissionController, OverloadedError
+from .refresher import Refresher
+from .metrics import Registry, TimedSession
+from .timings import phase, record
+from .abstract_plugin import AbstractPluginV2
+from .fetcher import Fetcher
+
+SEARCH_MODES = ("live", "index", "blended")
 
 
 class InvalidSearchError(Exception):
@@ -27,6 +39,23 @@ class Backend:
       the plugins are in and what the cache size should be.
       plugins (dict): All the usable plugins hashed with their name.
       cache (dict): A simplistic lFU cache implementation.
+      index (TorrentIndex): Full-text index of every listing seen, if enabled.
+      index_limit (int): Maximum number of listings to take from the index.
+      suggestions (SuggestIndex): Popular searches and names, if enabled.
+      background_tasks (set): Plugin searches finishing after an early return.
+      limiter_options (dict): Keyword arguments for each plugin's
+      `AdaptiveLimiter`. None if requests aren't limited.
+      limiters (dict): `AdaptiveLimiter`s hashed by plugin name.
+      plugin_phases (dict): Names of the fetch and parse phases recorded in a
+      request's timings, hashed by plugin name.
+      admission (AdmissionController): Sheds misses when the server is
+      saturated. None if every miss is admitted.
+      refresher (Refresher): Keeps trending searches cached. None if disabled.
+      fan_outs (int): Number of searches currently searching the plugins,
+      whether their caller is still waiting for them or not. The admission
+      controller sheds misses by it.
+      metrics (Registry): Counters and histograms of the search pipeline.
+      fetcher (Fetcher): Makes the requests of v2 plugins and parses them.
 
     """
 
@@ -35,18 +64,139 @@ class Backend:
         request_timeout: int,
         cache_manager: AbstractCacheManager,
         plugins_manager: PluginsManager,
-    ):
+        torrent_index: TorrentIndex = None,
+        index_limit: int = 100,
+        suggestions: SuggestIndex = None,
+        limiter_options: dict = None,
+        admission: AdmissionController = None,
+        refresh_options: dict = None,
+        fetch_options: dict = None,
+    ):  # pylint: disable=too-many-arguments
         """Initializes the backend object.
 
         Arguments:
           request_timeout (int): Timeout for requests to external services (in seconds)
           cache_manager (AbstractCacheManager): A concrete impl for a cache
           plugins_manager (PluginsManager): A concrete impl for managing plugins.
+          torrent_index (TorrentIndex): Index to feed all listings into, if any.
+          index_limit (int): Maximum number of listings to take from the index.
+          suggestions (SuggestIndex): Index to record searches and names in.
+          limiter_options (dict): Keyword arguments for the `AdaptiveLimiter` of
+            each plugin. Requests aren't limited if not given.
+          admission (AdmissionController): Decides which misses may search the
+            plugins. Every miss does if not given.
+          refresh_options (dict): Keyword arguments for the `Refresher` of
+            trending searches. Nothing is refreshed if not given.
+          fetch_options (dict): Keyword arguments for the `Fetcher` of v2
+            plugins' requests.
 
         """
         self.timeout = request_timeout
         self.cache = cache_manager
         self.plugins_manager = plugins_manager
+        self.index = torrent_index
+        self.index_limit = index_limit
+        self.suggestions = suggestions
+        self.background_tasks = set()
+        self.limiter_options = limiter_options
+        self.limiters = {}
+        self.plugin_phases = {}
+        self.admission = admission
+        self.refresher = None
+        if refresh_options is not None:
+            self.refresher = Refresher(self, **refresh_options)
+        self.fan_outs = 0
+        self.fetcher = Fetcher(**(fetch_options or {}))
+        self.metrics = Registry()
+        self.register_metrics()
+
+    def register_metrics(self):
+        """Registers the metrics of the plugins, the caches and the fan-outs"""
+        metrics = self.metrics
+        self.plugin_fetch_seconds = metrics.histogram(
+            "cleanbay_plugin_fetch_seconds",
+            "Time plugins spent waiting on their trackers, per search.",
+            "plugin",
+        )
+        self.plugin_parse_seconds = metrics.histogram(
+            "cleanbay_plugin_parse_seconds",
+            "Time plugins spent parsing responses, per search.",
+            "plugin",
+        )
+        self.plugin_errors = metrics.counter(
+            "cleanbay_plugin_errors_total", "Plugin searches that failed.", "plugin"
+        )
+        self.plugin_timeouts = metrics.counter(
+            "cleanbay_plugin_timeouts_total",
+            "Plugin searches that timed out.",
+            "plugin",
+        )
+        metrics.gauge(
+            "cleanbay_fan_outs",
+            "Searches currently searching the plugins.",
+            lambda: self.fan_outs,
+        )
+
+        def cache_stat(name):
+            return lambda: self.cache.stats().get(name, 0)
+
+        def hit_ratio():
+            stats = self.cache.stats()
+            hits = stats.get("hits", 0) + stats.get("derived_hits", 0)
+            lookups = stats.get("hits", 0) + stats.get("misses", 0)
+            return hits / lookups if lookups else 0.0
+
+        metrics.gauge(
+            "cleanbay_cache_size", "Entries in the cache.", cache_stat("size")
+        )
+        metrics.counter(
+            "cleanbay_cache_hits_total", "Cache reads hit.", read=cache_stat("hits")
+        )
+        metrics.counter(
+            "cleanbay_cache_misses_total",
+            "Cache reads missed.",
+            read=cache_stat("misses"),
+        )
+        metrics.counter(
+            "cleanbay_cache_derived_hits_total",
+            "Misses answered from a broader cached search.",
+            read=cache_stat("derived_hits"),
+        )
+        metrics.counter(
+            "cleanbay_cache_evictions_total",
+            "Entries evicted to make room.",
+            read=cache_stat("evictions"),
+        )
+        metrics.gauge(
+            "cleanbay_cache_hit_ratio",
+            "Share of cache reads answered, derived ones included.",
+            hit_ratio,
+        )
+
+        fetcher = self.fetcher
+        metrics.counter(
+            "cleanbay_hedged_requests_total",
+            "Slow tracker requests sent to a second mirror.",
+            read=lambda: fetcher.hedged,
+        )
+        metrics.counter(
+            "cleanbay_hedges_won_total",
+            "Hedged requests the second mirror answered first.",
+            read=lambda: fetcher.hedges_won,
+        )
+
+        responses = fetcher.responses
+        if responses is not None:
+            metrics.gauge(
+                "cleanbay_response_cache_size",
+                "Tracker responses kept for revalidation.",
+                lambda: len(responses.responses),
+            )
+            metrics.counter(
+                "cleanbay_response_cache_not_modified_total",
+                "Tracker requests answered with a 304 Not Modified.",
+                read=lambda: responses.not_modified,
+            )
 
     def state(self):
         plugins = self.plugins_manager.plugins.keys()
@@ -61,7 +211,11 @@ class Backend:
         exclude_categories: list,
         include_sites: list,
         exclude_sites: list,
-    ) -> Tuple:
+        mode: str = "live",
+        quorum: int = None,
+        deadline: float = None,
+        depth: int = 1,
+    ) -> Tuple:  # pylint: disable=too-many-arguments
         """Searches the relevant plugins for torrents.
 
         Looks in the cache first. Ideally finds the listings there.
@@ -69,6 +223,20 @@ class Backend:
         In case of a miss, invokes the search method of each plugin (which might
         be time consuming).
 
+        With the "index" mode, the local torrent index is searched instead. With
+        "blended", listings from the index that the live search didn't return are
+        appended to its results.
+
+        With a `quorum` or a `deadline`, a miss returns as soon as that many
+        plugins have answered or that many seconds have passed. The other
+        plugins keep searching in the background, and the cache entry is
+        replaced with the full results once they are done.
+
+        Plugins whose trackers split their results into pages fetch up to
+        `depth` of them, all at once. A search cached with fewer pages than it
+        asks for is a miss, but only the missing pages are fetched. One cached
+        with more is a hit, and returns them all.
+
         Note:
           1. This will cause the cache to update in case of a miss. Which, if it is
           full, might cause even more delay.
@@ -81,52 +249,273 @@ class Backend:
           exclude_categories (list): Categories of plugins to not search
           include_sites (list): Names of services to search
           exclude_sites (list): Names of services to not search
+          mode (str): One of "live", "index" or "blended"
+          quorum (int): Return once this many plugins have answered
+          deadline (float): Return after this many seconds, whatever has answered
+          depth (int): Pages of results to fetch from each plugin that has them
 
         Returns:
-          A tuple in the form ([], bool). The bool is True in case of a cache hit,
-          False otherwise.
+          A tuple in the form ([], bool, dict). The bool is True in case of a
+          cache hit, False otherwise. The dict is the cache entry holding the
+          listings, or None if they weren't cached or came from the index.
 
         Raises:
           InvalidSearchError: if both include and exclude variants of a filter are
-          used together or if no plugins are left after filtering.
+          used together, if no plugins are left after filtering or if the mode
+          needs an index and there is none.
+          OverloadedError: if the search is a miss, the server is saturated and
+          the cache has no expired entry for it either.
+
+        """
+        with phase("prepare"):
+            search_term, plugins = self.prepare(
+                search_term,
+                include_categories,
+                exclude_categories,
+                include_sites,
+                exclude_sites,
+                mode,
+            )
+
+        if mode == "index":
+            return (await self.search_index(search_term, plugins), False, None)
+        if self.refresher is not None:
+            self.refresher.record(search_term, plugins)
+
+        with phase("cache"):
+            results, cache_hit = self.try_cache(search_term, plugins, depth)
+        if not cache_hit:
+            results = await self.update_cache(
+                search_term, plugins, quorum=quorum, deadline=deadline, depth=depth
+            )
+
+        return await self.finish(search_term, plugins, mode, results, cache_hit)
+
+    async def search_many(self, searches: list, concurrency: int):
+        """Resolves many searches together.
+
+        Hits are answered from the cache straight away. The misses are merged by
+        search term and plugins, and fetched over a single session with at most
+        `concurrency` plugin searches running at a time.
+
+        Args:
+          searches (list): Dicts of keyword arguments for `search()`.
+          concurrency (int): Maximum number of plugin searches at a time.
+
+        Yields:
+          Tuples of the form (index, result) as the searches are resolved. The
+          index is the search's position in `searches`, the result is what
+          `search()` would return for it or the exception it would raise.
+
+        """
+        pending = {}
+        for i, kwargs in enumerate(searches):
+            kwargs = dict(kwargs)
+            depth = kwargs.pop("depth", 1)
+            mode = kwargs.get("mode", "live")
+            try:
+                search_term, plugins = self.prepare(**kwargs)
+            except (InvalidSearchError, NoPluginsError) as exc:
+                yield i, exc
+                continue
+
+            if mode == "index":
+                yield i, (await self.search_index(search_term, plugins), False, None)
+                continue
+            if self.refresher is not None:
+                self.refresher.record(search_term, plugins)
+
+            results, cache_hit = self.try_cache(search_term, plugins, depth)
+            if cache_hit:
+                yield i, await self.finish(search_term, plugins, mode, results, True)
+                continue
+
+            key = (search_term, frozenset(plugins), depth)
+            pending.setdefault(key, (search_term, plugins, depth, []))[3].append(
+                (i, mode)
+            )
+
+        if not pending:
+            return
+
+        semaphore = asyncio.Semaphore(concurrency)
+        async with self.make_session() as session:
+            tasks = {
+                asyncio.create_task(
+                    self.update_cache(
+                        search_term, plugins, session, semaphore, depth=depth
+                    )
+                ): (search_term, plugins, waiting)
+                for search_term, plugins, depth, waiting in pending.values()
+            }
+            try:
+                while tasks:
+                    done, _ = await asyncio.wait(
+                        tasks, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        search_term, plugins, waiting = tasks.pop(task)
+                        for i, mode in waiting:
+                            if task.exception() is not None:
+                                yield i, task.exception()
+                                continue
+                            yield i, await self.finish(
+                                search_term, plugins, mode, task.result(), False
+                            )
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def prepare(
+        self,
+        search_term: str,
+        include_categories: list,
+        exclude_categories: list,
+        include_sites: list,
+        exclude_sites: list,
+        mode: str = "live",
+    ) -> Tuple:
+        """Validates a search and picks the plugins for it.
+
+        Returns:
+          A tuple of the form (search_term, plugins) with the search term
+          normalized.
+
+        Raises:
+          InvalidSearchError: see `search()`.
+          NoPluginsError: if there are no usable plugins.
 
         """
         # should not be using include and exclude together
         if include_categories and exclude_categories or include_sites and exclude_sites:
             raise InvalidSearchError()
+        if mode not in SEARCH_MODES or (mode != "live" and self.index is None):
+            raise InvalidSearchError()
 
         search_term = search_term.lower()
+        if self.suggestions is not None:
+            self.suggestions.add(search_term)
 
         plugins = self.plugins_manager.filter_plugins(
             include_categories, exclude_categories, include_sites, exclude_sites
         )
 
-        results, cache_hit = self.try_cache(search_term, plugins)
-        if not cache_hit:
-            results = await self.update_cache(search_term, plugins)
-
-        return (results, cache_hit)
+        return (search_term, plugins)
 
-    def try_cache(self, search_param: str, plugins: list) -> Tuple:
+    async def finish(
+        self, search_term: str, plugins: list, mode: str, results: list, cache_hit
+    ) -> Tuple:
+        """Blends in the indexed listings if asked to, and finds the cache entry"""
+        if mode == "blended":
+            results = self.blend(results, await self.search_index(search_term, plugins))
+            return (results, cache_hit, None)
+
+        return (results, cache_hit, self.cache.entry(search_term, plugins))
+
+    async def search_index(self, search_param: str, plugins: list) -> list:
+        names = [plugin.info()["name"] for plugin in plugins]
+        with phase("index"):
+            return await asyncio.to_thread(
+                self.index.search, search_param, names, self.index_limit
+            )
+
+    def blend(self, live: list, indexed: list) -> list:
+        """Appends the indexed listings that aren't already in the live ones."""
+        seen = {info_hash(torrent) for torrent in live}
+        return [*live, *(t for t in indexed if info_hash(t) not in seen)]
+
+    def try_cache(self, search_param: str, plugins: list, depth: int = 1) -> Tuple:
         """Returns the listings from the cache.
 
+        If the search itself isn't cached, it may be derived from a broader
+        search that is, which counts as a hit. Searches for more than one page
+        of results aren't derived.
+
         Args:
           search_param (str): The string to search for.
           plugins (list): Plugin objects implementing the `search()` method.
+          depth (int): Pages of results the cached listings must span.
 
         Returns:
           A tuple containing a list of torrents and a bool denoting if there was a
           cache hit or not.
 
         """
+        if not self.deep_enough(search_param, plugins, depth):
+            return [], False
+
         cache_hit = self.cache.read(search_param, plugins)
 
+        wanted = self.pages_wanted(plugins, depth)
+        if not cache_hit and max(wanted.values(), default=1) == 1:
+            cache_hit = self.cache.read_derived(search_param, plugins)
+
         if not cache_hit:
             return [], False
 
         return cache_hit, True
 
-    async def update_cache(self, search_param: str, plugins: list) -> list:
+    def cached_entry(
+        self,
+        search_term: str,
+        include_categories: list,
+        exclude_categories: list,
+        include_sites: list,
+        exclude_sites: list,
+        depth: int = 1,
+    ) -> dict:  # pylint: disable=too-many-arguments
+        """Returns the cache entry a live search would be answered from.
+
+        Unlike `search()`, nothing is recorded and no hit is counted: this is
+        for checking if the client's copy of the results is still current
+        before searching at all.
+
+        Returns:
+          The entry, or None if the search would be a miss (derived hits
+          included, since they have no entry of their own).
+
+        """
+        try:
+            plugins = self.plugins_manager.filter_plugins(
+                include_categories, exclude_categories, include_sites, exclude_sites
+            )
+        except NoPluginsError:
+            return None
+
+        search_term = search_term.lower()
+        if not self.deep_enough(search_term, plugins, depth):
+            return None
+        return self.cache.entry(search_term, plugins)
+
+    def deep_enough(self, search_param: str, plugins: list, depth: int) -> bool:
+        """Whether the cached listings span as many pages as `depth` asks for."""
+        cached = self.cache.read_pages(search_param, plugins)
+        return all(
+            cached.get(name, pages) >= pages
+            for name, pages in self.pages_wanted(plugins, depth).items()
+        )
+
+    def pages_wanted(self, plugins: list, depth: int) -> dict:
+        """Returns how many pages a search of `depth` fetches from each plugin."""
+        return {
+            plugin.info()["name"]: (
+                min(depth, plugin.max_pages())
+                if isinstance(plugin, AbstractPluginV2)
+                else 1
+            )
+            for plugin in plugins
+        }
+
+    async def update_cache(
+        self,
+        search_param: str,
+        plugins: list,
+        session: ClientSession = None,
+        semaphore: asyncio.Semaphore = None,
+        quorum: int = None,
+        deadline: float = None,
+        depth: int = 1,
+    ) -> list:  # pylint: disable=too-many-arguments
         """Updates the cache.
 
         Searches each plugin in the category and puts its results into the cache.
@@ -138,21 +527,184 @@ class Backend:
         Args:
           search_param (str): the string to search for.
           plugins (list): Plugin objects implementing the `search()` method.
+          session (ClientSession): Session to search with. A new one is opened
+            if not given.
+          semaphore (asyncio.Semaphore): Bounds the number of plugin searches
+            running at a time, if given.
+          quorum (int): Return once this many plugins have answered.
+          deadline (float): Return after this many seconds.
+          depth (int): Pages of results to fetch from each plugin that has them.
 
         Returns:
-          List of torrents matching the search query
+          List of torrents matching the search query. Plugins whose trackers
+          are already at their concurrency limit aren't searched if they have
+          expired listings cached for the search; those are used instead.
+
+        Raises:
+          OverloadedError: if the admission controller turns the search away
+          and there is no expired entry to serve instead.
 
         """
-        results = await self.search_plugins(search_param, plugins)
+        tier = await self.tier()
+        if tier != FETCH:
+            stale = self.cache.read_stale(search_param, plugins)
+            if stale:
+                return stale
+            if tier == SHED:
+                raise OverloadedError(self.admission.retry_after)
+
+        # no await since the tier was decided, so that no other miss got in
+        self.fan_outs += 1
+        return await self.fetch(
+            search_param, plugins, session, semaphore, quorum, deadline, depth=depth
+        )
 
+    async def refresh(
+        self,
+        search_param: str,
+        plugins: list,
+        session: ClientSession = None,
+        lead_time: float = 0.0,
+    ) -> bool:
+        """Searches the plugins again for a cached search, in the background.
+
+        Only the plugins whose cached listings expire within `lead_time` seconds
+        are searched. Unlike a miss, a refresh is skipped rather than served stale
+        or turned away when a tracker is at its limit or the server is saturated.
+
+        Returns:
+          True if the search was refreshed.
+
+        """
+        if self.saturated(plugins) or await self.tier() != FETCH:
+            return False
+
+        self.fan_outs += 1
+        return bool(await self.fetch(search_param, plugins, session, min_ttl=lead_time))
+
+    async def tier(self) -> str:
+        """Returns what a miss may do given the load, see `AdmissionController`.
+
+        A miss that searches the plugins counts in `fan_outs` until they're all
+        done searching, the ones left running after an early return included:
+        until then, they still load the server. It's given back with `release()`.
+
+        """
+        if self.admission is None:
+            return FETCH
+        return await self.admission.tier(lambda: self.fan_outs)
+
+    def release(self):
+        self.fan_outs -= 1
+
+    async def fetch(
+        self,
+        search_param: str,
+        plugins: list,
+        session: ClientSession = None,
+        semaphore: asyncio.Semaphore = None,
+        quorum: int = None,
+        deadline: float = None,
+        min_ttl: float = 0.0,
+        depth: int = 1,
+    ) -> list:  # pylint: disable=too-many-arguments
+        """Searches the plugins and caches the results, see `update_cache()`.
+
+        Plugins whose listings for the search are still fresh in the cache, for
+        at least `min_ttl` more seconds, aren't searched again: their cached
+        listings are used instead, and only the pages they lack are fetched.
+        Plugins searched again fetch as many pages as they had cached, if more
+        than `depth`.
+
+        Plugins whose tracker is at its concurrency limit aren't searched again
+        if they have expired listings cached: those are used, and the entry is
+        stored already expired so that they're searched on the next read.
+
+        Must be called with the search counted in `fan_outs` (see `tier()`),
+        which is given back once every plugin is done searching.
+
+        """
+        fresh = self.cache.read_fragments(search_param, plugins, min_ttl)
+        cached = self.cache.read_pages(search_param, plugins)
+
+        pages = {}
+        for name, wanted in self.pages_wanted(plugins, depth).items():
+            if name not in fresh:
+                pages[name] = range(1, max(wanted, cached.get(name, 1)) + 1)
+            elif cached.get(name, wanted) < wanted:
+                pages[name] = range(cached[name] + 1, wanted + 1)
+
+        stale = self.read_busy(search_param, plugins, fresh)
+        for name in stale:
+            del pages[name]
+        fresh = {**fresh, **stale}
+        stale_plugins = [p for p in plugins if p.info()["name"] in pages]
+
+        early = bool(stale_plugins) and bool(quorum or deadline)
+        try:
+            if not stale_plugins:
+                fetched = {}
+            elif early:
+                fetched = await self.search_plugins_early(
+                    search_param, stale_plugins, quorum, deadline, plugins, pages
+                )
+            else:
+                fetched = await self.search_plugins(
+                    search_param, stale_plugins, session, semaphore, pages
+                )
+        finally:
+            # searching early gives the slot back once the late plugins are done
+            if not early:
+                self.release()
+
+        results = []
+        for name in (plugin.info()["name"] for plugin in plugins):
+            if name not in fetched:
+                results.extend(fresh.get(name, []))
+                continue
+            if pages[name].start > 1:
+                results.extend(fresh[name])
+            results.extend(fetched[name])
         if not results:
             return []
 
-        self.cache.store(search_param, plugins, results)
+        # the late plugins' listings are cached once they're done, or they've
+        # timed out by the time this entry expires
+        missing_ttl = self.timeout if early else None
+        self.cache.store_fragments(
+            search_param, plugins, fetched, pages, missing_ttl, set(stale)
+        )
+        if self.suggestions is not None:
+            self.suggestions.add_names(self.flatten(fetched.values()))
 
         return results
 
-    async def search_plugins(self, search_param: str, plugins: list) -> list:
+    def read_busy(self, search_param: str, plugins: list, fresh: dict) -> dict:
+        """Reads the expired listings of the plugins whose tracker is at its limit.
+
+        Returns:
+          Lists of Torrents hashed by plugin name.
+
+        """
+        busy = [
+            plugin.info()["name"]
+            for plugin in plugins
+            if plugin.info()["name"] not in fresh and self.saturated([plugin])
+        ]
+        if not busy:
+            return {}
+
+        expired = self.cache.read_stale_fragments(search_param, plugins)
+        return {name: expired[name] for name in busy if name in expired}
+
+    async def search_plugins(
+        self,
+        search_param: str,
+        plugins: list,
+        session: ClientSession = None,
+        semaphore: asyncio.Semaphore = None,
+        pages: dict = None,
+    ) -> list:
         """Searches the plugins etxcept the ones passed in `except_plugins`
 
         This is an asynchronus function which fires off the plugins, which, in turn,
@@ -162,38 +714,250 @@ class Backend:
         Args:
           search_param (str): the string to search for.
           plugins (list): Plugin objects implementing the `search()` method.
+          session (ClientSession): Session to search with. A new one is opened
+            if not given.
+          semaphore (asyncio.Semaphore): Bounds the number of plugin searches
+            running at a time, if given.
+          pages (dict): The pages of results (a range) to fetch from each
+            plugin, hashed by plugin name. Only the first, for those left out.
 
         Returns:
-          A list of compiled results from the specified plugin.
+          The listings each plugin returned, hashed by plugin name. Plugins that
+          failed are left out.
 
         """
-        results = []
+        if session is None:
+            async with self.make_session() as session:
+                return await self.search_plugins(
+                    search_param, plugins, session, semaphore, pages
+                )
+
+        tasks = self.create_search_tasks(
+            session, search_param, plugins, semaphore, pages
+        )
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        session_timeout = ClientTimeout(total=self.timeout)
-        async with ClientSession(
-            connector=TCPConnector(ssl=False), timeout=session_timeout
-        ) as session:
-            tasks = self.create_search_tasks(session, search_param, plugins)
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        if self.index is not None:
+            await self.feed_index(plugins, results)
+
+        return self.by_plugin(plugins, results)
+
+    async def search_plugins_early(
+        self,
+        search_param: str,
+        plugins: list,
+        quorum: int,
+        deadline: float,
+        cache_plugins: list = None,
+        pages: dict = None,
+    ) -> dict:  # pylint: disable=too-many-arguments
+        """Searches the plugins, returning early at a quorum or a deadline.
+
+        The plugins that haven't answered by then are left running in the
+        background, see `complete_search()`. The fan-out slot of the search is
+        given back once they are all done, and so is the session.
+
+        Args:
+          search_param (str): the string to search for.
+          plugins (list): Plugin objects implementing the `search()` method.
+          quorum (int): Return once this many plugins have answered.
+          deadline (float): Return after this many seconds.
+          cache_plugins (list): Plugins the search is cached under, if more than
+            `plugins`.
+          pages (dict): The pages of results to fetch, see `search_plugins()`.
 
-        results = self.exclude_errors(results)
+        Returns:
+          The listings of the plugins that answered in time, hashed by plugin
+          name.
 
-        return self.flatten(results)
+        """
+        session = self.make_session()
+        tasks = []
+        completing = False
+        try:
+            tasks = self.create_search_tasks(
+                session, search_param, plugins, pages=pages
+            )
+            quorum = min(quorum or len(tasks), len(tasks))
+
+            loop = asyncio.get_running_loop()
+            end = loop.time() + deadline if deadline else None
+
+            pending = set(tasks)
+            while pending and len(tasks) - len(pending) < quorum:
+                timeout = None if end is None else max(end - loop.time(), 0)
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+
+            answered = [i for i, task in enumerate(tasks) if task not in pending]
+            results = [self.task_result(tasks[i]) for i in answered]
+            if self.index is not None:
+                await self.feed_index([plugins[i] for i in answered], results)
+
+            if pending:
+                background = asyncio.create_task(
+                    self.complete_search(
+                        search_param,
+                        plugins,
+                        tasks,
+                        pending,
+                        session,
+                        cache_plugins,
+                        pages,
+                    )
+                )
+                completing = True
+                self.background_tasks.add(background)
+                background.add_done_callback(self.background_tasks.discard)
+                # even if it's cancelled before it gets to run
+                background.add_done_callback(lambda _: self.release())
+
+            return self.by_plugin([plugins[i] for i in answered], results)
+        finally:
+            if not completing:
+                for task in tasks:
+                    task.cancel()
+                await session.close()
+                self.release()
+
+    async def complete_search(
+        self,
+        search_param: str,
+        plugins: list,
+        tasks: list,
+        pending: set,
+        session: ClientSession,
+        cache_plugins: list = None,
+        pages: dict = None,
+    ):  # pylint: disable=too-many-arguments
+        """Waits for the late plugins and caches the full results."""
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await session.close()
+
+        if self.index is not None:
+            late = [i for i, task in enumerate(tasks) if task in pending]
+            await self.feed_index(
+                [plugins[i] for i in late], [results[i] for i in late]
+            )
+
+        fragments = self.by_plugin(plugins, results)
+        if any(fragments.values()):
+            self.cache.store_fragments(
+                search_param, cache_plugins or plugins, fragments, pages
+            )
+            if self.suggestions is not None:
+                self.suggestions.add_names(self.flatten(fragments.values()))
+
+    def task_result(self, task: asyncio.Task):
+        if task.exception() is not None:
+            return task.exception()
+        return task.result()
+
+    def make_session(self) -> ClientSession:
+        session_timeout = ClientTimeout(total=self.timeout)
+        return ClientSession(connector=TCPConnector(ssl=False), timeout=session_timeout)
+
+    async def feed_index(self, plugins: list, results: list):
+        """Adds the listings each plugin returned to the torrent index."""
+        for plugin, listings in zip(plugins, results):
+            if isinstance(listings, list) and listings:
+                await asyncio.to_thread(self.index.add, plugin.info()["name"], listings)
 
     def create_search_tasks(
-        self, session: ClientSession, search_param: str, plugins: list
-    ) -> list:
+        self,
+        session: ClientSession,
+        search_param: str,
+        plugins: list,
+        semaphore: asyncio.Semaphore = None,
+        pages: dict = None,
+    ) -> list:  # pylint: disable=too-many-arguments
         """Creates async tasks for each plugin"""
+        pages = pages or {}
         tasks = []
         for plugin in plugins:
-            search_future = plugin.search(session, search_param)
+            search_future = self.run_plugin(
+                session, plugin, search_param, pages.get(plugin.info()["name"])
+            )
+            if semaphore is not None:
+                search_future = self.bounded(semaphore, search_future)
             task = asyncio.create_task(search_future)
             tasks.append(task)
 
         return tasks
 
-    def exclude_errors(self, listings: list):
-        return [listing for listing in listings if isinstance(listing, list)]
+    async def run_plugin(
+        self, session: ClientSession, plugin, search_param: str, pages: range = None
+    ):
+        """Runs a plugin's search, recording how long it took and if it failed.
+
+        v2 plugins fetch the given `pages` of results, the first one if none are
+        given. v1 plugins only ever fetch the first.
+
+        """
+        name = plugin.info()["name"]
+        timed = TimedSession(self.limited(session, plugin))
+        start = perf_counter()
+        try:
+            if isinstance(plugin, AbstractPluginV2):
+                return await self.fetcher.search(
+                    timed, plugin, search_param, pages or range(1, 2)
+                )
+            # v1 plugins fetch and parse by themselves
+            return await plugin.search(timed, search_param)
+        except asyncio.TimeoutError:
+            self.plugin_timeouts.labels(name).inc()
+            raise
+        except Exception:
+            self.plugin_errors.labels(name).inc()
+            raise
+        finally:
+            parsed = perf_counter() - start - timed.waited
+            self.plugin_fetch_seconds.labels(name).observe(timed.waited)
+            self.plugin_parse_seconds.labels(name).observe(parsed)
+            fetch_name, parse_name = self.phase_names(name)
+            record(fetch_name, timed.waited)
+            record(parse_name, parsed)
+
+    def phase_names(self, name: str) -> tuple:
+        """Returns the names of a plugin's fetch and parse phases."""
+        if name not in self.plugin_phases:
+            self.plugin_phases[name] = (f"fetch-{name}", f"parse-{name}")
+        return self.plugin_phases[name]
+
+    def limiter(self, plugin) -> AdaptiveLimiter:
+        """Returns the plugin's limiter, creating it on first use."""
+        name = plugin.info()["name"]
+        if name not in self.limiters:
+            self.limiters[name] = AdaptiveLimiter(**self.limiter_options)
+        return self.limiters[name]
+
+    def saturated(self, plugins: list) -> bool:
+        """Whether any of the plugins' trackers is at its concurrency limit."""
+        if self.limiter_options is None:
+            return False
+        return any(self.limiter(plugin).saturated for plugin in plugins)
+
+    def limited(self, session: ClientSession, plugin):
+        if self.limiter_options is None:
+            return session
+        return LimitedSession(session, self.limiter(plugin))
+
+    async def bounded(self, semaphore: asyncio.Semaphore, search_future):
+        async with semaphore:
+            return await search_future
+
+    def by_plugin(self, plugins: list, results: list) -> dict:
+        """Hashes the plugins' listings by plugin name, leaving out errors."""
+        return {
+            plugin.info()["name"]: listings
+            for plugin, listings in zip(plugins, results)
+            if isinstance(listings, list)
+        }
 
     def flatten(self, t: list) -> list:
         return [item for sublist in t for item in sublist]
@@ -1,3 +1,5 @@
 # pylint: disable=missing-module-docstring
 from .abstract_cache_manager import AbstractCacheManager
 from .lfu_cache import LFUCache
+from .derivation import DerivationPolicy
+from .columnar import ColumnarListings
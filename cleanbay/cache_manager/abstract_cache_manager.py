@@ -30,3 +30,112 @@ class AbstractCacheManager(ABC):
 
         """
         pass
+
+    def store_fragments(
+        self,
+        search_term: str,
+        plugins: list,
+        fragments: dict,
+        pages: dict = None,  # pylint: disable=unused-argument
+        missing_ttl: float = None,  # pylint: disable=unused-argument
+        stale: set = None,  # pylint: disable=unused-argument
+    ):  # pylint: disable=too-many-arguments
+        """Stores the listings each plugin returned for a search.
+
+        Caches that don't track plugins separately store them as one result.
+
+        Arguments:
+          fragments (dict): Lists of Torrents hashed by plugin name.
+          pages (dict): The pages of results (a range) each fragment holds,
+            hashed by plugin name.
+          missing_ttl (float): How long (in seconds) the result may be kept if
+            some plugins have no fragment in it, if less than usual.
+          stale (set): Names of the plugins whose expired listings may be kept.
+
+        """
+        names = [plugin.info()["name"] for plugin in plugins]
+        listings = [t for name in names for t in fragments.get(name, [])]
+        if listings:
+            self.store(search_term, plugins, listings)
+
+    def read_fragments(  # pylint: disable=unused-argument
+        self, search_term: str, plugins: list, min_ttl: float = 0.0
+    ) -> dict:
+        """Reads the still fresh listings of each plugin, if the cache tracks them.
+
+        Returns:
+          Lists of Torrents hashed by plugin name. Empty if there are none.
+
+        """
+        return {}
+
+    def read_stale_fragments(
+        self, search_term: str, plugins: list  # pylint: disable=unused-argument
+    ) -> dict:
+        """Reads the listings of each plugin, expired or not, if the cache tracks them.
+
+        Returns:
+          Lists of Torrents hashed by plugin name. Empty if there are none.
+
+        """
+        return {}
+
+    def read_pages(
+        self, search_term: str, plugins: list  # pylint: disable=unused-argument
+    ) -> dict:
+        """Reads how many pages of results each plugin's cached listings span.
+
+        Returns:
+          Numbers of pages hashed by plugin name. Empty if the cache doesn't
+          track them.
+
+        """
+        return {}
+
+    def read_stale(
+        self, search_term: str, plugins: list  # pylint: disable=unused-argument
+    ) -> list:
+        """Reads an item from the cache even if it has timed out, if it's kept.
+
+        Returns:
+          A list of Torrents. Empty if there is no such item.
+
+        """
+        return []
+
+    def read_derived(
+        self, search_term: str, plugins: list  # pylint: disable=unused-argument
+    ) -> list:
+        """Answers a search from broader cached ones, if the cache supports it.
+
+        Returns:
+          A list of Torrents. Empty if the search couldn't be derived.
+
+        """
+        return []
+
+    def entry(
+        self, search_term: str, plugins: list  # pylint: disable=unused-argument
+    ) -> dict:
+        """Returns the cache entry for a search, if the cache keeps such entries.
+
+        Entries are dicts with at least a 'version' string that changes whenever
+        the listings do, and an 'encoded' dict for serialized listings.
+
+        Returns:
+          The entry, or None.
+
+        """
+        return None
+
+    def stats(self) -> dict:
+        """Returns the cache's counters, if it keeps any.
+
+        Namely 'size', 'hits', 'misses', 'derived_hits' and 'evictions'.
+
+        """
+        return {}
+
+    def ttl_remaining(self, entry: dict) -> float:  # pylint: disable=unused-argument
+        """Returns how many seconds the entry has left before it times out."""
+        return 0.0
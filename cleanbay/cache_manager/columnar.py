@@ -0,0 +1,279 @@
+"""Contains a columnar, array-backed container for cached listings"""
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+from functools import cache
+from typing import Iterator, List
+
+from cleanbay.torrent import Torrent
+
+SIZE_UNITS = {
+    "B": 1,
+    "KB": 1024,
+    "KIB": 1024,
+    "MB": 1024**2,
+    "MIB": 1024**2,
+    "GB": 1024**3,
+    "GIB": 1024**3,
+    "TB": 1024**4,
+    "TIB": 1024**4,
+}
+
+NUMERIC_COLUMNS = ("seeders", "leechers", "size_bytes", "timestamp")
+
+
+@cache
+def numpy():
+    """Returns the numpy module, imported on first use. None if not installed.
+
+    Importing numpy takes longer than the rest of the cache, so the app doesn't
+    pay for it unless columnar listings are actually sorted or filtered.
+
+    """
+    try:
+        import numpy as np  # pylint: disable=import-outside-toplevel
+    except ImportError:  # numpy is optional, fall back to plain `array` scans
+        return None
+    return np
+
+
+def parse_size(size: str) -> int:
+    """Converts a size like "1.2 GB" into bytes. Returns -1 if it can't."""
+    try:
+        value, unit = str(size).split()
+        return int(float(value) * SIZE_UNITS[unit.upper()])
+    except (ValueError, KeyError):
+        return -1
+
+
+def parse_timestamp(uploaded_at: str) -> int:
+    """Converts an ISO-ish date into a unix timestamp. Returns -1 if it can't."""
+    try:
+        return int(datetime.fromisoformat(str(uploaded_at).strip()).timestamp())
+    except ValueError:
+        return -1
+
+
+class ValueTable:
+    """Stores each distinct value once and hands out indices to it.
+
+    Attributes:
+      values (list): The distinct values, in order of first appearance.
+      index (dict): Maps the key of a value to its position in `values`.
+
+    """
+
+    __slots__ = ("values", "index")
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def intern(self, value, key=None) -> int:
+        """Returns the position of `value`, adding it if its key is new.
+
+        Arguments:
+          key: What tells values apart, `value` itself if not given.
+
+        """
+        key = value if key is None else key
+        position = self.index.get(key)
+        if position is None:
+            position = len(self.values)
+            self.values.append(value)
+            self.index[key] = position
+        return position
+
+
+class ColumnarListings(Sequence):
+    """Stores a list of torrents column by column.
+
+    Numeric fields live in typed `array` columns, so that a cached listing
+    costs a few machine words instead of a `Torrent` and its boxed integers.
+    Uploaders and tracker sets, which repeat across listings, are kept once in
+    value tables. It's a read-only sequence of `Torrent`s, built on access, so
+    it can be served wherever a list of listings is: a cache hit returns it as
+    is rather than converting it back.
+
+    Sorting and filtering (`sorted_by()`, `at_least()`, `uploaded_by()`) don't
+    copy the columns: they return a view sharing them, with the positions of
+    its listings in `order`. With numpy installed, they run as vectorized
+    operations over zero-copy views of the columns.
+
+    Attributes:
+      seeders (array): Number of seeders per listing.
+      leechers (array): Number of leechers per listing.
+      size_bytes (array): Size in bytes per listing. -1 if it couldn't be parsed.
+      timestamp (array): Upload time as a unix timestamp. -1 if unknown.
+      uploader_ids (array): Position of each listing's uploader in `uploaders`.
+      tracker_ids (array): Position of each listing's tracker set in `trackers`.
+      names (list): Names of the listings.
+      links (list): Links (or info hashes) of the listings.
+      sizes (list): Sizes as the trackers wrote them.
+      uploaded_at (list): Upload dates as the trackers wrote them.
+      uploaders (ValueTable): Distinct uploader names.
+      trackers (ValueTable): Distinct `TrackerSet`s (or None), told apart by
+      their URLs.
+      order (Sequence): Positions of the listings in the columns, in order.
+      None for all of them, in the order they were stored.
+
+    """
+
+    __slots__ = (
+        "seeders",
+        "leechers",
+        "size_bytes",
+        "timestamp",
+        "uploader_ids",
+        "tracker_ids",
+        "names",
+        "links",
+        "sizes",
+        "uploaded_at",
+        "uploaders",
+        "trackers",
+        "order",
+    )
+
+    def __init__(self, listings: Iterator[Torrent] = ()):
+        self.seeders = array("i")
+        self.leechers = array("i")
+        self.size_bytes = array("q")
+        self.timestamp = array("q")
+        self.uploader_ids = array("I")
+        self.tracker_ids = array("I")
+        self.names = []
+        self.links = []
+        self.sizes = []
+        self.uploaded_at = []
+        self.uploaders = ValueTable()
+        self.trackers = ValueTable()
+        self.order = None
+
+        for torrent in listings:
+            self.append(torrent)
+
+    def append(self, torrent: Torrent):
+        self.seeders.append(torrent.seeders)
+        self.leechers.append(torrent.leechers)
+        self.size_bytes.append(parse_size(torrent.size))
+        self.timestamp.append(parse_timestamp(torrent.uploaded_at))
+        self.uploader_ids.append(self.uploaders.intern(torrent.uploader))
+        trackers = torrent.trackers
+        key = None if trackers is None else trackers.urls
+        self.tracker_ids.append(self.trackers.intern(trackers, key))
+        self.names.append(torrent.name)
+        self.links.append(torrent.link)
+        self.sizes.append(torrent.size)
+        self.uploaded_at.append(torrent.uploaded_at)
+
+    def __len__(self) -> int:
+        if self.order is None:
+            return len(self.seeders)
+        return len(self.order)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        position = range(len(self))[i]
+        if self.order is not None:
+            position = self.order[position]
+        return self.row(position)
+
+    def __iter__(self) -> Iterator[Torrent]:
+        if self.order is not None:
+            return map(self.row, self.order)
+        # zipping the columns is several times faster than indexing each of them
+        return map(
+            Torrent,
+            self.names,
+            self.links,
+            self.seeders,
+            self.leechers,
+            self.sizes,
+            map(self.uploaders.values.__getitem__, self.uploader_ids),
+            self.uploaded_at,
+            map(self.trackers.values.__getitem__, self.tracker_ids),
+        )
+
+    def row(self, position: int) -> Torrent:
+        """Builds the `Torrent` stored at a position of the columns."""
+        return Torrent(
+            self.names[position],
+            self.links[position],
+            self.seeders[position],
+            self.leechers[position],
+            self.sizes[position],
+            self.uploaders.values[self.uploader_ids[position]],
+            self.uploaded_at[position],
+            self.trackers.values[self.tracker_ids[position]],
+        )
+
+    def to_list(self) -> List[Torrent]:
+        return list(self)
+
+    def sorted_by(self, column: str, descending: bool = True) -> "ColumnarListings":
+        """Returns a view of the listings ordered by a numeric column.
+
+        The sort is stable: listings with the same value keep their order.
+
+        Arguments:
+          column (str): One of "seeders", "leechers", "size_bytes" or "timestamp".
+          descending (bool): Sort from largest to smallest.
+
+        """
+        values = self.column(column)
+        np = numpy()
+        if np is None:
+            positions = self.positions()
+            order = sorted(positions, key=values.__getitem__, reverse=descending)
+            return self.view(order)
+
+        keys = np.frombuffer(values, dtype=values.typecode).astype(np.int64)
+        if self.order is not None:
+            keys = keys[self.order]
+        ranks = np.argsort(-keys if descending else keys, kind="stable")
+        return self.view(ranks if self.order is None else self.order[ranks])
+
+    def at_least(self, column: str, minimum: int) -> "ColumnarListings":
+        """Returns a view of the listings whose `column` is >= `minimum`."""
+        return self.where(self.column(column), minimum.__le__, "__ge__", minimum)
+
+    def uploaded_by(self, uploader: str) -> "ColumnarListings":
+        """Returns a view of the listings uploaded by `uploader`."""
+        wanted = self.uploaders.index.get(uploader, -1)
+        return self.where(self.uploader_ids, wanted.__eq__, "__eq__", wanted)
+
+    def where(self, values: array, test, operator: str, operand: int):
+        """Returns a view of the listings whose value passes `test`.
+
+        With numpy, `operator` (eg. "__ge__") is applied to the whole column
+        and `operand` instead.
+
+        """
+        np = numpy()
+        if np is None:
+            return self.view([i for i in self.positions() if test(values[i])])
+
+        view = np.frombuffer(values, dtype=values.typecode)
+        if self.order is None:
+            return self.view(np.flatnonzero(getattr(view, operator)(operand)))
+        return self.view(self.order[getattr(view[self.order], operator)(operand)])
+
+    def positions(self):
+        if self.order is None:
+            return range(len(self.seeders))
+        return self.order
+
+    def view(self, order) -> "ColumnarListings":
+        """Returns listings sharing these columns, at the positions `order`."""
+        listings = ColumnarListings.__new__(ColumnarListings)
+        for name in self.__slots__:
+            setattr(listings, name, getattr(self, name))
+        listings.order = order
+        return listings
+
+    def column(self, name: str) -> array:
+        if name not in NUMERIC_COLUMNS:
+            raise KeyError(f"Not a numeric column: {name}")
+        return getattr(self, name)
@@ -0,0 +1,33 @@
+"""Contains the policy for answering searches from broader cached ones"""
+from dataclasses import dataclass
+
+
+@dataclass
+class DerivationPolicy:
+    """Decides when a search may be answered by filtering a broader cached one.
+
+    A cached search is broader if its tokens are a subset of the new search's
+    tokens ("star wars" for "star wars 1977"). Its listings are then filtered
+    down to the ones whose names contain the extra tokens.
+
+    Attributes:
+      enabled (bool): Whether derived answers are allowed at all.
+      max_extra_tokens (int): How many tokens the new search may add to the
+      cached one. The more it adds, the more the tracker would have ranked
+      differently, and the less a filtered answer is worth.
+      min_results (int): Fewest listings a derived answer needs; below that a
+      real fetch is made instead.
+
+    """
+
+    enabled: bool = True
+    max_extra_tokens: int = 2
+    min_results: int = 5
+
+    def allows(self, extra_tokens: int) -> bool:
+        """Whether a cached search with this many fewer tokens may be used."""
+        return self.enabled and 0 < extra_tokens <= self.max_extra_tokens
+
+    def accepts(self, derived: list) -> bool:
+        """Whether the filtered listings are good enough to be served."""
+        return len(derived) >= self.min_results
@@ -1,34 +1,105 @@
 """Contains the implementation for LFU-based cache manager"""
+import os
+import weakref
 from datetime import datetime, timedelta
+from functools import partial
+from itertools import count
+from secrets import token_hex
 
-from typing import Tuple
+from typing import Optional, Tuple
 
 from cleanbay.cache_manager.abstract_cache_manager import AbstractCacheManager
+from cleanbay.cache_manager.columnar import ColumnarListings
+from cleanbay.cache_manager.derivation import DerivationPolicy
+from cleanbay.torrent import tokenize
+
+
+def reseed(cache_ref: weakref.ref):
+    """Draws a new epoch for a cache in a forked process, if it's still around."""
+    cache = cache_ref()
+    if cache is not None:
+        cache.epoch = token_hex(4)
 
 
 class LFUCache(AbstractCacheManager):
     """Manages an LFU cache with a timeout.
 
+    Each plugin's listings in an entry (its fragment) expire after that plugin's
+    own TTL: the 'ttl' in its `info()` if it declares one, the TTL of its
+    category otherwise, or `timeout` if there's none either. An entry expires
+    with its first fragment, after which only the expired plugins need to be
+    searched again (see `read_fragments()`).
+
+    Fragments also record how many pages of results their plugin fetched, so
+    that a deeper search only fetches the pages that aren't cached yet (see
+    `read_pages()`).
+
+    With `columnar`, listings are stored as `ColumnarListings`, and reads return
+    them as they are: a sequence of `Torrent`s built on access.
+
     Attributes:
       lines (dict): Cache items hashed by the tuple of the search term and the
       names of the plugins utilized in the search.
       max_size (int): Maximum number of entries in the cache.
       timeout (timedelta): Time in seconds after which a cache entry is
-      invalidated.
+      invalidated, unless its plugins say otherwise.
+      category_timeouts (dict): Timeouts (timedelta) hashed by `Category`, for
+      plugins that don't declare their own.
+      epoch (str): Random tag for this cache instance, so that entry versions
+      are unique across restarts and worker processes. Drawn again in processes
+      forked from this one (eg. gunicorn workers, see gunicorn.conf.py), which
+      would otherwise number their entries alike.
+      derivation (DerivationPolicy): When to answer a search from a broader
+      cached one.
+      token_index (dict): Keys of the cache lines hashed by each token of their
+      search term.
+      hits (int): Reads answered from the cache.
+      misses (int): Reads the cache couldn't answer.
+      derived_hits (int): Misses answered from a broader cached search.
+      evictions (int): Lines dropped to make room for new ones.
+      columnar (bool): Whether listings are stored as `ColumnarListings`
+      instead of a list of `Torrent` objects.
 
     """
 
-    def __init__(self, max_size: int, timeout: int):
+    def __init__(
+        self,
+        max_size: int,
+        timeout: int,
+        derivation: DerivationPolicy = None,
+        category_timeouts: dict = None,
+        columnar: bool = False,
+    ):  # pylint: disable=too-many-arguments
         """Initializes the cache.
 
         Arguments:
           max_size (int): Maximum number of entries in the cache.
           timeout (int): Time in seconds after which a cache entry is invalidated.
+          derivation (DerivationPolicy): When to answer a search from a broader
+            cached one. Never, if not given.
+          category_timeouts (dict): Time in seconds after which the listings of
+            plugins of a category are invalidated, hashed by `Category`.
+          columnar (bool): Store listings column by column to save memory.
 
         """
         self.lines = {}
         self.max_size = max_size
         self.timeout = timedelta(seconds=timeout)
+        self.category_timeouts = {
+            category: timedelta(seconds=seconds)
+            for category, seconds in (category_timeouts or {}).items()
+        }
+        self.epoch = token_hex(4)
+        self.versions = count(1)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=partial(reseed, weakref.ref(self)))
+        self.derivation = derivation or DerivationPolicy(enabled=False)
+        self.token_index = {}
+        self.hits = 0
+        self.misses = 0
+        self.derived_hits = 0
+        self.evictions = 0
+        self.columnar = columnar
 
     def store(self, search_term: str, plugins: list, listings: list):
         """Stores a search result into the cache.
@@ -42,17 +113,132 @@ class LFUCache(AbstractCacheManager):
           listings (list): List of Torrents returned from the search.
 
         """
-        if len(self.lines) == self.max_size:
-            lfu = self.least_frequently_used()
-            del self.lines[lfu]
+        now = datetime.now()
+        expires = now + min(map(self.plugin_timeout, plugins), default=self.timeout)
+        self.store_line(self.make_key(search_term, plugins), listings, now, expires)
 
+    def store_fragments(
+        self,
+        search_term: str,
+        plugins: list,
+        fragments: dict,
+        pages: dict = None,
+        missing_ttl: float = None,
+        stale: set = None,
+    ):  # pylint: disable=too-many-arguments
+        """Stores the listings each plugin returned for a search.
+
+        The fragments of plugins that weren't searched this time are carried
+        over from the previous entry for the search, if they are still fresh,
+        or if they're in `stale`; expired ones expire the new entry straight
+        away, so that they're searched again on the next read. Plugins with no
+        fragment at all (eg. because they failed) expire the entry after their
+        own TTL, or after `missing_ttl` if given (eg. because they're still
+        searching, and will store their fragments once done).
+
+        A fragment whose pages don't start at the first one continues the
+        plugin's kept fragment: it's appended to it, and expires along with it.
+
+        Arguments:
+          search_term (str): The string that was searched.
+          plugins (list): List of Plugin objects used in the search.
+          fragments (dict): Lists of Torrents hashed by the name of the plugin
+            that returned them.
+          pages (dict): The pages of results (a range) each fragment holds,
+            hashed by plugin name. Only the first, for those left out.
+          missing_ttl (float): Seconds after which the entry expires if some
+            plugins have no fragment in it.
+          stale (set): Names of the plugins whose fragments are carried over
+            even if they have expired (eg. because their tracker was too busy
+            to be searched again).
+
+        """
         key = self.make_key(search_term, plugins)
+        now = datetime.now()
+        kept = self.read_fragments(search_term, plugins, with_times=True)
+        if stale:
+            expired = self.read_stale_fragments(search_term, plugins, with_times=True)
+            kept = {
+                **{name: expired[name] for name in stale if name in expired},
+                **kept,
+            }
+        pages = pages or {}
+
+        listings, spans, expires = [], {}, None
+        for plugin in plugins:
+            name = plugin.info()["name"]
+            fetched = pages.get(name, range(1, 2))
+            if name in fragments and fetched.start == 1:
+                fragment, store_time, depth = fragments[name], now, fetched.stop - 1
+            elif name in fragments and name in kept:
+                fragment, store_time, _ = kept[name]
+                fragment = fragment + fragments[name]
+                depth = fetched.stop - 1
+            elif name in kept:
+                fragment, store_time, depth = kept[name]
+            else:
+                # the plugin failed (or its first pages expired while the next
+                # ones were fetched): try it again when its listings would have
+                # expired
+                fragment, store_time, depth = None, now, 0
+
+            if fragment is not None:
+                start = len(listings)
+                listings.extend(fragment)
+                spans[name] = (start, len(listings), store_time, depth)
+
+            fragment_expires = store_time + self.plugin_timeout(plugin)
+            if fragment is None and missing_ttl is not None:
+                fragment_expires = min(
+                    fragment_expires, now + timedelta(seconds=missing_ttl)
+                )
+            if expires is None or fragment_expires < expires:
+                expires = fragment_expires
+
+        if spans:
+            self.store_line(key, listings, now, expires, spans)
+
+    def store_line(
+        self,
+        key: Tuple,
+        listings: list,
+        store_time: datetime,
+        expires: datetime,
+        fragments: dict = None,
+    ):  # pylint: disable=too-many-arguments
+        # a search stored again (eg. refreshed) keeps its popularity
+        hit_count = 1
+        if key in self.lines:
+            hit_count = self.lines[key]["hit_count"]
+        elif len(self.lines) >= self.max_size:
+            self.evict(self.least_frequently_used())
+            self.evictions += 1
+
+        if self.columnar:
+            listings = ColumnarListings(listings)
+
         self.lines[key] = {
             "listings": listings,
-            "hit_count": 1,
-            "store_time": datetime.now(),
+            "hit_count": hit_count,
+            "store_time": store_time,
+            "expires": expires,
+            "fragments": fragments or {},
+            "version": f"{self.epoch}-{next(self.versions)}",
+            "encoded": {},
         }
 
+        for token in self.key_tokens(key):
+            self.token_index.setdefault(token, set()).add(key)
+
+    def evict(self, key: Tuple):
+        del self.lines[key]
+        for token in self.key_tokens(key):
+            keys = self.token_index.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.token_index[token]
+
     def read(self, search_term: str, plugins: list) -> list:
         """Reads an item from the cache.
 
@@ -64,19 +250,203 @@ class LFUCache(AbstractCacheManager):
           plugins (list): List of Plugin objects used in the search.
 
         Returns:
-          A list of Torrents.
+          A list of Torrents, or `ColumnarListings` if `columnar`.
 
         """
         key = self.make_key(search_term, plugins)
 
-        if key not in self.lines:
-            return {}
-        if not self.is_valid(self.lines[key]):
+        if key not in self.lines or not self.is_valid(self.lines[key]):
+            self.misses += 1
             return {}
 
+        self.hits += 1
         self.lines[key]["hit_count"] += 1
+
         return self.lines[key]["listings"]
 
+    def read_stale(self, search_term: str, plugins: list) -> list:
+        """Reads an item from the cache even if it has timed out.
+
+        Returns:
+          A list of Torrents. Empty if the search was never cached or has been
+          evicted.
+
+        """
+        line = self.lines.get(self.make_key(search_term, plugins))
+        if line is None:
+            return []
+
+        return line["listings"]
+
+    def read_fragments(
+        self,
+        search_term: str,
+        plugins: list,
+        min_ttl: float = 0.0,
+        with_times: bool = False,
+    ) -> dict:  # pylint: disable=too-many-arguments
+        """Reads the listings of each plugin that are still fresh.
+
+        The entry itself may have expired: that only means one of its plugins'
+        listings has.
+
+        Arguments:
+          search_term (str): The string that was searched.
+          plugins (list): List of Plugin objects used in the search.
+          min_ttl (float): Treat listings expiring within this many seconds as
+            expired already.
+          with_times (bool): Return (listings, store_time, pages) tuples
+            instead, `pages` being how many pages of results the listings span.
+
+        Returns:
+          Lists of Torrents hashed by plugin name.
+
+        """
+        horizon = datetime.now() + timedelta(seconds=min_ttl)
+        return self.line_fragments(search_term, plugins, with_times, horizon)
+
+    def read_stale_fragments(
+        self, search_term: str, plugins: list, with_times: bool = False
+    ) -> dict:
+        """Reads the listings of each plugin, even if they have expired.
+
+        Returns:
+          Lists of Torrents hashed by plugin name, see `read_fragments()`.
+
+        """
+        return self.line_fragments(search_term, plugins, with_times)
+
+    def line_fragments(
+        self,
+        search_term: str,
+        plugins: list,
+        with_times: bool,
+        horizon: datetime = None,
+    ) -> dict:  # pylint: disable=too-many-arguments
+        """Reads the listings of each plugin that are fresh until `horizon`."""
+        line = self.lines.get(self.make_key(search_term, plugins))
+        if line is None or not line["fragments"]:
+            return {}
+
+        listings = line["listings"]
+        fragments = {}
+        for plugin in plugins:
+            name = plugin.info()["name"]
+            if name not in line["fragments"]:
+                continue
+            start, end, store_time, pages = line["fragments"][name]
+            if horizon and store_time + self.plugin_timeout(plugin) <= horizon:
+                continue
+            fragment = listings[start:end]
+            fragments[name] = (fragment, store_time, pages) if with_times else fragment
+
+        return fragments
+
+    def read_pages(self, search_term: str, plugins: list) -> dict:
+        """Reads how many pages of results each plugin's listings span.
+
+        Plugins that have no listings cached for the search are left out, fresh
+        or not.
+
+        Returns:
+          Numbers of pages hashed by plugin name.
+
+        """
+        line = self.lines.get(self.make_key(search_term, plugins))
+        if line is None:
+            return {}
+        return {name: span[3] for name, span in line["fragments"].items()}
+
+    def read_derived(self, search_term: str, plugins: list) -> list:
+        """Answers a search by filtering the listings of a broader cached one.
+
+        Looks for a valid line, searched with the same plugins, whose search
+        tokens are a subset of this search's tokens, and keeps the listings whose
+        names contain the remaining tokens. The most specific such line is used.
+        If the `derivation` policy accepts the result, it is stored as a line of
+        its own, timed out along with the line it came from.
+
+        Arguments:
+          search_term (str): The string that was searched.
+          plugins (list): List of Plugin objects used in the search.
+
+        Returns:
+          A list of Torrents. Empty if the search couldn't be derived.
+
+        """
+        if not self.derivation.enabled:
+            return []
+
+        key = self.make_key(search_term, plugins)
+        tokens = set(tokenize(search_term))
+
+        # count how many of each cached search's tokens this search contains;
+        # the ones that contain all of them are the broader searches
+        matched = {}
+        for token in tokens:
+            for candidate in self.token_index.get(token, ()):
+                matched[candidate] = matched.get(candidate, 0) + 1
+
+        source, source_tokens = None, set()
+        for candidate, n_matched in matched.items():
+            candidate_tokens = self.key_tokens(candidate)
+            if candidate[1] != key[1] or n_matched != len(candidate_tokens):
+                continue
+            if not self.derivation.allows(len(tokens) - len(candidate_tokens)):
+                continue
+            if not self.is_valid(self.lines[candidate]):
+                continue
+            if len(candidate_tokens) > len(source_tokens):
+                source, source_tokens = candidate, candidate_tokens
+
+        if source is None:
+            return []
+
+        line = self.lines[source]
+        listings = line["listings"]
+        extra_tokens = tokens - source_tokens
+        derived = [
+            torrent
+            for torrent in listings
+            if extra_tokens.issubset(tokenize(torrent.name))
+        ]
+        if not self.derivation.accepts(derived):
+            return []
+
+        self.derived_hits += 1
+        line["hit_count"] += 1
+        self.store_line(key, derived, line["store_time"], line["expires"])
+        return derived
+
+    def entry(self, search_term: str, plugins: list) -> Optional[dict]:
+        """Returns the cache line for a search without counting it as a hit.
+
+        The line's 'version' changes every time the search is stored again, and
+        its 'encoded' dict holds serialized (and compressed) forms of the
+        listings which are dropped along with the line.
+
+        Returns:
+          The cache line, or None if there is no valid one.
+
+        """
+        line = self.lines.get(self.make_key(search_term, plugins))
+        if line is None or not self.is_valid(line):
+            return None
+        return line
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.lines),
+            "hits": self.hits,
+            "misses": self.misses,
+            "derived_hits": self.derived_hits,
+            "evictions": self.evictions,
+        }
+
+    def ttl_remaining(self, entry: dict) -> float:
+        """Returns how many seconds the cache line has left before it times out."""
+        return max((entry["expires"] - datetime.now()).total_seconds(), 0.0)
+
     def is_valid(self, line: dict) -> bool:
         """Checks if the cache item has timed out.
 
@@ -86,10 +456,17 @@ class LFUCache(AbstractCacheManager):
         Returns:
           True if the item hasn't timed out. False otherwise.
         """
-        current_time = datetime.now()
-        store_time = line["store_time"]
+        return datetime.now() < line["expires"]
+
+    def plugin_timeout(self, plugin) -> timedelta:
+        """Returns how long the plugin's listings stay fresh."""
+        info = plugin.info()
+        if "ttl" in info:
+            return timedelta(seconds=info["ttl"])
+        return self.category_timeouts.get(info["category"], self.timeout)
 
-        return current_time - store_time < self.timeout
+    def key_tokens(self, key: Tuple) -> frozenset:
+        return frozenset(tokenize(key[0]))
 
     def make_key(self, search_term: str, plugins: list) -> Tuple:
         names = [plugin.info()["name"] for plugin in plugins]
@@ -0,0 +1,293 @@
+"""Contains the fetching and parsing of the requests of v2 plugins"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from aiohttp import ClientConnectionError, ClientError
+
+from .abstract_plugin import (
+    AbstractPluginV2,
+    PluginRequest,
+    PluginResponse,
+    PluginResponseError,
+)
+from .mirrors import Mirrors
+from .response_cache import ResponseCache
+
+
+def retryable(status: int) -> bool:
+    """Whether an error status may go away on its own, eg. an overloaded server"""
+    return status == 429 or status >= 500
+
+
+def answered(task: asyncio.Task) -> bool:
+    """Whether a finished request got a response that's worth keeping"""
+    return task.exception() is None and not retryable(task.result()[0].status)
+
+
+class Fetcher:
+    """Makes the requests of v2 plugins and parses the responses.
+
+    Requests that fail with a connection error, a 429 or a 5xx are retried up to
+    `retries` times, waiting `backoff` seconds before the first retry and twice
+    as long before each next one. Each attempt goes through the session it's
+    given, so through the tracker's limiter.
+
+    Responses are parsed on the event loop, or by `parse_workers` worker
+    processes if there are any. Parsing large HTML pages takes long enough to
+    hold up every other request on the loop; in workers, it runs on other cores.
+
+    With a `ResponseCache`, requests for URLs fetched before (from the same
+    mirror) are conditional, and the listings parsed from a response are reused
+    when the tracker says it hasn't changed.
+
+    Plugins that declare mirrors have their requests sent to the fastest one so
+    far. A request still running once it's slower than the `hedge_percentile`
+    of the tracker's recent requests is hedged: the next fastest mirror gets the
+    same request, the first answer wins and the other request is cancelled.
+    Retries go to the next mirror.
+
+    Attributes:
+      retries (int): How many times a failed request is made again.
+      backoff (float): Seconds to wait before the first retry.
+      parse_workers (int): Number of worker processes parsing responses. 0 to
+        parse on the event loop.
+      pool (ProcessPoolExecutor): The workers, started on first use.
+      responses (ResponseCache): The responses kept for revalidation. None if
+        requests are never conditional.
+      hedge_percentile (float): Latency percentile after which requests are
+        hedged. 0 never to hedge.
+      mirrors (dict): The `Mirrors` of each plugin hashed by plugin name.
+      hedged (int): Number of requests hedged.
+      hedges_won (int): Number of hedged requests the second mirror answered
+        first.
+
+    """
+
+    def __init__(
+        self,
+        retries: int = 1,
+        backoff: float = 0.5,
+        parse_workers: int = 0,
+        response_cache_size: int = 0,
+        hedge_percentile: float = 0.95,
+    ):  # pylint: disable=too-many-arguments
+        self.retries = retries
+        self.backoff = backoff
+        self.parse_workers = parse_workers
+        self.pool = None
+        self.responses = None
+        if response_cache_size:
+            self.responses = ResponseCache(response_cache_size)
+        self.hedge_percentile = hedge_percentile
+        self.mirrors = {}
+        self.hedged = 0
+        self.hedges_won = 0
+
+    async def search(
+        self,
+        session,
+        plugin: AbstractPluginV2,
+        search_param: str,
+        pages: range = range(1, 2),
+    ):
+        """Searches with a v2 plugin.
+
+        The requests for every page are made at once, so a deeper search takes
+        about as long as the slowest page rather than all of them in turn.
+
+        Arguments:
+          session (TimedSession): The session to make the requests with. Waiting
+            between retries counts as waiting on the network.
+          plugin (AbstractPluginV2): The plugin to search with.
+          search_param (str): The string to search for.
+          pages (range): The pages of results to fetch.
+
+        Returns:
+          The listings parsed from every response, in the order of the pages and
+          their requests.
+
+        Raises:
+          PluginResponseError: if a request kept failing with an error status.
+          aiohttp.ClientError: if a request kept failing to connect.
+
+        """
+        requests = [
+            request
+            for page in pages
+            for request in plugin.build_requests(search_param, page)
+        ]
+        mirrors = self.mirrors_of(plugin)
+        responses = await asyncio.gather(
+            *(self.fetch(session, mirrors, request) for request in requests)
+        )
+
+        torrents = []
+        for request, response in zip(requests, responses):
+            torrents.extend(await self.parse_once(plugin, request.url, response))
+        return torrents
+
+    def mirrors_of(self, plugin: AbstractPluginV2) -> Mirrors:
+        name = plugin.info()["name"]
+        if name not in self.mirrors:
+            self.mirrors[name] = Mirrors(plugin.domains(), self.hedge_percentile)
+        return self.mirrors[name]
+
+    async def fetch(
+        self, session, mirrors: Mirrors, request: PluginRequest
+    ) -> PluginResponse:
+        """Makes a request, retrying it while it fails in a way that may pass.
+
+        Returns the kept response itself if the tracker says it hasn't changed.
+
+        """
+        cached = None
+        if self.responses is not None:
+            cached = self.responses.get(request.url)
+
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                resp, body, source = await self.get(session, mirrors, request, cached)
+            except ClientConnectionError:
+                if last:
+                    raise
+            else:
+                if (
+                    resp.status == 304
+                    and cached is not None
+                    and cached.source == source
+                ):
+                    self.responses.not_modified += 1
+                    return cached.response
+                if 200 <= resp.status < 300:
+                    response = PluginResponse(resp.status, body, resp.charset)
+                    if self.responses is not None:
+                        self.responses.store(
+                            request.url, response, resp.headers, source
+                        )
+                    return response
+                if last or not retryable(resp.status):
+                    raise PluginResponseError(resp.status)
+
+            await session.timed(asyncio.sleep(self.backoff * 2**attempt))
+
+    async def get(self, session, mirrors: Mirrors, request: PluginRequest, cached):
+        """Makes one attempt at a request, hedging it if it's slow.
+
+        The attempt starts with the fastest mirror. A mirror that failed ranks
+        last, so each retry goes to the next one.
+
+        Arguments:
+          cached (CachedResponse): The response kept for the request, to
+            revalidate. None if there is none.
+
+        Returns:
+          A tuple of the form (response, body, URL requested).
+
+        """
+        ranked = mirrors.ranked()
+        delay = mirrors.hedge_delay() if self.hedge_percentile else None
+        if delay is None:
+            return await self.get_from(session, mirrors, ranked[0], request, cached)
+
+        first = asyncio.create_task(
+            self.get_from(session, mirrors, ranked[0], request, cached)
+        )
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+
+            self.hedged += 1
+            second = asyncio.create_task(
+                self.get_from(session, mirrors, ranked[1], request, cached)
+            )
+            tasks.append(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if answered(task):
+                        self.hedges_won += task is second
+                        return task.result()
+
+            # both failed: a failed response over an exception, for the retries
+            if second.exception() is None:
+                return second.result()
+            return first.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_from(
+        self, session, mirrors: Mirrors, domain: str, request: PluginRequest, cached
+    ):  # pylint: disable=too-many-arguments
+        """Requests a URL from one of the mirrors, timing it for their ranking.
+
+        The request is only conditional if the kept response came from the same
+        URL: another host's validators mean nothing to this one.
+
+        """
+        url = mirrors.url(request.url, domain)
+        headers = request.headers
+        if cached is not None and cached.source == url:
+            headers = cached.conditional_headers(headers)
+
+        start = perf_counter()
+        resp = None
+        try:
+            resp = await session.get(url, headers=headers)
+            body = await resp.read()
+        except asyncio.CancelledError:
+            mirrors.observe(domain, perf_counter() - start, finished=False)
+            raise
+        except (ClientError, asyncio.TimeoutError):
+            mirrors.failed(domain)
+            raise
+        finally:
+            # read or not (eg. a hedge that lost), the connection can go back
+            if resp is not None:
+                resp.release()
+
+        if retryable(resp.status):
+            mirrors.failed(domain)
+        else:
+            mirrors.observe(domain, perf_counter() - start)
+        return resp, body, url
+
+    async def parse_once(
+        self, plugin: AbstractPluginV2, url: str, response: PluginResponse
+    ) -> list:
+        """Parses a response, unless it's a kept one that was parsed already."""
+        if self.responses is None:
+            return await self.parse(plugin, response)
+
+        cached = self.responses.get(url)
+        if cached is not None and cached.response is response and cached.listings:
+            return cached.listings
+
+        listings = await self.parse(plugin, response)
+        self.responses.store_listings(url, response, listings)
+        return listings
+
+    async def parse(self, plugin: AbstractPluginV2, response: PluginResponse) -> list:
+        if not self.parse_workers:
+            return plugin.parse(response)
+
+        if self.pool is None:
+            # forking would copy the event loop's threads and their locks
+            self.pool = ProcessPoolExecutor(
+                self.parse_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, plugin.parse, response)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,155 @@
+"""Contains the adaptive per-tracker concurrency limiter"""
+import asyncio
+from collections import deque
+from time import monotonic
+
+from aiohttp import ClientError, ClientSession
+
+
+class LimiterFullError(Exception):
+    """Indicates that a tracker's limit and queue are both full."""
+
+    pass
+
+
+class AdaptiveLimiter:
+    """Limits the number of concurrent requests to one tracker (AIMD).
+
+    Every request that comes back quickly and successfully raises the limit by
+    `1 / limit`, ie. by about one per round of requests. A 429, a 5xx, a
+    connection error or a response slower than `latency_target` halves it, at
+    most once per round: requests that were already in flight when the limit
+    was cut don't cut it again.
+
+    Requests over the limit wait in a FIFO queue of at most `max_queue`; past
+    that, `acquire()` raises `LimiterFullError` straight away.
+
+    Attributes:
+      limit (float): Current concurrency limit.
+      min_limit (int): The limit never goes below this.
+      max_limit (int): The limit never goes above this.
+      max_queue (int): Maximum number of requests waiting for a slot.
+      latency_target (float): Slower responses (in seconds) count as overload.
+      in_flight (int): Number of requests currently holding a slot.
+      waiters (deque): Futures of the requests waiting for a slot.
+      last_drop (float): When the limit was last cut (monotonic time).
+
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        max_queue: int = 16,
+        latency_target: float = 3.0,
+    ):  # pylint: disable=too-many-arguments
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.waiters = deque()
+        self.last_drop = 0.0
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a new request would have to wait (or be turned away)."""
+        return self.in_flight >= int(self.limit)
+
+    async def acquire(self):
+        """Waits for a slot.
+
+        Raises:
+          LimiterFullError: if the queue is full.
+
+        """
+        if not self.waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+        if len(self.waiters) >= self.max_queue:
+            raise LimiterFullError()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)  # got a slot just as it was cancelled
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            raise
+
+    def release(self, started: float, latency: float = 0.0, overloaded=False):
+        """Frees a slot and adapts the limit to how the request went.
+
+        Arguments:
+          started (float): When the request was sent (monotonic time). None if
+            its outcome shouldn't affect the limit.
+          latency (float): How long the tracker took to respond.
+          overloaded (bool): Whether the tracker signalled overload.
+
+        """
+        self.in_flight -= 1
+
+        if started is not None:
+            if overloaded or latency > self.latency_target:
+                if started > self.last_drop:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self.last_drop = monotonic()
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class LimitedSession:
+    """Wraps a `ClientSession` so that a plugin's requests go through a limiter.
+
+    Requests (`get()`, `post()` and `request()`) hold their slot until the
+    body of the response has been read, so that the latency the limit adapts
+    to is that of the whole response. The body is kept by the response, for
+    the plugin to read again. Everything else is passed through to the session.
+
+    """
+
+    def __init__(self, session: ClientSession, limiter: AdaptiveLimiter):
+        self.session = session
+        self.limiter = limiter
+
+    async def get(self, *args, **kwargs):
+        return await self.limited(self.session.get, *args, **kwargs)
+
+    async def post(self, *args, **kwargs):
+        return await self.limited(self.session.post, *args, **kwargs)
+
+    async def request(self, *args, **kwargs):
+        return await self.limited(self.session.request, *args, **kwargs)
+
+    async def limited(self, method, *args, **kwargs):
+        """Makes a request with one of the session's methods, within the limit."""
+        await self.limiter.acquire()
+
+        started = monotonic()
+        try:
+            resp = await method(*args, **kwargs)
+            await resp.read()
+        except (ClientError, asyncio.TimeoutError):
+            self.limiter.release(started, monotonic() - started, overloaded=True)
+            raise
+        except BaseException:
+            self.limiter.release(None)
+            raise
+
+        overloaded = resp.status == 429 or resp.status >= 500
+        self.limiter.release(started, monotonic() - started, overloaded)
+        return resp
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
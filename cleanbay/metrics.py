@@ -0,0 +1,198 @@
+"""Contains counters and histograms rendered in the Prometheus text format"""
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Tuple
+
+# upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """A number that only goes up.
+
+    Everything runs on the event loop, so a plain int needs no lock.
+
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self, name: str, labels: str):
+        yield f"{name}{labels} {self.value}"
+
+
+class Histogram:
+    """Counts observations into buckets with fixed upper bounds.
+
+    Attributes:
+      bounds (tuple): Upper bounds of the buckets, sorted.
+      counts (list): Number of observations per bucket (not cumulative), with
+      a last one for the observations above every bound.
+      sum (float): Sum of all observations.
+
+    """
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: str):
+        # prometheus buckets are cumulative and labelled with their bound
+        prefix = labels[1:-1] + "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{labels} {self.sum}"
+        yield f"{name}_count{labels} {cumulative}"
+
+
+class Family:
+    """Metrics of one kind split by the value of a label, eg. by plugin.
+
+    A metric is created the first time its label value is seen; after that,
+    `labels()` is a dict lookup.
+
+    """
+
+    def __init__(self, factory: Callable, label: str):
+        self.factory = factory
+        self.label = label
+        self.children = {}
+
+    def labels(self, value: str):
+        child = self.children.get(value)
+        if child is None:
+            child = self.children[value] = self.factory()
+        return child
+
+    def samples(self, name: str, labels: str):  # pylint: disable=unused-argument
+        for value, child in self.children.items():
+            yield from child.samples(name, f'{{{self.label}="{value}"}}')
+
+
+class Callback:
+    """A value read from a callback whenever the metrics are rendered."""
+
+    __slots__ = ("read",)
+
+    def __init__(self, read: Callable[[], float]):
+        self.read = read
+
+    def samples(self, name: str, labels: str):
+        yield f"{name}{labels} {self.read()}"
+
+
+class Registry:
+    """Holds named metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, name: str, kind: str, description: str, metric):
+        self.metrics[name] = (kind, description, metric)
+        return metric
+
+    def counter(
+        self,
+        name: str,
+        description: str,
+        label: str = None,
+        read: Callable[[], float] = None,
+    ):
+        """Registers a counter, split by `label` if given.
+
+        Counters kept elsewhere (eg. by the cache) can be exposed by passing a
+        `read` callback instead.
+
+        """
+        if read is not None:
+            metric = Callback(read)
+        else:
+            metric = Counter() if label is None else Family(Counter, label)
+        return self.register(name, "counter", description, metric)
+
+    def histogram(self, name: str, description: str, label: str = None):
+        metric = Histogram() if label is None else Family(Histogram, label)
+        return self.register(name, "histogram", description, metric)
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]):
+        return self.register(name, "gauge", description, Callback(read))
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, description, metric) in self.metrics.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(metric.samples(name, ""))
+        return "\n".join(lines) + "\n"
+
+
+class TimedSession:
+    """Wraps a session to add up the time a plugin spends waiting on the network.
+
+    That's the time spent in `get()` and in reading the body of its responses
+    (`text()`, `json()` or `read()`). The rest of a plugin's search is parsing.
+    While several requests are in flight (eg. hedged ones), the time counts once.
+
+    Attributes:
+      waited (float): Seconds spent waiting so far.
+      in_flight (int): Number of waits in progress.
+      since (float): When the waits in progress started (perf counter).
+
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.waited = 0.0
+        self.in_flight = 0
+        self.since = 0.0
+
+    async def get(self, *args, **kwargs):
+        return TimedResponse(await self.timed(self.session.get(*args, **kwargs)), self)
+
+    async def timed(self, awaitable):
+        if not self.in_flight:
+            self.since = perf_counter()
+        self.in_flight += 1
+        try:
+            return await awaitable
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self.waited += perf_counter() - self.since
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class TimedResponse:
+    """Wraps a response so that reading its body counts as waiting."""
+
+    def __init__(self, response, session: TimedSession):
+        self.response = response
+        self.session = session
+
+    async def text(self, *args, **kwargs):
+        return await self.session.timed(self.response.text(*args, **kwargs))
+
+    async def json(self, *args, **kwargs):
+        return await self.session.timed(self.response.json(*args, **kwargs))
+
+    async def read(self):
+        return await self.session.timed(self.response.read())
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
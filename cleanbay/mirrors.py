@@ -0,0 +1,90 @@
+"""Contains the ranking of a tracker's mirrors by how fast they answer"""
+from collections import deque
+from typing import Optional
+
+# weight of the latest latency in a mirror's moving average
+SMOOTHING = 0.2
+
+# requests to see before hedging, so that the percentile means something
+MIN_SAMPLES = 20
+
+# smallest latency (in seconds) a mirror that failed is ranked with
+FAILURE_LATENCY = 1.0
+
+
+class Mirrors:
+    """The domains a tracker can be reached at, fastest first.
+
+    Every request's latency updates an exponentially weighted moving average of
+    its mirror, and mirrors are ranked by it. A mirror that hasn't been tried
+    yet keeps its declared rank behind the ones that answered, but ahead of the
+    ones that failed; it's tried when a request is hedged or fails over to it.
+
+    Requests are hedged once they take longer than the `percentile` of the
+    tracker's recent latencies: rarely enough not to double the load, but soon
+    enough to cut the tail.
+
+    Attributes:
+      domains (list): The domains, primary first, without trailing slashes.
+      percentile (float): Latency percentile after which to hedge.
+      latencies (dict): Moving average latency (in seconds) of each domain that
+        has been tried.
+      failing (set): The domains whose latest request failed.
+      recent (deque): The latest latencies across mirrors.
+
+    """
+
+    def __init__(self, domains: list, percentile: float = 0.95, window: int = 100):
+        self.domains = [domain.rstrip("/") for domain in domains]
+        self.percentile = percentile
+        self.latencies = {}
+        self.failing = set()
+        self.recent = deque(maxlen=window)
+
+    def ranked(self) -> list:
+        """Returns the domains, fastest first and the failing ones last."""
+        tried = sorted(self.latencies, key=self.latencies.get)
+        untried = [domain for domain in self.domains if domain not in self.latencies]
+        return (
+            [domain for domain in tried if domain not in self.failing]
+            + untried
+            + [domain for domain in tried if domain in self.failing]
+        )
+
+    def observe(self, domain: str, seconds: float, finished: bool = True):
+        """Records how long a request to a mirror took.
+
+        Requests that were cancelled (`finished` false) count with how long they
+        took up to then, which is less than they would have: a mirror that keeps
+        losing still drops in the ranking, just more slowly. They're left out of
+        the percentile.
+
+        """
+        if finished:
+            self.recent.append(seconds)
+            self.failing.discard(domain)
+        average = self.latencies.get(domain)
+        if average is None:
+            self.latencies[domain] = seconds
+        else:
+            self.latencies[domain] = average + SMOOTHING * (seconds - average)
+
+    def failed(self, domain: str):
+        """Ranks a mirror that failed behind every other, until it answers again."""
+        self.failing.add(domain)
+        others = (latency for name, latency in self.latencies.items() if name != domain)
+        self.latencies[domain] = max(max(others, default=0.0) * 2, FAILURE_LATENCY)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which to hedge a request. None not to hedge (yet)."""
+        if len(self.domains) < 2 or len(self.recent) < MIN_SAMPLES:
+            return None
+        latencies = sorted(self.recent)
+        return latencies[min(int(len(latencies) * self.percentile), len(latencies) - 1)]
+
+    def url(self, url: str, domain: str) -> str:
+        """Points a URL at the primary domain to `domain` instead."""
+        primary = self.domains[0]
+        if domain == primary or not url.startswith(primary):
+            return url
+        return domain + url[len(primary) :]
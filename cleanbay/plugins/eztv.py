@@ -1,23 +1,31 @@
 """Contains the impl  for the eztv plugin"""
 
-from bs4 import BeautifulSoup, SoupStrainer
-from requests import get as sync_get
+from urllib.parse import quote as uri_quote
 
-from ..abstract_plugin import AbstractPlugin
+from ..abstract_plugin import AbstractPluginV2, PluginRequest
 from ..torrent import Torrent, Category
 
 
-class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
-    def verify_status(self):
-        return sync_get(self.info()["domain"], timeout=10).status_code == 200
+class CBPlugin(AbstractPluginV2):  # pylint: disable=missing-class-docstring
+    INFO = {
+        "name": "eztv",
+        "category": Category.TV,
+        "domain": "https://eztv.re",
+        "mirrors": ["https://eztv.wf", "https://eztv.tf", "https://eztv.yt"],
+        "search_url": "https://eztv.re/search/",
+    }
 
-    async def search(self, session, search_param):
-        info = self.info()
-        url = info["search_url"] + search_param
-        resp = await session.get(url)
+    def build_requests(self, search_param, page=1):
+        # the search is a path segment: slashes are quoted too
+        url = self.INFO["search_url"] + uri_quote(search_param, safe="")
+        return [PluginRequest(url)]
+
+    def parse(self, response):
+        # pylint: disable=import-outside-toplevel
+        from bs4 import BeautifulSoup, SoupStrainer
 
         strainer = SoupStrainer("table")
-        resp = BeautifulSoup(await resp.text(), features="lxml", parse_only=strainer)
+        resp = BeautifulSoup(response.text(), features="lxml", parse_only=strainer)
 
         table = resp.findChildren("table")[4]
         if len(table) == 0:
@@ -48,11 +56,3 @@ class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
                 )
             )
         return torrents
-
-    def info(self):
-        return {
-            "name": "eztv",
-            "category": Category.TV,
-            "domain": "https://eztv.re",
-            "search_url": "https://eztv.re/search/",
-        }
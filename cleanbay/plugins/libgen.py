@@ -1,28 +1,32 @@
 """Contains the imple for the libgen plugin"""
 
 from urllib.parse import quote as uri_quote
-import aiohttp
-
-import requests
-
-from bs4 import BeautifulSoup, SoupStrainer
 
 from ..torrent import Torrent, Category
-from ..abstract_plugin import AbstractPlugin
+from ..abstract_plugin import AbstractPluginV2, PluginRequest, PluginResponse
 
 
-class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
-    def verify_status(self) -> bool:
-        domain = self.info()["domain"]
-        return requests.get(domain, timeout=10).status_code == 200
+class CBPlugin(AbstractPluginV2):  # pylint: disable=missing-class-docstring
+    INFO = {
+        "name": "libgen",
+        "category": Category.BOOKS,
+        "domain": "https://libgen.is",
+        "mirrors": ["https://libgen.rs", "https://libgen.st"],
+        # book listings hardly change, and libgen doesn't report seeders
+        "ttl": 7 * 24 * 60 * 60,
+        "max_pages": 5,
+    }
 
-    async def search(self, session: aiohttp.ClientSession, search_param: str) -> list:
-        domain = self.info()["domain"]
-        search_param = uri_quote(search_param)
-        res = await session.get(f"{domain}/search.php?req={search_param}")
+    def build_requests(self, search_param: str, page: int = 1) -> list:
+        url = f"{self.INFO['domain']}/search.php?req={uri_quote(search_param)}"
+        return [PluginRequest(url if page == 1 else f"{url}&page={page}")]
+
+    def parse(self, response: PluginResponse) -> list:
+        # pylint: disable=import-outside-toplevel
+        from bs4 import BeautifulSoup, SoupStrainer
 
         strainer = SoupStrainer("table")
-        soup = BeautifulSoup(await res.text(), features="lxml", parse_only=strainer)
+        soup = BeautifulSoup(response.text(), features="lxml", parse_only=strainer)
 
         table = soup.findChildren("table")[2]
 
@@ -67,10 +71,3 @@ class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
             )
 
         return torrents
-
-    def info(self) -> dict:
-        return {
-            "name": "libgen",
-            "category": Category.BOOKS,
-            "domain": "https://libgen.is",
-        }
@@ -1,30 +1,29 @@
 """Contains the impl for the linuxtracker plugin"""
 
-from bs4 import BeautifulSoup
-from requests import get as sync_get
+from urllib.parse import quote as uri_quote
 
-from ..abstract_plugin import AbstractPlugin
+from ..abstract_plugin import AbstractPluginV2, PluginRequest
 from ..torrent import Torrent, Category
 
 
-class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
-    def info(self):
-        return {
-            "name": "linuxtracker",
-            "category": Category.SOFTWARE,
-            "domain": "https://linuxtracker.org",
-        }
+class CBPlugin(AbstractPluginV2):  # pylint: disable=missing-class-docstring
+    INFO = {
+        "name": "linuxtracker",
+        "category": Category.SOFTWARE,
+        "domain": "https://linuxtracker.org",
+        "max_pages": 3,
+    }
 
-    def verify_status(self):
-        domain = self.info()["domain"]
-        return sync_get(domain, timeout=10).status_code == 200
-
-    async def search(self, session, search_param):
-        domain = self.info()["domain"]
+    def build_requests(self, search_param, page=1):
+        domain = self.INFO["domain"]
         search_url = "{}/index.php?page=torrents&search={}&category=0&active=1"
+        url = search_url.format(domain, uri_quote(search_param))
+        return [PluginRequest(url if page == 1 else f"{url}&pages={page}")]
+
+    def parse(self, response):
+        from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
 
-        resp = await session.get(search_url.format(domain, search_param))
-        soup = BeautifulSoup(await resp.text(), features="lxml")
+        soup = BeautifulSoup(response.text(), features="lxml")
 
         table = soup.find_all("table", {"class": "lista"})[4]
         if len(table) == 0:
@@ -1,28 +1,37 @@
 """Contains the impl for the nyaa plugin"""
 
-from bs4 import BeautifulSoup, SoupStrainer
-from requests import get as sync_get
+from urllib.parse import quote as uri_quote
 
-from ..abstract_plugin import AbstractPlugin
+from ..abstract_plugin import AbstractPluginV2, PluginRequest
 from ..torrent import Torrent, Category
 
 
-class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
-    def verify_status(self):
-        return sync_get(self.info()["domain"], timeout=10).status_code == 200
+class CBPlugin(AbstractPluginV2):  # pylint: disable=missing-class-docstring
+    INFO = {
+        "name": "nyaa",
+        "category": Category.TV,
+        "domain": "https://nyaa.iss.ink/",
+        "mirrors": ["https://nyaa.si"],
+        "search_url": "https://nyaa.iss.ink/?f=0&c=0_0&q=",
+        "max_pages": 5,
+    }
 
-    async def search(self, session, search_param):
-        info = self.info()
-        url = info["search_url"] + search_param
-        resp = await session.get(url)
+    def build_requests(self, search_param, page=1):
+        url = self.INFO["search_url"] + uri_quote(search_param)
+        return [PluginRequest(url if page == 1 else f"{url}&p={page}")]
 
-        strainer = SoupStrainer("table")
-        resp = BeautifulSoup(await resp.text(), features="lxml", parse_only=strainer)
+    def parse(self, response):
+        # pylint: disable=import-outside-toplevel
+        from bs4 import BeautifulSoup, SoupStrainer
 
-        table = resp.findChildren("table")[0]
+        strainer = SoupStrainer("table")
+        resp = BeautifulSoup(response.text(), features="lxml", parse_only=strainer)
 
-        if len(table) == 0:
+        # searches with no results, and pages past the last, have no table
+        tables = resp.findChildren("table")
+        if not tables or len(tables[0]) == 0:
             return []
+        table = tables[0]
 
         torrents = []
         for row in table.findChildren("tr")[1:]:
@@ -57,11 +66,3 @@ class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
                 )
             )
         return torrents
-
-    def info(self):
-        return {
-            "name": "nyaa",
-            "category": Category.TV,
-            "domain": "https://nyaa.iss.ink/",
-            "search_url": "https://nyaa.iss.ink/?f=0&c=0_0&q=",
-        }
@@ -1,77 +1,73 @@
 """Contains the impl for the piratebay plugin"""
 
-from requests import get as get_sync
-from urllib.parse import quote as uri_quote
 from datetime import datetime, timezone
+from urllib.parse import quote as uri_quote
 
 import math
 
-from ..abstract_plugin import AbstractPlugin
-from ..torrent import Torrent, Category
+from ..abstract_plugin import AbstractPluginV2, PluginRequest
+from ..torrent import Torrent, Category, TrackerSet
+
+TRACKERS = TrackerSet(
+    [
+        "udp://tracker.coppersurfer.tk:6969/announce",
+        "udp://tracker.openbittorrent.com:6969/announce",
+        "udp://9.rarbg.to:2710/announce",
+        "udp://9.rarbg.me:2780/announce",
+        "udp://9.rarbg.to:2730/announce",
+        "udp://tracker.opentrackr.org:1337",
+        "http://p4p.arenabg.com:1337/announce",
+        "udp://tracker.torrent.eu.org:451/announce",
+        "udp://tracker.tiny-vps.com:6969/announce",
+        "udp://open.stealth.si:80/announce",
+    ]
+)
 
 
-class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
-    def info(self):
-        return {
-            "name": "piratebay",
-            "category": Category.GENERAL,
-            "domain": "https://apibay.org",
-            # pylint: disable=line-too-long
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36",
-        }
+class CBPlugin(AbstractPluginV2):  # pylint: disable=missing-class-docstring
+    INFO = {
+        "name": "piratebay",
+        "category": Category.GENERAL,
+        "domain": "https://apibay.org",
+        # pylint: disable=line-too-long
+        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36",
+    }
 
     def verify_status(self):
-        domain, useragent = self.info()["domain"], self.info()["user-agent"]
+        from requests import get as get_sync  # pylint: disable=import-outside-toplevel
+
+        domain, useragent = self.INFO["domain"], self.INFO["user-agent"]
         return (
             get_sync(domain, headers={"user-agent": useragent}, timeout=10).status_code
             != 500
         )
 
-    async def search(self, session, search_param):
-        domain, useragent = self.info()["domain"], self.info()["user-agent"]
-
-        resp = await session.get(
-            f"{domain}/q.php?q={search_param}&cat=", headers={"user-agent": useragent}
-        )
-
-        if resp.status != 200:
-            return []
+    def build_requests(self, search_param, page=1):
+        domain, useragent = self.INFO["domain"], self.INFO["user-agent"]
+        return [
+            PluginRequest(
+                f"{domain}/q.php?q={uri_quote(search_param)}&cat=",
+                {"user-agent": useragent},
+            )
+        ]
 
+    def parse(self, response):
         torrents = []
-        for element in await resp.json():
+        for element in response.json():
             torrents.append(
                 Torrent(
                     element["name"],
-                    self.make_magnet(element["info_hash"], element["name"]),
+                    element["info_hash"],
                     int(element["seeders"]),
                     int(element["leechers"]),
                     self.format_size(int(element["size"])),
                     element["username"],
                     self.format_date(int(element["added"])),
+                    TRACKERS,
                 )
             )
         return torrents
 
-    def make_magnet(self, ih, name):
-        return f"magnet:?xt=urn:btih:{ih}&dn={uri_quote(name)}&tr={self.trackers()}"
-
-    def trackers(self):
-        trackers = "&tr=".join(
-            [
-                "udp://tracker.coppersurfer.tk:6969/announce",
-                "udp://tracker.openbittorrent.com:6969/announce",
-                "udp://9.rarbg.to:2710/announce",
-                "udp://9.rarbg.me:2780/announce",
-                "udp://9.rarbg.to:2730/announce",
-                "udp://tracker.opentrackr.org:1337",
-                "http://p4p.arenabg.com:1337/announce",
-                "udp://tracker.torrent.eu.org:451/announce",
-                "udp://tracker.tiny-vps.com:6969/announce",
-                "udp://open.stealth.si:80/announce",
-            ]
-        )
-        return uri_quote(trackers)
-
     def format_size(self, size_bytes):
         if size_bytes == 0:
             return "0B"
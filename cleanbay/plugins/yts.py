@@ -1,31 +1,43 @@
 """Contains the impl for the yts plugin"""
 
-from requests import get as get_sync
 from urllib.parse import quote as uri_quote
 
-from ..abstract_plugin import AbstractPlugin
-from ..torrent import Torrent, Category
+from ..abstract_plugin import AbstractPluginV2, PluginRequest
+from ..torrent import Torrent, Category, TrackerSet
 
+TRACKERS = TrackerSet(
+    [
+        "udp://open.demonii.com:1337/announce",
+        "udp://tracker.openbittorrent.com:80",
+        "udp://tracker.coppersurfer.tk:6969",
+        "udp://glotorrents.pw:6969/announce",
+        "udp://tracker.opentrackr.org:1337/announce",
+        "udp://torrent.gresille.org:80/announce",
+        "udp://p4p.arenabg.com:1337",
+        "udp://tracker.leechers-paradise.org:6969",
+    ]
+)
 
-class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
-    def verify_status(self) -> bool:
-        domain = self.info()["domain"]
-        return get_sync(domain, timeout=10).status_code == 200
 
-    def info(self) -> dict:
-        return {
-            "name": "yts",
-            "category": Category.CINEMA,
-            "api_url": "https://yts.mx/api/v2/list_movies.json?query_term=",
-            "domain": "https://yts.mx",
-        }
+class CBPlugin(AbstractPluginV2):  # pylint: disable=missing-class-docstring
+    INFO = {
+        "name": "yts",
+        "category": Category.CINEMA,
+        "api_url": "https://yts.mx/api/v2/list_movies.json?query_term=",
+        "domain": "https://yts.mx",
+        "mirrors": ["https://yts.lt", "https://yts.am"],
+        "max_pages": 5,
+    }
 
-    async def search(self, session, search_param):
-        api_url = self.info()["api_url"]
-        resp = await session.get(api_url + uri_quote(search_param))
-        resp = await resp.json()
+    def build_requests(self, search_param, page=1):
+        url = self.INFO["api_url"] + uri_quote(search_param)
+        return [PluginRequest(url if page == 1 else f"{url}&page={page}")]
 
-        if resp["status"] != "ok" or resp["data"]["movie_count"] == 0:
+    def parse(self, response):
+        resp = response.json()
+
+        # pages past the last one have a count but no movies
+        if resp["status"] != "ok" or not resp["data"].get("movies"):
             return []
 
         torrents = []
@@ -33,7 +45,6 @@ class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
             max_seed_torrent = max(element["torrents"], key=lambda x: x["seeds"])
 
             title_long = element["title_long"]
-            slug = element["slug"]
             quality = max_seed_torrent["quality"]
             type_ = max_seed_torrent["type"]
             info_hash = max_seed_torrent["hash"]
@@ -45,31 +56,14 @@ class CBPlugin(AbstractPlugin):  # pylint: disable=missing-class-docstring
             torrents.append(
                 Torrent(
                     f"{title_long} [{quality}] [{type_}]",
-                    self.make_magnet(slug, info_hash),
+                    info_hash,
                     int(seeders),
                     int(leechers),
                     size,
                     "yts",
                     date_uploaded,
+                    TRACKERS,
                 )
             )
 
         return torrents
-
-    def make_magnet(self, slug, ih):
-        return f"magnet:?xt=urn:btih:{ih}&dn={slug}&tr={self.trackers()}"
-
-    def trackers(self):
-        trackers = "&tr=".join(
-            [
-                "udp://open.demonii.com:1337/announce",
-                "udp://tracker.openbittorrent.com:80",
-                "udp://tracker.coppersurfer.tk:6969",
-                "udp://glotorrents.pw:6969/announce",
-                "udp://tracker.opentrackr.org:1337/announce",
-                "udp://torrent.gresille.org:80/announce",
-                "udp://p4p.arenabg.com:1337",
-                "udp://tracker.leechers-paradise.org:6969",
-            ]
-        )
-        return uri_quote(trackers)
@@ -1,4 +1,5 @@
 """Contains PluginsManager and NoPluginsError"""
+from concurrent.futures import ThreadPoolExecutor
 from importlib import import_module
 from os.path import isfile, basename
 import glob
@@ -13,36 +14,51 @@ class NoPluginsError(Exception):
 class PluginsManager:
     """Manages the loading and filtering of plugins.
 
+    Loading is split in two: discovering the plugins imports their modules and
+    checks their metadata, without touching the network; probing asks each
+    plugin's service if it's up and drops the plugins whose service isn't. A
+    server that forks its workers probes once, before forking, instead of once
+    per worker.
+
     Attributes:
+      directory (str): The directory the plugins are loaded from
       plugins (dict): Plugin objects hashed by their names
+      probed (bool): Whether the plugins have been probed yet
 
     """
 
-    def __init__(self, directory: str):
+    def __init__(self, directory: str, probe: bool = True):
         """Loads the plugins.
 
         Arguments:
           directory (str): The directory to load the plugins from.
+          probe (bool): Probe the plugins straight away. Otherwise every plugin
+            discovered is used until `probe()` is called.
 
         """
+        self.directory = directory
         self.plugins = {}
+        self.probed = False
+
+        self.discover()
+        if probe:
+            self.probe()
 
+    def discover(self):
+        """Imports the plugin modules and keeps the plugins with valid metadata."""
         # import all the files ending with `.py` except __init__
-        modules = glob.glob(f"{directory}/*.py")
+        modules = glob.glob(f"{self.directory}/*.py")
         plugins = [
             import_module(f"cleanbay.plugins.{basename(f)[:-3]}")
             for f in modules
             if isfile(f) and not f.endswith("__init__.py")
         ]
 
-        # filter out the unusable plugins
         for plugin in plugins:
             try:
                 plugin = plugin.CBPlugin()
                 info = plugin.info()
 
-                if not plugin.verify_status():
-                    continue
                 if ("name" not in info) or ("category" not in info):
                     continue
 
@@ -53,6 +69,22 @@ class PluginsManager:
             except:  # pylint: disable=bare-except
                 pass
 
+    def probe(self):
+        """Drops the plugins whose service is down.
+
+        The services are all asked at once, so probing takes as long as the
+        slowest of them rather than all of them in turn.
+
+        """
+        plugins = list(self.plugins.items())
+        if plugins:
+            with ThreadPoolExecutor(len(plugins)) as pool:
+                up = list(pool.map(is_up, (plugin for _, plugin in plugins)))
+            self.plugins = {
+                name: plugin for (name, plugin), is_ok in zip(plugins, up) if is_ok
+            }
+        self.probed = True
+
     def filter_plugins(
         self,
         include_categories: list,
@@ -111,3 +143,11 @@ class PluginsManager:
                     filtered_plugins.remove(plugin)
 
         return list(filtered_plugins)
+
+
+def is_up(plugin) -> bool:
+    """Whether a plugin's service is up, counting errors as down."""
+    try:
+        return bool(plugin.verify_status())
+    except:  # pylint: disable=bare-except
+        return False
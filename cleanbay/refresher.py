@@ -0,0 +1,173 @@
+"""Contains the scheduler that keeps the cache entries of trending searches warm"""
+import asyncio
+import logging
+from heapq import nlargest
+from time import monotonic
+from typing import Tuple
+
+# a search's rate halves every this many seconds without a request
+HALF_LIFE = 300.0
+
+# searches with a lower (decayed) request count aren't trending, whatever
+# their rank. Also the point below which a search is forgotten.
+MIN_SCORE = 2.0
+FORGET_SCORE = 0.1
+
+# once more than `max_keys` searches are counted, the coldest are forgotten down
+# to this fraction of it
+PRUNE_TO = 0.9
+
+logger = logging.getLogger(__name__)
+
+
+class Refresher:
+    """Re-fetches the most requested searches shortly before they expire.
+
+    Every search (hit or miss) bumps an exponentially decaying request count for
+    its cache key. Every `interval` seconds, the `top_k` keys with the highest
+    counts whose cache entries expire within `lead_time` are searched again in
+    the background, so that they never expire while they're popular.
+
+    Refreshes go through the backend's per-tracker limiters and admission
+    controller like any miss, skip trackers that are already at their limit, and
+    share a budget of `budget` refreshes per minute.
+
+    At most `max_keys` searches are counted, so that each round ranks a bounded
+    number of them: past that, the least requested ones are forgotten.
+
+    Attributes:
+      backend (Backend): The backend whose cache is kept warm.
+      top_k (int): How many of the most requested searches are kept warm.
+      lead_time (float): How long (in seconds) before expiry an entry is
+      refreshed.
+      budget (float): Maximum number of refreshes per minute.
+      interval (float): Seconds between rounds of refreshes.
+      max_keys (int): Most searches counted at a time.
+      scores (dict): Tuples of (decayed request count, time of last update)
+      hashed by search term and plugin names.
+      tokens (float): Refreshes left in the budget.
+      last_fill (float): When the budget was last topped up (monotonic time).
+      refreshed (int): Number of refreshes made so far.
+
+    """
+
+    def __init__(
+        self,
+        backend,
+        top_k: int = 20,
+        lead_time: float = 30.0,
+        budget: float = 60.0,
+        interval: float = 5.0,
+        max_keys: int = 10000,
+    ):  # pylint: disable=too-many-arguments
+        self.backend = backend
+        self.top_k = top_k
+        self.lead_time = lead_time
+        self.budget = budget
+        self.interval = interval
+        self.max_keys = max_keys
+        self.scores = {}
+        self.tokens = budget
+        self.last_fill = monotonic()
+        self.refreshed = 0
+
+    def record(self, search_term: str, plugins: list):
+        """Counts a request for a search."""
+        key = (search_term, frozenset(plugin.info()["name"] for plugin in plugins))
+        now = monotonic()
+        score = self.decayed(key, now) if key in self.scores else 0.0
+        self.scores[key] = (score + 1, now)
+
+        if len(self.scores) > self.max_keys:
+            self.prune(now)
+
+    def prune(self, now: float):
+        """Forgets the least requested searches, down to `PRUNE_TO` of `max_keys`.
+
+        Pruning a tenth of the keys at once keeps it rare, so that `record()`
+        stays constant time on average.
+
+        """
+        keep = nlargest(
+            int(self.max_keys * PRUNE_TO),
+            self.scores,
+            lambda key: self.decayed(key, now),
+        )
+        self.scores = {key: self.scores[key] for key in keep}
+
+    def decayed(self, key: Tuple, now: float) -> float:
+        score, updated = self.scores[key]
+        return score * 0.5 ** ((now - updated) / HALF_LIFE)
+
+    def trending(self) -> list:
+        """Returns the `top_k` most requested keys, forgetting the cold ones."""
+        now = monotonic()
+        current = {key: self.decayed(key, now) for key in self.scores}
+        for key, score in current.items():
+            if score < FORGET_SCORE:
+                del self.scores[key]
+
+        hot = nlargest(self.top_k, current.items(), lambda x: x[1])
+        return [key for key, score in hot if score >= MIN_SCORE]
+
+    def take_token(self) -> bool:
+        """Takes a refresh out of the budget, if there is one left."""
+        now = monotonic()
+        elapsed, self.last_fill = now - self.last_fill, now
+        self.tokens = min(self.budget, self.tokens + elapsed * self.budget / 60)
+
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def due(self) -> list:
+        """Returns the (search_term, plugins) of trending entries about to expire"""
+        plugins_by_name = self.backend.plugins_manager.plugins
+        cache = self.backend.cache
+
+        searches = []
+        for search_term, names in self.trending():
+            if not names.issubset(plugins_by_name):
+                continue
+            plugins = [plugins_by_name[name] for name in names]
+
+            entry = cache.entry(search_term, plugins)
+            if entry is None or cache.ttl_remaining(entry) > self.lead_time:
+                continue
+            if self.backend.saturated(plugins):
+                continue
+            searches.append((search_term, plugins))
+
+        return searches
+
+    async def refresh_due(self):
+        """Refreshes the due entries that fit in the budget."""
+        searches = []
+        for search in self.due():
+            if not self.take_token():
+                break
+            searches.append(search)
+
+        if not searches:
+            return
+
+        async with self.backend.make_session() as session:
+            refreshed = await asyncio.gather(
+                *(
+                    self.backend.refresh(*search, session, self.lead_time)
+                    for search in searches
+                ),
+                return_exceptions=True,
+            )
+        self.refreshed += sum(result is True for result in refreshed)
+
+    async def run(self):
+        """Refreshes due entries every `interval` seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_due()
+            except Exception:  # pylint: disable=broad-except
+                # a failed round mustn't stop the next ones
+                logger.exception("refreshing trending searches failed")
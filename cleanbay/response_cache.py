@@ -0,0 +1,95 @@
+"""Contains the cache of raw tracker responses revalidated with conditional requests"""
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from .abstract_plugin import PluginResponse
+
+
+class CachedResponse(NamedTuple):
+    """A response kept for revalidation, along with what it was parsed into.
+
+    Attributes:
+      response (PluginResponse): The response as it was received.
+      source (str): The URL it was received from, which may be a mirror's.
+      etag (str): Its `ETag` header, if any.
+      last_modified (str): Its `Last-Modified` header, if any.
+      listings (list): The `Torrent`s parsed from it, once parsed.
+
+    """
+
+    response: PluginResponse
+    source: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    listings: Optional[list] = None
+
+    def conditional_headers(self, headers: dict = None) -> dict:
+        """Adds the response's validators to a request's `headers`."""
+        headers = dict(headers or {})
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Keeps the latest response for each URL whose tracker sent validators.
+
+    When a URL is requested again from the same host, eg. because the search's
+    cache entry has expired, the request is made conditional with `If-None-Match` and
+    `If-Modified-Since`. If the tracker answers with a 304, neither the page
+    nor its parsing are paid for again: the kept response and its listings are
+    reused.
+
+    Responses without an `ETag` or `Last-Modified` header can't be revalidated
+    and aren't kept. The least recently used responses are dropped first.
+
+    Attributes:
+      max_size (int): Maximum number of responses kept.
+      responses (OrderedDict): `CachedResponse`s hashed by URL, least recently
+        used first.
+      not_modified (int): Number of requests answered with a 304.
+
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.responses = OrderedDict()
+        self.not_modified = 0
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        cached = self.responses.get(url)
+        if cached is not None:
+            self.responses.move_to_end(url)
+        return cached
+
+    def store(
+        self, url: str, response: PluginResponse, resp_headers, source: str = None
+    ):
+        """Keeps a response, if its tracker sent validators for it.
+
+        Arguments:
+          url (str): The URL the response is kept under.
+          source (str): The URL it was received from, `url` if not given. Its
+            validators only hold for that URL's host.
+
+        """
+        etag = resp_headers.get("ETag")
+        last_modified = resp_headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            self.responses.pop(url, None)
+            return
+
+        self.responses[url] = CachedResponse(
+            response, source or url, etag, last_modified
+        )
+        self.responses.move_to_end(url)
+        while len(self.responses) > self.max_size:
+            self.responses.popitem(last=False)
+
+    def store_listings(self, url: str, response: PluginResponse, listings: list):
+        """Records what a kept response was parsed into."""
+        cached = self.responses.get(url)
+        if cached is not None and cached.response is response:
+            self.responses[url] = cached._replace(listings=listings)
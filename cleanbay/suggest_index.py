@@ -0,0 +1,134 @@
+"""Contains the prefix index that backs search suggestions"""
+from bisect import bisect_left
+from heapq import nlargest
+from time import monotonic
+from typing import List
+
+from .torrent import tokenize
+
+# scores given to a search term each time it is searched, and to a torrent name
+# each time a plugin returns it. Searches are what people actually type.
+QUERY_WEIGHT = 1.0
+NAME_WEIGHT = 0.1
+
+# longest suggestion kept, in characters
+MAX_TERM_LENGTH = 80
+
+# completions of prefixes matching more terms than this are memoized for a few
+# seconds, as ranking them takes longer than a keystroke should
+MEMO_MIN_MATCHES = 500
+MEMO_SECONDS = 5.0
+MEMO_MAX_SIZE = 1024
+
+
+def normalize(text: str) -> str:
+    return " ".join(tokenize(text))[:MAX_TERM_LENGTH]
+
+
+class SuggestIndex:
+    """Keeps the most popular search terms and torrent names in a sorted array.
+
+    Completions for a prefix are a contiguous slice of the array, found with a
+    binary search, of which the highest scoring ones are returned.
+
+    New terms are collected and merged into the array in one go on the next
+    completion, rather than inserted one by one, which moves the whole tail of
+    the array every time. Adding a term forgets the memoized completions of its
+    prefixes, so they're never staler than the scores.
+
+    Attributes:
+      max_terms (int): Maximum number of terms kept. When it is exceeded, the
+      lowest scoring tenth is dropped.
+      terms (list): The terms, sorted.
+      pending (list): Terms added since the last completion, not in `terms` yet.
+      scores (dict): Popularity of each term.
+      memo (dict): Recent completions of short, common prefixes, hashed by
+      prefix and then by limit.
+
+    """
+
+    def __init__(self, max_terms: int):
+        """Initializes the index.
+
+        Arguments:
+          max_terms (int): Maximum number of terms to keep.
+
+        """
+        self.max_terms = max_terms
+        self.terms = []
+        self.pending = []
+        self.scores = {}
+        self.memo = {}
+
+    def add(self, text: str, weight: float = QUERY_WEIGHT):
+        """Adds a term, or makes an existing one more popular."""
+        term = normalize(text)
+        if not term:
+            return
+
+        self.forget(term)
+        if term in self.scores:
+            self.scores[term] += weight
+            return
+
+        self.scores[term] = weight
+        self.pending.append(term)
+        if len(self.scores) > self.max_terms:
+            self.trim()
+
+    def add_names(self, listings: list):
+        for torrent in listings:
+            self.add(torrent.name, NAME_WEIGHT)
+
+    def forget(self, term: str):
+        """Drops the memoized completions that `term` is one of."""
+        for end in range(1, len(term) + 1):
+            self.memo.pop(term[:end], None)
+
+    def flush(self):
+        """Merges the pending terms into the sorted array."""
+        if self.pending:
+            # both are sorted runs, which the sort merges in linear time
+            self.terms.extend(sorted(self.pending))
+            self.terms.sort()
+            self.pending = []
+
+    def trim(self):
+        """Drops the lowest scoring tenth of the terms."""
+        keep = nlargest(self.max_terms * 9 // 10, self.scores.items(), lambda x: x[1])
+        self.scores = dict(keep)
+        self.terms = sorted(self.scores)
+        self.pending = []
+        self.memo.clear()
+
+    def complete(self, prefix: str, limit: int) -> List[str]:
+        """Returns the most popular terms starting with `prefix`.
+
+        Arguments:
+          prefix (str): What has been typed so far.
+          limit (int): Maximum number of completions.
+
+        """
+        prefix = " ".join(tokenize(prefix)) + (" " if prefix[-1:].isspace() else "")
+        if not prefix.strip():
+            return []
+
+        self.flush()
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + "\uffff", start)
+        if end - start < MEMO_MIN_MATCHES:
+            return nlargest(limit, self.terms[start:end], self.scores.__getitem__)
+
+        now = monotonic()
+        memoized = self.memo.get(prefix, {}).get(limit)
+        if memoized is not None and now - memoized[0] < MEMO_SECONDS:
+            return memoized[1]
+
+        completions = nlargest(limit, self.terms[start:end], self.scores.__getitem__)
+        if len(self.memo) >= MEMO_MAX_SIZE:
+            self.memo.clear()
+        self.memo.setdefault(prefix, {})[limit] = (now, completions)
+        return completions
+
+    def __len__(self) -> int:
+        return len(self.scores)
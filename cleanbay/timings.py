@@ -0,0 +1,57 @@
+"""Contains the per-request phase timings reported in `Server-Timing` headers"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+# the timings of the request being handled. Tasks created while handling it
+# (eg. plugin searches) copy the context, so they record into the same object.
+current = ContextVar("timings", default=None)
+
+
+class Timings:
+    """How long each phase of a request took.
+
+    Phases recorded more than once (eg. by plugins running concurrently) add up.
+
+    Attributes:
+      phases (dict): Durations in seconds hashed by phase name, in the order the
+      phases were first recorded.
+
+    """
+
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def milliseconds(self) -> dict:
+        return {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()}
+
+    def header(self) -> str:
+        """Formats the phases as a `Server-Timing` header value."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.milliseconds().items())
+
+
+def record(name: str, seconds: float):
+    """Adds to a phase of the current request, if its timings are collected."""
+    timings = current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name: str):
+    """Times the body of the `with` block as a phase of the current request."""
+    timings = current.get()
+    if timings is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
@@ -1,6 +1,11 @@
-"""contains the `Torrent` data class and the `Category` enum"""
+"""contains the `Torrent` data class, the `TrackerSet` and the `Category` enum"""
 from dataclasses import dataclass
 from enum import Enum
+from typing import Iterable, List, Optional
+from urllib.parse import quote as uri_quote
+import re
+
+TOKEN_PATTERN = re.compile(r"\w+")
 
 
 class Category(Enum):
@@ -24,25 +29,62 @@ class Category(Enum):
     BOOKS = 5
 
 
-@dataclass
+class TrackerSet:
+    """A list of trackers shared by all the magnets of a plugin.
+
+    The trackers are URI-quoted once, when the set is created, instead of once
+    per torrent.
+
+    Attributes:
+      urls (tuple): The tracker announce URLs
+      suffix (str): The pre-quoted `&tr=...` parameters for a magnet URI
+
+    """
+
+    __slots__ = ("urls", "suffix")
+
+    def __init__(self, urls: Iterable[str]):
+        self.urls = tuple(urls)
+        self.suffix = "".join(f"&tr={uri_quote(url)}" for url in self.urls)
+
+    def magnet(self, info_hash: str, name: str) -> str:
+        return f"magnet:?xt=urn:btih:{info_hash}&dn={uri_quote(name)}{self.suffix}"
+
+
+@dataclass(slots=True)
 class Torrent:
     """Represents a torrent listing.
 
     Attributes:
       name (str): Name/title of the torrent
-      magnet (str): Magnet URL of the torrent
+      link (str): Magnet or download URL of the torrent. Only the info hash if
+        `trackers` is set
       seeders (int): Number of seeders. -1 if not listed
       leechers (int): Number of leechers. -1 if not listed
       size (str): Size in the format "<size> <unit>"
       uploader (str): Username of the uploader
       uploaded_at (str): Upload date or time since upload
+      trackers (TrackerSet): Shared trackers to build the magnet with, if any
 
     """
 
     name: str
-    magnet: str
+    link: str
     seeders: int
     leechers: int
-    size: int
+    size: str
     uploader: str
     uploaded_at: str
+    trackers: Optional[TrackerSet] = None
+
+    @property
+    def magnet(self) -> str:
+        """The full magnet (or download) URL, built on demand."""
+        if self.trackers is None:
+            return self.link
+        return self.trackers.magnet(self.link, self.name)
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits a search term or torrent name into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
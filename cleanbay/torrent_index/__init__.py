@@ -0,0 +1,2 @@
+# pylint: disable=missing-module-docstring
+from .torrent_index import TorrentIndex, info_hash
@@ -0,0 +1,236 @@
+"""Contains the on-disk full-text index of every torrent the backend has seen"""
+import os
+import re
+import sqlite3
+from threading import Lock
+from time import time
+from typing import Iterable
+
+from cleanbay.torrent import Torrent, TrackerSet, tokenize
+
+BTIH_PATTERN = re.compile(r"urn:btih:([0-9a-zA-Z]+)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS torrents (
+    id INTEGER PRIMARY KEY,
+    info_hash TEXT NOT NULL UNIQUE,
+    plugin TEXT NOT NULL,
+    name TEXT NOT NULL,
+    link TEXT NOT NULL,
+    seeders INTEGER NOT NULL,
+    leechers INTEGER NOT NULL,
+    size TEXT NOT NULL,
+    uploader TEXT NOT NULL,
+    uploaded_at TEXT NOT NULL,
+    trackers TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS torrents_seen_at ON torrents (seen_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS torrents_fts USING fts5(
+    name, content='torrents', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS torrents_ai AFTER INSERT ON torrents BEGIN
+    INSERT INTO torrents_fts(rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS torrents_ad AFTER DELETE ON torrents BEGIN
+    INSERT INTO torrents_fts(torrents_fts, rowid, name)
+    VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS torrents_au AFTER UPDATE ON torrents BEGIN
+    INSERT INTO torrents_fts(torrents_fts, rowid, name)
+    VALUES ('delete', old.id, old.name);
+    INSERT INTO torrents_fts(rowid, name) VALUES (new.id, new.name);
+END;
+"""
+
+UPSERT = """
+INSERT INTO torrents (
+    info_hash, plugin, name, link, seeders, leechers, size, uploader,
+    uploaded_at, trackers, seen_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(info_hash) DO UPDATE SET
+    name = excluded.name,
+    link = excluded.link,
+    seeders = excluded.seeders,
+    leechers = excluded.leechers,
+    size = excluded.size,
+    uploaded_at = excluded.uploaded_at,
+    trackers = excluded.trackers,
+    seen_at = excluded.seen_at
+"""
+
+PRUNE = """
+DELETE FROM torrents WHERE id IN (
+    SELECT id FROM torrents ORDER BY seen_at, id LIMIT ?
+)
+"""
+
+# share of `max_size` the index is pruned down to, so that it isn't pruned again
+# on every addition once full
+PRUNE_TO = 0.9
+
+
+def info_hash(torrent: Torrent) -> str:
+    """Returns the key a torrent is indexed by.
+
+    That is the info hash for magnets, or the link itself for anything else (eg.
+    direct download URLs).
+
+    """
+    if torrent.trackers is not None:
+        return torrent.link.upper()
+
+    match = BTIH_PATTERN.search(torrent.link)
+    if match:
+        return match.group(1).upper()
+    return torrent.link
+
+
+class TorrentIndex:
+    """Keeps every listing the plugins return in an SQLite FTS5 index.
+
+    Listings are keyed by info hash, so seeing a torrent again only refreshes its
+    counts. Searches are ranked by BM25 over the torrent names.
+
+    Once the index holds more than `max_size` listings, the ones seen least
+    recently are dropped until it's down to 90% of that.
+
+    The methods block on disk I/O; call them from a thread (eg. with
+    `asyncio.to_thread`) when on the event loop.
+
+    Attributes:
+      path (str): Location of the database file.
+      max_size (int): Maximum number of listings kept. 0 to keep them all.
+      size (int): Number of listings in the index, or more: listings seen again
+      are counted twice until it's pruned.
+      db (sqlite3.Connection): Connection shared by all threads of this
+      process, see `connection`. None until it's first used.
+      pid (int): Process `db` was opened in.
+      tracker_sets (dict): `TrackerSet`s rebuilt from the index, hashed by their
+      URLs, so that listings with the same trackers share one.
+
+    """
+
+    def __init__(self, path: str, max_size: int = 0):
+        """Sets up the index, which is opened (or created) on first use.
+
+        Arguments:
+          path (str): Location of the database file. ':memory:' keeps it in RAM.
+          max_size (int): Maximum number of listings kept. 0 to keep them all.
+
+        """
+        self.path = path
+        self.max_size = max_size
+        self.lock = Lock()
+        self.tracker_sets = {}
+        self.size = 0
+        self.pid = None
+        self.db = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The connection of this process to the database.
+
+        It's opened on first use in each process: a SQLite connection mustn't be
+        used across a fork, and the app is imported before its workers are forked
+        (see gunicorn.conf.py). Must be used with the lock held.
+
+        """
+        if self.pid != os.getpid():
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(SCHEMA)
+            self.size = self.db.execute("SELECT COUNT(*) FROM torrents").fetchone()[0]
+            self.pid = os.getpid()
+        return self.db
+
+    def add(self, plugin_name: str, listings: Iterable[Torrent]):
+        """Adds or refreshes the listings returned by a plugin.
+
+        Arguments:
+          plugin_name (str): Name of the plugin that returned the listings.
+          listings (list): List of Torrents.
+
+        """
+        now = time()
+        rows = [
+            (
+                info_hash(t),
+                plugin_name,
+                t.name,
+                t.link,
+                t.seeders,
+                t.leechers,
+                t.size,
+                t.uploader,
+                t.uploaded_at,
+                "\n".join(t.trackers.urls) if t.trackers is not None else "",
+                now,
+            )
+            for t in listings
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(UPSERT, rows)
+            self.size += len(rows)
+            if self.max_size and self.size > self.max_size:
+                self.prune()
+
+    def prune(self):
+        """Drops the listings seen least recently, if there are too many.
+
+        Must be called with the lock held, within a transaction.
+
+        """
+        size = self.connection.execute("SELECT COUNT(*) FROM torrents").fetchone()[0]
+        excess = size - int(self.max_size * PRUNE_TO)
+        if size > self.max_size and excess > 0:
+            self.connection.execute(PRUNE, (excess,))
+            size -= excess
+        self.size = size
+
+    def search(self, search_term: str, plugin_names: list, limit: int) -> list:
+        """Finds the indexed listings whose names contain every search token.
+
+        Arguments:
+          search_term (str): The string to search for.
+          plugin_names (list): Only return listings seen from these plugins.
+          limit (int): Maximum number of listings to return.
+
+        Returns:
+          A list of Torrents, best match first.
+
+        """
+        tokens = tokenize(search_term)
+        if not tokens or not plugin_names:
+            return []
+
+        match = " ".join('"' + token.replace('"', '""') + '"' for token in tokens)
+        placeholders = ", ".join("?" * len(plugin_names))
+        query = f"""
+            SELECT t.name, t.link, t.seeders, t.leechers, t.size, t.uploader,
+                   t.uploaded_at, t.trackers
+            FROM torrents_fts JOIN torrents t ON t.id = torrents_fts.rowid
+            WHERE torrents_fts MATCH ? AND t.plugin IN ({placeholders})
+            ORDER BY bm25(torrents_fts), t.seeders DESC
+            LIMIT ?
+        """
+
+        with self.lock:
+            rows = self.connection.execute(
+                query, [match, *plugin_names, limit]
+            ).fetchall()
+
+        return [
+            Torrent(*row[:7], self.tracker_set(row[7]) if row[7] else None)
+            for row in rows
+        ]
+
+    def tracker_set(self, urls: str) -> TrackerSet:
+        if urls not in self.tracker_sets:
+            self.tracker_sets[urls] = TrackerSet(urls.split("\n"))
+        return self.tracker_sets[urls]
+
+    def __len__(self) -> int:
+        with self.lock:
+            row = self.connection.execute("SELECT COUNT(*) FROM torrents").fetchone()
+        return row[0]
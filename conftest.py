@@ -0,0 +1,147 @@
+"""Offline stand-ins for the trackers, shared by the tests"""
+
+import asyncio
+import json
+from urllib.parse import quote as uri_quote
+
+import pytest
+
+from cleanbay.abstract_plugin import AbstractPluginV2, PluginRequest
+from cleanbay.backend import Backend
+from cleanbay.cache_manager import LFUCache
+from cleanbay.plugins_manager import PluginsManager
+from cleanbay.torrent import Category, Torrent
+
+
+def names_body(*names) -> bytes:
+    """Makes the body of a fake tracker's response listing `names`."""
+    return json.dumps(names).encode()
+
+
+class FakeResponse:
+    """Stands in for an aiohttp response.
+
+    Attributes:
+      delay (float): Seconds that reading the body takes.
+      released (bool): Whether the connection was given back.
+
+    """
+
+    def __init__(self, status=200, body=b"[]", headers=None, delay=0.0):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.charset = "utf-8"
+        self.delay = delay
+        self.released = False
+
+    async def read(self):
+        await asyncio.sleep(self.delay)
+        return self.body
+
+    async def text(self, *args, **kwargs):  # pylint: disable=unused-argument
+        return (await self.read()).decode()
+
+    async def json(self, *args, **kwargs):  # pylint: disable=unused-argument
+        return json.loads(await self.read())
+
+    def release(self):
+        self.released = True
+
+
+class FakeSession:
+    """Stands in for an aiohttp session.
+
+    Every request is answered with `handler(url, headers)`, which returns a
+    `FakeResponse` or raises. It may be a coroutine function, eg. to answer
+    slowly. By default, each URL is answered with one listing named after it.
+
+    Attributes:
+      requests (list): The (url, headers) of every request made so far.
+      closed (bool): Whether the session was closed.
+
+    """
+
+    def __init__(self, handler=None):
+        self.handler = handler or (
+            lambda url, headers: FakeResponse(body=names_body(url))
+        )
+        self.requests = []
+        self.closed = False
+
+    async def get(self, url, headers=None, **kwargs):  # pylint: disable=unused-argument
+        self.requests.append((url, headers))
+        resp = self.handler(url, headers)
+        if asyncio.iscoroutine(resp):
+            resp = await resp
+        return resp
+
+    async def close(self):
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class FakePlugin(AbstractPluginV2):
+    """A tracker whose responses are JSON lists of torrent names.
+
+    It lives at module level so that it can be sent to parse workers.
+
+    """
+
+    INFO = {
+        "name": "fake",
+        "category": Category.GENERAL,
+        "domain": "https://fake.test",
+        "max_pages": 3,
+    }
+
+    def __init__(self, name="fake", category=Category.GENERAL, **info):
+        self.INFO = {  # pylint: disable=invalid-name
+            **FakePlugin.INFO,
+            "name": name,
+            "category": category,
+            "domain": f"https://{name}.test",
+            **info,
+        }
+
+    def build_requests(self, search_param, page=1):
+        url = f"{self.INFO['domain']}/search?q={uri_quote(search_param)}"
+        return [PluginRequest(url if page == 1 else f"{url}&page={page}")]
+
+    def parse(self, response):
+        return [
+            Torrent(name, f"hash-{name}", 1, 0, "1 MB", self.INFO["name"], "today")
+            for name in response.json()
+        ]
+
+
+@pytest.fixture
+def make_backend(tmp_path):
+    """Makes a backend searching the given plugins through a `FakeSession`.
+
+    Returns:
+      A function taking the plugins, the session's handler and keyword arguments
+      for the `Backend`, and returning a tuple of the form (backend, session).
+
+    """
+
+    def make(plugins, handler=None, cache=None, **kwargs):
+        manager = PluginsManager(str(tmp_path), probe=False)
+        manager.plugins = {plugin.info()["name"]: plugin for plugin in plugins}
+        backend = Backend(10, cache or LFUCache(100, 300), manager, **kwargs)
+        session = FakeSession(handler)
+        backend.make_session = lambda: session
+        return backend, session
+
+    return make
+
+
+@pytest.fixture
+def anyio_backend():
+    """Runs the tests marked with `anyio` on asyncio, which the app runs on."""
+    return "asyncio"
@@ -0,0 +1,32 @@
+"""Gunicorn settings for serving the API from several pre-forked workers
+
+The app is imported and its plugins are probed once, in the master process,
+before the workers are forked: each worker starts with the plugins loaded, and
+the trackers aren't asked if they're up once per worker. The parsing libraries
+the plugins import lazily are imported there too, so that no worker pays for
+them on its first search.
+
+Run with `gunicorn app.main:app` from the project root. Settings can still be
+overridden on the command line.
+
+"""
+import os
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", "3"))
+preload_app = True
+
+
+def on_starting(server):  # pylint: disable=unused-argument
+    """Probes the plugins and imports their parsers, before any worker is forked."""
+    # pylint: disable=import-outside-toplevel
+    from bs4 import BeautifulSoup
+
+    from app.main import plugins_manager
+    from app.settings import settings
+
+    if settings.probe_plugins and not plugins_manager.probed:
+        plugins_manager.probe()
+
+    # imports the lxml tree builder along with lxml itself
+    BeautifulSoup("", features="lxml")
@@ -0,0 +1,194 @@
+"""Offline tests for the API, searching a fake tracker"""
+
+# pylint: disable=redefined-outer-name
+
+import pytest
+from fastapi.testclient import TestClient
+from limits import parse as parse_limit
+from pydantic import ValidationError
+
+from app import main
+from app.helpers import compact_listings
+from app.settings import Settings
+from cleanbay.torrent import Torrent, TrackerSet
+from conftest import FakePlugin, FakeSession
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(main.plugins_manager, "plugins", {"fake": FakePlugin()})
+    monkeypatch.setattr(main.plugins_manager, "probed", True)
+    monkeypatch.setattr(main.backend, "make_session", lambda: session)
+    monkeypatch.setattr(main.limiter, "enabled", False)
+    return session
+
+
+@pytest.fixture
+def client(session):  # pylint: disable=unused-argument
+    with TestClient(main.app) as client:
+        yield client
+
+
+def search_entry(term: str) -> dict:
+    return main.backend.cache.entry(term, [main.plugins_manager.plugins["fake"]])
+
+
+def test_if_none_match_answered_before_searching(client, session):
+    url = "/api/v1/search?search_term=etag+test"
+    assert client.get(url).json()["cache_hit"] is False
+    hit = client.get(url)
+    assert hit.json()["cache_hit"] is True
+
+    requests, hits = len(session.requests), main.backend.cache.stats()["hits"]
+    response = client.get(url, headers={"If-None-Match": hit.headers["ETag"]})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == hit.headers["ETag"]
+    assert "max-age" in response.headers["Cache-Control"]
+    assert len(session.requests) == requests
+    assert main.backend.cache.stats()["hits"] == hits
+
+
+def test_if_none_match_with_an_old_etag_searches(client):
+    url = "/api/v1/search?search_term=old+etag"
+    client.get(url)
+
+    response = client.get(url, headers={"If-None-Match": 'W/"old-full"'})
+
+    assert response.status_code == 200
+    assert response.json()["cache_hit"] is True
+
+
+def test_hits_reuse_listings_but_not_request_fields(client):
+    url = "/api/v1/search?search_term=reused+body"
+    client.get(url)
+    first, second = client.get(url).json(), client.get(url).json()
+
+    encoded = search_entry("reused body")["encoded"]
+    _, (cached, _, _) = encoded[("full", "identity")]
+    assert b"elapsed" not in cached and b"cache_hit" not in cached
+    assert first["data"] == second["data"]
+    assert first["cache_hit"] and second["cache_hit"]
+
+
+def test_hits_finish_precompressed_bodies(client):
+    url = "/api/v1/search?search_term=precompressed&compact=true"
+    client.get(url, headers={"Accept-Encoding": "gzip"})
+    listings = search_entry("precompressed")["listings"]
+    listings.extend(listings[:1] * 100)  # long enough to be worth compressing
+
+    first = client.get(url, headers={"Accept-Encoding": "gzip"})
+    encoded = search_entry("precompressed")["encoded"]
+    head = encoded[("compact", "gzip")]
+    second = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert second.json()["length"] == 101
+    assert first.json()["data"] == second.json()["data"]
+    assert second.json()["cache_hit"] is True
+    # compressed once, on the first hit
+    assert encoded[("compact", "gzip")] is head
+
+
+def test_debug_responses_are_not_stored(client):
+    response = client.get("/api/v1/search?search_term=debug+test&debug=true")
+
+    assert response.status_code == 200
+    assert "timings" in response.json()
+    assert response.headers["Cache-Control"] == "no-store"
+    assert "ETag" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "query, canonical",
+    [
+        ("deadline=2", None),
+        ("deadline=2.5", None),
+        ("deadline=2.0", "deadline=2"),
+        ("deadline=2.50", "deadline=2.5"),
+    ],
+)
+def test_deadlines_are_canonical_as_written(client, query, canonical):
+    url = f"/api/v1/search?search_term=deadline+test&{query}"
+    response = client.get(url, follow_redirects=False)
+
+    if canonical is None:
+        assert response.status_code == 200
+    else:
+        assert response.status_code == 301
+        assert response.headers["Location"].endswith(f"&{canonical}")
+
+
+def test_batches_reject_early_and_timed_searches(client):
+    searches = [
+        {"search_term": "batch ok"},
+        {"search_term": "batch quorum", "quorum": 1},
+        {"search_term": "batch deadline", "deadline": 2},
+        {"search_term": "batch debug", "debug": True},
+    ]
+    results = client.post("/api/v1/search/batch", json={"searches": searches}).json()
+
+    assert results["results"]["0"]["status"] == "ok"
+    for i in "123":
+        assert results["results"][i] == {
+            "status": "error",
+            "msg": main.BATCH_UNSUPPORTED_MSG,
+        }
+
+
+def test_batches_tell_failures_from_invalid_searches(client, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(main.backend, "update_cache", fail)
+    searches = [{"search_term": "batch failure"}]
+    results = client.post("/api/v1/search/batch", json={"searches": searches}).json()
+
+    assert results["results"]["0"] == {"status": "error", "msg": "The search failed."}
+
+
+def test_batches_are_rate_limited_per_search(client, monkeypatch):
+    monkeypatch.setattr(main.limiter, "enabled", True)
+    main.limiter.reset()
+    allowed = parse_limit(main.settings.rate_limit).amount
+    size = main.settings.batch_max_size
+
+    for start in range(0, allowed, size):
+        searches = [{"search_term": "rate limited"}] * min(size, allowed - start)
+        response = client.post("/api/v1/search/batch", json={"searches": searches})
+        assert response.status_code == 200
+
+    searches = [{"search_term": "rate limited"}]
+    response = client.post("/api/v1/search/batch", json={"searches": searches})
+    assert response.status_code == 429
+    main.limiter.reset()
+
+
+def test_unknown_category_timeouts_are_rejected():
+    with pytest.raises(ValidationError, match="No such categories: movies"):
+        Settings(cache_category_timeouts={"movies": 60, "tv": 60})
+
+
+def test_metrics_need_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main.settings, "admin_token", "secret")
+
+    assert client.get("/metrics").status_code == 403
+    response = client.get("/metrics", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "cleanbay_cache_size" in response.text
+
+    monkeypatch.setattr(main.settings, "metrics_public", True)
+    assert client.get("/metrics").status_code == 200
+
+
+def test_compact_listings_share_equal_tracker_sets():
+    def torrent(name):
+        # a TrackerSet of its own, as if unpickled from a parse worker
+        trackers = TrackerSet(("udp://tracker.test:1337",))
+        return Torrent(name, "a" * 40, 1, 0, "1 MB", "fake", "today", trackers)
+
+    trackers, rows = compact_listings([torrent("Arch"), torrent("Debian")])
+
+    assert trackers == [["udp://tracker.test:1337"]]
+    assert [row["trackers"] for row in rows] == [0, 0]
@@ -1,29 +1,51 @@
 """Integration tests for the app"""
 
+# pylint: disable=redefined-outer-name
+
 import re
+import subprocess
+import sys
 from os import getenv
 from time import sleep
 
+import pytest
 from fastapi.testclient import TestClient
 
 from dotenv import load_dotenv
 
-from app.main import app
+from app.main import app, settings
 
 
 load_dotenv()
 cache_timeout = int(getenv("CACHE_TIMEOUT", "300"))
 
-client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def client():
+    # entering the client runs the lifespan, which probes the plugins
+    with TestClient(app) as client:
+        yield client
 
 
-def test_status():
+def test_status(client):
     response = client.get("/api/v1/status")
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
 
 
-def test_empty_search():
+def test_lazy_imports():
+    # in a fresh interpreter, since the other tests parse
+    modules = subprocess.run(
+        [sys.executable, "-c", "import sys, app.main; print(*sys.modules)"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.split()
+
+    assert not {"bs4", "lxml", "requests", "numpy"} & set(modules)
+
+
+def test_empty_search(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -34,7 +56,7 @@ def test_empty_search():
     assert response.status_code == 422
 
 
-def test_simple_search():
+def test_simple_search(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -51,7 +73,7 @@ def test_simple_search():
         )
 
 
-def test_include_site():
+def test_include_site(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -70,7 +92,7 @@ def test_include_site():
         assert listing["uploader"] == "linuxtracker"
 
 
-def test_exclude_categories():
+def test_exclude_categories(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -89,7 +111,7 @@ def test_exclude_categories():
         assert listing["uploader"] != "linuxtracker"
 
 
-def test_include_exclude_categories():
+def test_include_exclude_categories(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -102,7 +124,7 @@ def test_include_exclude_categories():
     assert response.status_code == 422
 
 
-def test_include_sites():
+def test_include_sites(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -121,7 +143,7 @@ def test_include_sites():
         assert listing["uploader"] == "linuxtracker"
 
 
-def test_exclude_sites():
+def test_exclude_sites(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -140,7 +162,7 @@ def test_exclude_sites():
         assert listing["uploader"] != "linuxtracker"
 
 
-def test_include_exclude_sites():
+def test_include_exclude_sites(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -153,7 +175,7 @@ def test_include_exclude_sites():
     assert response.status_code == 422
 
 
-def test_advanced_search():
+def test_advanced_search(client):
     response = client.post(
         "/api/v1/search",
         json={
@@ -170,7 +192,7 @@ def test_advanced_search():
         assert listing["uploader"] not in ["eztv", "piratebay"]
 
 
-def test_cache():
+def test_cache(client):
     response_first = client.post(
         "/api/v1/search",
         json={
@@ -191,7 +213,82 @@ def test_cache():
     assert response_second.json()["cache_hit"] is True
 
 
-def test_cache_timeout():
+def test_conditional_search(client):
+    body = {"search_term": "dune", "include_sites": ["yts"]}
+    response_first = client.post(
+        "/api/v1/search", json=body, headers={"accept-encoding": "gzip"}
+    )
+
+    assert response_first.status_code == 200
+    assert "etag" in response_first.headers
+
+    response_second = client.post(
+        "/api/v1/search",
+        json=body,
+        headers={"if-none-match": response_first.headers["etag"]},
+    )
+
+    assert response_second.status_code == 304
+
+
+def test_get_search(client):
+    response = client.get(
+        "/api/v1/search?search_term=Alpine&include_sites=linuxtracker",
+        follow_redirects=False,
+    )
+
+    assert response.status_code == 301
+    assert response.headers["location"].endswith(
+        "search_term=alpine&include_sites=linuxtracker"
+    )
+
+    response = client.get(response.headers["location"])
+
+    assert response.status_code == 200
+    assert response.json()["length"] > 0
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+
+def test_batch_search(client):
+    response = client.post(
+        "/api/v1/search/batch",
+        json={
+            "searches": [
+                {"search_term": "kali", "include_sites": ["linuxtracker"]},
+                {"search_term": "kali", "include_sites": ["linuxtracker"]},
+                {"search_term": "alpine", "include_sites": ["nonexistent"]},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results["0"]["length"] > 0
+    assert results["1"]["length"] == results["0"]["length"]
+    assert results["2"]["status"] == "error"
+
+
+def test_suggest(client):
+    client.post("/api/v1/search", json={"search_term": "ubuntu"})
+
+    response = client.get("/api/v1/suggest?q=ubu")
+
+    assert response.status_code == 200
+    assert "ubuntu" in response.json()["suggestions"]
+
+
+def test_metrics(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_public", True)
+    client.post("/api/v1/search", json={"search_term": "ubuntu"})
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "cleanbay_cache_hits_total" in response.text
+    assert 'cleanbay_search_seconds_count{cache="miss"}' in response.text
+
+
+def test_cache_timeout(client):
     response_first = client.post(
         "/api/v1/search",
         json={
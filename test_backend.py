@@ -0,0 +1,161 @@
+"""Offline tests for the backend's searches, against fake trackers"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from cleanbay.admission import FETCH, SHED, STALE, AdmissionController, OverloadedError
+
+from conftest import FakePlugin, FakeResponse, names_body
+
+pytestmark = pytest.mark.anyio
+
+FAST, SLOW = FakePlugin("fast"), FakePlugin("slow")
+
+
+def delayed(delays: dict):
+    """Answers each tracker after its delay, with one listing named after it."""
+
+    async def handler(url, headers):  # pylint: disable=unused-argument
+        host = url.split("/")[2].split(".")[0]
+        await asyncio.sleep(delays[host])
+        return FakeResponse(body=names_body(host))
+
+    return handler
+
+
+def names(listings: list) -> list:
+    return sorted(torrent.name for torrent in listings)
+
+
+@pytest.mark.parametrize("early", [{"quorum": 1}, {"deadline": 0.05}])
+async def test_early_return_completes_in_the_background(make_backend, early):
+    backend, session = make_backend([FAST, SLOW], delayed({"fast": 0, "slow": 0.2}))
+
+    listings, cache_hit, entry = await backend.search("ubuntu", [], [], [], [], **early)
+
+    assert names(listings) == ["fast"] and not cache_hit
+    # the partial entry lives no longer than the late plugin may take
+    assert backend.cache.ttl_remaining(entry) <= backend.timeout
+    assert backend.fan_outs == 1 and not session.closed
+
+    await asyncio.gather(*backend.background_tasks)
+
+    listings, cache_hit, entry = await backend.search("ubuntu", [], [], [], [])
+    assert names(listings) == ["fast", "slow"] and cache_hit
+    assert backend.cache.ttl_remaining(entry) > backend.timeout
+    assert backend.fan_outs == 0 and session.closed
+
+
+async def test_deadline_returns_what_answered_in_time(make_backend):
+    backend, _ = make_backend([FAST, SLOW], delayed({"fast": 0.2, "slow": 0.2}))
+
+    listings, _, entry = await backend.search("debian", [], [], [], [], deadline=0.05)
+
+    assert listings == [] and entry is None
+    await asyncio.gather(*backend.background_tasks)
+    assert names(backend.cache.read("debian", [FAST, SLOW])) == ["fast", "slow"]
+
+
+async def test_quorum_of_every_plugin_waits_for_all(make_backend):
+    backend, session = make_backend([FAST, SLOW], delayed({"fast": 0, "slow": 0.05}))
+
+    listings, _, _ = await backend.search("arch", [], [], [], [], quorum=5)
+
+    assert names(listings) == ["fast", "slow"]
+    assert not backend.background_tasks
+    assert backend.fan_outs == 0 and session.closed
+
+
+async def test_late_plugins_hold_their_fan_out_slot(make_backend):
+    admission = AdmissionController(1.0, 1, 5)
+    backend, _ = make_backend(
+        [FAST, SLOW], delayed({"fast": 0, "slow": 0.2}), admission=admission
+    )
+
+    await backend.search("fedora", [], [], [], [], quorum=1)
+    with pytest.raises(OverloadedError):
+        await backend.search("gentoo", [], [], [], [])
+
+    await asyncio.gather(*backend.background_tasks)
+    listings, _, _ = await backend.search("gentoo", [], [], [], [])
+    assert names(listings) == ["fast", "slow"]
+    assert backend.fan_outs == 0
+
+
+async def test_misses_are_shed_in_tiers():
+    admission = AdmissionController(1.0, 4, 5, stale_at=0.5)
+
+    assert await admission.tier(lambda: 1) == FETCH
+    assert await admission.tier(lambda: 2) == STALE
+    assert await admission.tier(lambda: 4) == SHED
+    admission.lag = 10.0
+    assert await admission.tier(lambda: 0) == SHED
+
+
+async def test_saturated_server_serves_stale_then_turns_away(make_backend):
+    admission = AdmissionController(1.0, 4, 5, stale_at=0.5)
+    backend, session = make_backend([FAST], delayed({"fast": 0}), admission=admission)
+    await backend.search("arch", [], [], [], [])
+    backend.cache.entry("arch", [FAST])["expires"] = datetime.now() - timedelta(
+        seconds=1
+    )
+    requests = len(session.requests)
+
+    backend.fan_outs = 2
+    listings, cache_hit, _ = await backend.search("arch", [], [], [], [])
+    assert names(listings) == ["fast"] and not cache_hit
+    assert len(session.requests) == requests
+    # nothing to serve instead: still searched
+    await backend.search("mint", [], [], [], [])
+    assert len(session.requests) == requests + 1
+
+    backend.fan_outs = 4
+    listings, _, _ = await backend.search("arch", [], [], [], [])
+    assert names(listings) == ["fast"]
+    with pytest.raises(OverloadedError):
+        await backend.search("void", [], [], [], [])
+
+
+def test_refresher_counts_a_bounded_number_of_searches(make_backend):
+    backend, _ = make_backend([FAST], refresh_options={"max_keys": 10})
+    refresher = backend.refresher
+    for _ in range(3):
+        refresher.record("popular", [FAST])
+
+    for i in range(100):
+        refresher.record(f"rare {i}", [FAST])
+        assert len(refresher.scores) <= 10
+
+    assert refresher.trending() == [("popular", frozenset(["fast"]))]
+
+
+async def test_refresher_outlives_a_failed_round(make_backend, monkeypatch):
+    backend, _ = make_backend([FAST], refresh_options={"interval": 0})
+    rounds = []
+
+    async def refresh_due():
+        rounds.append(None)
+        if len(rounds) == 3:
+            raise asyncio.CancelledError
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(backend.refresher, "refresh_due", refresh_due)
+    with pytest.raises(asyncio.CancelledError):
+        await backend.refresher.run()
+    assert len(rounds) == 3
+
+
+async def test_deeper_searches_only_fetch_the_pages_missing(make_backend):
+    plugin = FakePlugin("paged", max_pages=3)
+    backend, session = make_backend([plugin])
+    await backend.search("arch", [], [], [], [], depth=2)
+
+    listings, cache_hit, _ = await backend.search("arch", [], [], [], [], depth=3)
+
+    assert not cache_hit and len(listings) == 3
+    assert [url for url, _ in session.requests][2:] == [
+        "https://paged.test/search?q=arch&page=3"
+    ]
+    assert backend.cache.read_pages("arch", [plugin]) == {"paged": 3}
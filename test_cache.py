@@ -0,0 +1,254 @@
+"""Offline tests for the LFU cache"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from cleanbay.cache_manager import ColumnarListings, DerivationPolicy, LFUCache
+from cleanbay.cache_manager import columnar
+from cleanbay.torrent import Category, Torrent, TrackerSet
+
+from conftest import FakePlugin
+
+GENERAL = FakePlugin("general")
+CINEMA = FakePlugin("cinema", Category.CINEMA)
+
+STAR_WARS = [
+    "Star Wars 1977 1080p",
+    "Star Wars 1977 720p",
+    "Star Wars 1977 Remastered",
+    "Star Wars 1977 Despecialized",
+    "Star Wars 1977 4K",
+    "Star Wars Empire Strikes Back 1980",
+    "Star Wars Return of the Jedi 1983",
+]
+
+
+def listings(names: list) -> list:
+    return [Torrent(name, name, 1, 0, "1 MB", "fake", "today") for name in names]
+
+
+def derivation_cache(**policy) -> LFUCache:
+    cache = LFUCache(100, 300, DerivationPolicy(**policy))
+    cache.store("star wars", [GENERAL, CINEMA], listings(STAR_WARS))
+    return cache
+
+
+def test_derived_from_a_broader_search():
+    cache = derivation_cache()
+
+    derived = cache.read_derived("star wars 1977", [GENERAL, CINEMA])
+
+    assert [t.name for t in derived] == STAR_WARS[:5]
+    assert cache.stats()["derived_hits"] == 1
+    # stored as an entry of its own, expiring along with the broader one
+    assert cache.read("star wars 1977", [GENERAL, CINEMA]) == derived
+    line = cache.entry("star wars 1977", [GENERAL, CINEMA])
+    assert line["expires"] == cache.entry("star wars", [GENERAL, CINEMA])["expires"]
+
+
+def test_not_derived_from_other_plugins():
+    cache = derivation_cache()
+
+    # eg. the same search with a category excluded
+    assert not cache.read_derived("star wars 1977", [GENERAL])
+    assert not cache.read_derived("star wars 1977", [GENERAL, CINEMA, FakePlugin()])
+
+
+def test_not_derived_from_an_expired_search():
+    cache = derivation_cache()
+    cache.entry("star wars", [GENERAL, CINEMA])["expires"] = datetime.now() - timedelta(
+        seconds=1
+    )
+
+    assert not cache.read_derived("star wars 1977", [GENERAL, CINEMA])
+    assert cache.stats()["derived_hits"] == 0
+
+
+def test_not_derived_from_a_search_that_is_not_broader():
+    cache = derivation_cache()
+
+    assert not cache.read_derived("star trek 1977", [GENERAL, CINEMA])
+    assert not cache.read_derived("wars", [GENERAL, CINEMA])
+    assert not cache.read_derived("star wars", [GENERAL, CINEMA])
+
+
+def test_not_derived_with_too_many_extra_tokens():
+    cache = derivation_cache(max_extra_tokens=1)
+
+    assert not cache.read_derived("star wars 1977 1080p", [GENERAL, CINEMA])
+
+
+def test_not_derived_with_too_few_results():
+    cache = derivation_cache(min_results=3)
+
+    assert not cache.read_derived("star wars empire", [GENERAL, CINEMA])
+    assert not cache.read("star wars empire", [GENERAL, CINEMA])
+
+
+def test_not_derived_when_disabled():
+    cache = derivation_cache(enabled=False)
+
+    assert not cache.read_derived("star wars 1977", [GENERAL, CINEMA])
+
+
+def test_derived_from_the_most_specific_search():
+    cache = derivation_cache(min_results=1)
+    remastered = [f"Star Wars 1977 Remastered v{i}" for i in range(3)]
+    cache.store("star wars 1977", [GENERAL, CINEMA], listings(remastered))
+
+    derived = cache.read_derived("star wars 1977 remastered", [GENERAL, CINEMA])
+
+    assert [t.name for t in derived] == remastered
+
+
+def test_evicted_searches_are_not_derived_from():
+    cache = LFUCache(1, 300, DerivationPolicy())
+    cache.store("star wars", [GENERAL], listings(STAR_WARS))
+    cache.store("dune", [GENERAL], listings(["Dune"]))
+
+    assert not cache.read_derived("star wars 1977", [GENERAL])
+
+
+def test_backend_derives_only_first_page_searches(make_backend):
+    plugin = FakePlugin(max_pages=3)
+    backend, session = make_backend([plugin], cache=derivation_cache(min_results=1))
+    backend.cache.store("star wars", [plugin], listings(STAR_WARS))
+
+    found, cache_hit = backend.try_cache("star wars 1977", [plugin])
+    assert cache_hit and len(found) == 5
+
+    assert backend.try_cache("star wars 1980", [plugin], depth=2) == ([], False)
+    assert not session.requests
+
+
+def test_continued_pages_are_appended_and_keep_their_store_time():
+    plugin = FakePlugin()
+    cache = LFUCache(100, 300)
+    first = listings(["Arch 1", "Arch 2"])
+    cache.store_fragments("arch", [plugin], {"fake": first}, {"fake": range(1, 3)})
+    stored = cache.entry("arch", [plugin])
+    store_time, expires = stored["fragments"]["fake"][2], stored["expires"]
+
+    more = listings(["Arch 3"])
+    cache.store_fragments("arch", [plugin], {"fake": more}, {"fake": range(3, 4)})
+
+    assert cache.read("arch", [plugin]) == first + more
+    assert cache.read_pages("arch", [plugin]) == {"fake": 3}
+    line = cache.entry("arch", [plugin])
+    assert line["fragments"]["fake"][2] == store_time
+    assert line["expires"] == expires
+
+
+def test_backend_hits_only_as_deep_as_cached(make_backend):
+    plugin = FakePlugin(max_pages=3)
+    backend, session = make_backend([plugin])
+    backend.cache.store_fragments(
+        "arch", [plugin], {"fake": listings(["Arch"])}, {"fake": range(1, 3)}
+    )
+
+    assert backend.try_cache("arch", [plugin], depth=1)[1]
+    assert backend.try_cache("arch", [plugin], depth=2)[1]
+    assert backend.try_cache("arch", [plugin], depth=3) == ([], False)
+    # deeper than the plugin goes counts as its deepest
+    backend.cache.store_fragments(
+        "arch", [plugin], {"fake": listings(["Arch 3"])}, {"fake": range(3, 4)}
+    )
+    assert backend.try_cache("arch", [plugin], depth=5)[1]
+    assert not session.requests
+
+
+def columnar_listings() -> ColumnarListings:
+    trackers = TrackerSet(("udp://tracker.test:1337",))
+    return ColumnarListings(
+        [
+            Torrent("Arch", "a" * 40, 5, 1, "1.5 GB", "arch", "2023-01-02", trackers),
+            Torrent("Debian", "debian", 50, 2, "600 MB", "debian", "today"),
+            Torrent("Fedora", "b" * 40, 20, 0, "2 GB", "arch", "2023-03-04", trackers),
+        ]
+    )
+
+
+def test_columnar_listings_read_back_as_torrents():
+    stored = columnar_listings()
+
+    assert len(stored) == 3
+    assert stored[-1].name == "Fedora"
+    assert [t.seeders for t in stored[:2]] == [5, 50]
+    # repeated uploaders and tracker sets are kept once
+    assert stored[0].trackers is stored[2].trackers
+    assert len(stored.uploaders.values) == 2
+    assert list(stored.size_bytes) == [int(1.5 * 1024**3), 600 * 1024**2, 2 * 1024**3]
+    assert stored.timestamp[1] == -1
+
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_columnar_views(monkeypatch, with_numpy):
+    if not with_numpy:
+        monkeypatch.setattr(columnar, "numpy", lambda: None)
+    stored = columnar_listings()
+
+    by_seeders = stored.sorted_by("seeders")
+    assert [t.name for t in by_seeders] == ["Debian", "Fedora", "Arch"]
+    assert [t.name for t in by_seeders.at_least("seeders", 10)] == ["Debian", "Fedora"]
+    assert [t.name for t in by_seeders.uploaded_by("arch")] == ["Fedora", "Arch"]
+    assert [t.name for t in stored.sorted_by("size_bytes", descending=False)] == [
+        "Debian",
+        "Arch",
+        "Fedora",
+    ]
+    assert not stored.uploaded_by("nobody")
+    # views share the columns they were taken from
+    assert by_seeders.seeders is stored.seeders
+    assert len(stored) == 3
+
+
+def test_backend_hits_columnar_entries_as_stored(make_backend):
+    plugin = FakePlugin()
+    backend, _ = make_backend([plugin], cache=LFUCache(100, 300, columnar=True))
+    backend.cache.store_fragments(
+        "arch", [plugin], {"fake": listings(["Arch 1"])}, {"fake": range(1, 2)}
+    )
+    backend.cache.store_fragments(
+        "arch", [plugin], {"fake": listings(["Arch 2"])}, {"fake": range(2, 3)}
+    )
+
+    found, cache_hit = backend.try_cache("arch", [plugin], depth=2)
+
+    assert cache_hit
+    assert found is backend.cache.entry("arch", [plugin])["listings"]
+    assert isinstance(found, ColumnarListings)
+    assert list(found) == listings(["Arch 1", "Arch 2"])
+    assert [t.name for t in backend.blend(found, listings(["Arch 3"]))] == [
+        "Arch 1",
+        "Arch 2",
+        "Arch 3",
+    ]
+
+
+def in_child(fn) -> str:
+    """Runs `fn` in a forked process and returns what it returned."""
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        os.close(read_end)
+        os.write(write_end, fn().encode())
+        os._exit(0)  # pylint: disable=protected-access
+    os.close(write_end)
+    with os.fdopen(read_end) as pipe:
+        result = pipe.read()
+    os.waitpid(pid, 0)
+    return result
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_processes_version_entries_apart():
+    cache = LFUCache(100, 300)
+    plugin = FakePlugin()
+
+    def store():
+        cache.store("arch", [plugin], listings(["Arch"]))
+        return cache.entry("arch", [plugin])["version"]
+
+    assert len({in_child(store), in_child(store), store()}) == 3
@@ -0,0 +1,234 @@
+"""Offline tests for v2 plugins and the fetching of their requests"""
+
+import asyncio
+import pickle
+
+import pytest
+from aiohttp import ClientConnectionError
+
+from cleanbay.abstract_plugin import PluginResponse, PluginResponseError
+from cleanbay.fetcher import Fetcher
+from cleanbay.metrics import TimedSession
+from cleanbay.mirrors import MIN_SAMPLES, Mirrors
+from cleanbay.response_cache import ResponseCache
+
+from conftest import FakePlugin, FakeResponse, FakeSession, names_body
+
+pytestmark = pytest.mark.anyio
+
+PLUGIN = FakePlugin()
+PRIMARY, BACKUP, SPARE = (
+    "https://mirrored.test",
+    "https://backup.test",
+    "https://spare.test",
+)
+
+
+def answers(*responses):
+    """Answers each request with the next of `responses`, raising exceptions."""
+    pending = list(responses)
+
+    def handler(url, headers):  # pylint: disable=unused-argument
+        resp = pending.pop(0)
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+    return handler
+
+
+def ubuntu(**kwargs) -> FakeResponse:
+    return FakeResponse(body=names_body("ubuntu"), **kwargs)
+
+
+def revalidating(url, headers):  # pylint: disable=unused-argument
+    """Answers with a 304 if the request has the ETag of the only version."""
+    if (headers or {}).get("If-None-Match") == '"v1"':
+        return FakeResponse(304)
+    return ubuntu(headers={"ETag": '"v1"'})
+
+
+async def search(fetcher: Fetcher, session: FakeSession, plugin=PLUGIN) -> list:
+    listings = await fetch_listings(fetcher, session, plugin)
+    return [torrent.name for torrent in listings]
+
+
+async def fetch_listings(fetcher: Fetcher, session: FakeSession, plugin=PLUGIN):
+    return await fetcher.search(TimedSession(session), plugin, "ubuntu")
+
+
+def test_info_is_read_only():
+    with pytest.raises(TypeError):
+        PLUGIN.info()["name"] = "changed"
+
+    assert PLUGIN.info()["name"] == "fake"
+    assert PLUGIN.info() is PLUGIN.info()
+    assert pickle.loads(pickle.dumps(PLUGIN)).info() == PLUGIN.info()
+
+
+@pytest.mark.parametrize("failure", [FakeResponse(503), ClientConnectionError()])
+async def test_failed_requests_are_retried(failure):
+    session = FakeSession(answers(failure, ubuntu()))
+
+    assert await search(Fetcher(retries=1, backoff=0), session) == ["ubuntu"]
+    assert len(session.requests) == 2
+
+
+async def test_gives_up_with_the_last_error_status():
+    session = FakeSession(answers(FakeResponse(503), FakeResponse(502)))
+
+    with pytest.raises(PluginResponseError) as error:
+        await search(Fetcher(retries=1, backoff=0), session)
+    assert error.value.status == 502
+
+
+async def test_client_errors_are_not_retried():
+    session = FakeSession(answers(FakeResponse(404), ubuntu()))
+
+    with pytest.raises(PluginResponseError) as error:
+        await search(Fetcher(retries=1, backoff=0), session)
+    assert error.value.status == 404 and len(session.requests) == 1
+
+
+async def test_parse_workers_parse_in_another_process():
+    fetcher = Fetcher(parse_workers=1)
+    try:
+        assert await search(fetcher, FakeSession(answers(ubuntu()))) == ["ubuntu"]
+        assert fetcher.pool is not None
+    finally:
+        fetcher.close()
+
+
+async def test_responses_with_validators_are_kept():
+    fetcher = Fetcher(response_cache_size=10)
+    await search(fetcher, FakeSession(revalidating))
+    await search(fetcher, FakeSession(answers(ubuntu())), FakePlugin("plain"))
+
+    (url,) = fetcher.responses.responses
+    assert url.startswith(PLUGIN.info()["domain"])
+    assert fetcher.responses.get(url).etag == '"v1"'
+
+
+async def test_not_modified_responses_reuse_their_listings():
+    fetcher = Fetcher(response_cache_size=10)
+    session = FakeSession(revalidating)
+    first = await fetch_listings(fetcher, session)
+
+    second = await fetch_listings(fetcher, session)
+
+    assert second[0] is first[0]
+    assert session.requests[1][1]["If-None-Match"] == '"v1"'
+    assert fetcher.responses.not_modified == 1
+
+
+def test_least_recently_used_responses_are_dropped():
+    cache = ResponseCache(2)
+    response = PluginResponse(200, b"[]")
+    for url in ("a", "b"):
+        cache.store(url, response, {"ETag": url})
+    cache.get("a")
+
+    cache.store("c", response, {"ETag": "c"})
+
+    assert list(cache.responses) == ["a", "c"]
+
+
+async def test_validators_are_not_sent_to_other_mirrors():
+    plugin = FakePlugin("mirrored", mirrors=["https://mirror.test"])
+    fetcher = Fetcher(response_cache_size=10)
+    session = FakeSession(revalidating)
+    await search(fetcher, session, plugin)
+
+    mirrors = fetcher.mirrors_of(plugin)
+    mirrors.observe("https://mirrored.test", 1.0)
+    mirrors.observe("https://mirror.test", 0.1)
+    assert await search(fetcher, session, plugin) == ["ubuntu"]
+
+    url, headers = session.requests[1]
+    assert url.startswith("https://mirror.test") and headers is None
+    (cached,) = fetcher.responses.responses.values()
+    assert cached.source == url
+
+
+def test_mirrors_are_ranked_by_moving_average():
+    mirrors = Mirrors([PRIMARY, BACKUP, SPARE])
+    assert mirrors.ranked() == [PRIMARY, BACKUP, SPARE]
+
+    mirrors.observe(PRIMARY, 1.0)
+    mirrors.observe(BACKUP, 0.5)
+    assert mirrors.ranked() == [BACKUP, PRIMARY, SPARE]
+
+    # one fast answer only moves the average part of the way
+    mirrors.observe(PRIMARY, 0.1)
+    assert mirrors.ranked()[0] == BACKUP
+    for _ in range(10):
+        mirrors.observe(PRIMARY, 0.1)
+    assert mirrors.ranked()[0] == PRIMARY
+
+
+def test_failed_mirrors_rank_behind_untried_ones():
+    mirrors = Mirrors([PRIMARY, BACKUP, SPARE])
+    mirrors.observe(BACKUP, 0.5)
+
+    mirrors.failed(PRIMARY)
+    assert mirrors.ranked() == [BACKUP, SPARE, PRIMARY]
+
+    mirrors.observe(PRIMARY, 0.1)
+    assert mirrors.ranked() == [BACKUP, PRIMARY, SPARE]
+
+
+def test_hedge_delay_is_a_percentile_of_recent_latencies():
+    mirrors = Mirrors([PRIMARY, BACKUP], percentile=0.9)
+    for i in range(MIN_SAMPLES - 1):
+        mirrors.observe(PRIMARY, i / 100)
+    assert mirrors.hedge_delay() is None
+
+    mirrors.observe(PRIMARY, (MIN_SAMPLES - 1) / 100)
+    assert mirrors.hedge_delay() == pytest.approx(int(MIN_SAMPLES * 0.9) / 100)
+
+    single = Mirrors([PRIMARY])
+    for _ in range(MIN_SAMPLES):
+        single.observe(PRIMARY, 0.1)
+    assert single.hedge_delay() is None
+
+
+async def test_slow_requests_are_hedged_with_the_next_mirror():
+    plugin = FakePlugin("mirrored", mirrors=[BACKUP])
+    fetcher = Fetcher()
+    for _ in range(MIN_SAMPLES):
+        fetcher.mirrors_of(plugin).observe(PRIMARY, 0.01)
+    responses = []
+
+    def handler(url, headers):  # pylint: disable=unused-argument
+        slow = url.startswith(PRIMARY)
+        resp = FakeResponse(body=names_body(url), delay=1.0 if slow else 0.0)
+        responses.append(resp)
+        return resp
+
+    (name,) = await search(fetcher, FakeSession(handler), plugin)
+
+    assert name.startswith(BACKUP)
+    assert fetcher.hedged == 1 and fetcher.hedges_won == 1
+    await asyncio.sleep(0)  # the losing request is cancelled
+    assert len(responses) == 2 and all(resp.released for resp in responses)
+
+
+async def test_retries_fail_over_to_the_next_mirror():
+    plugin = FakePlugin("mirrored", mirrors=[BACKUP])
+
+    def handler(url, headers):  # pylint: disable=unused-argument
+        if url.startswith(PRIMARY):
+            raise ClientConnectionError()
+        return ubuntu()
+
+    session = FakeSession(handler)
+    fetcher = Fetcher(retries=1, backoff=0)
+
+    assert await search(fetcher, session, plugin) == ["ubuntu"]
+    assert [url.split("/")[2] for url, _ in session.requests] == [
+        "mirrored.test",
+        "backup.test",
+    ]
+    # the next search starts with the mirror that answered
+    await search(fetcher, session, plugin)
+    assert session.requests[2][0].startswith(BACKUP)
@@ -0,0 +1,77 @@
+"""Offline tests for the torrent index, kept in memory"""
+
+import os
+
+import pytest
+
+from cleanbay.torrent import Torrent
+from cleanbay.torrent_index import TorrentIndex
+
+
+def listing(name: str) -> Torrent:
+    link = f"magnet:?xt=urn:btih:{name.encode().hex()}"
+    return Torrent(name, link, 1, 0, "1 MB", "fake", "today")
+
+
+def test_search_matches_every_token():
+    index = TorrentIndex(":memory:")
+    index.add("fake", [listing("ubuntu desktop"), listing("ubuntu server")])
+
+    assert [t.name for t in index.search("desktop ubuntu", ["fake"], 10)] == [
+        "ubuntu desktop"
+    ]
+    assert not index.search("ubuntu", ["other"], 10)
+
+
+def test_seeing_a_listing_again_refreshes_it():
+    index = TorrentIndex(":memory:")
+    index.add("fake", [listing("debian")])
+    index.add("fake", [listing("debian")])
+
+    assert len(index) == 1
+
+
+def test_least_recently_seen_listings_are_pruned():
+    index = TorrentIndex(":memory:", max_size=10)
+    index.add("fake", [listing(f"old{i}") for i in range(6)])
+    index.add("fake", [listing(f"new{i}") for i in range(4)])
+    assert len(index) == 10
+
+    index.add("fake", [listing("old0"), listing("newest")])
+
+    # pruned down to 9: the least recently seen went first, old0 was seen again
+    assert len(index) == 9
+    assert index.search("old0", ["fake"], 10)
+    assert not index.search("old1", ["fake"], 10)
+    assert not index.search("old2", ["fake"], 10)
+    assert index.search("old3", ["fake"], 10)
+    assert index.search("newest", ["fake"], 10)
+
+
+def test_unbounded_index_is_never_pruned():
+    index = TorrentIndex(":memory:")
+    index.add("fake", [listing(f"name{i}") for i in range(50)])
+
+    assert len(index) == 50
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_processes_open_their_own_connection(tmp_path):
+    index = TorrentIndex(str(tmp_path / "index.db"))
+    index.add("fake", [listing("debian")])
+    parent = index.connection
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        index.add("fake", [listing("arch")])
+        opened = index.connection is not parent
+        os.write(write_end, f"{opened} {len(index)}".encode())
+        os._exit(0)  # pylint: disable=protected-access
+    os.close(write_end)
+    with os.fdopen(read_end) as pipe:
+        result = pipe.read()
+    os.waitpid(pid, 0)
+
+    assert result == "True 2"
+    assert index.connection is parent and len(index) == 2
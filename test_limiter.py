@@ -0,0 +1,109 @@
+"""Offline tests for the adaptive per-tracker limiter"""
+
+import asyncio
+from time import monotonic
+
+import pytest
+
+from cleanbay.limiter import AdaptiveLimiter, LimitedSession, LimiterFullError
+
+from conftest import FakePlugin, FakeResponse, FakeSession, names_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_successes_raise_the_limit_additively():
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=5)
+
+    for _ in range(4):
+        await limiter.acquire()
+        limiter.release(monotonic(), 0.1)
+    assert 4.9 < limiter.limit < 5
+
+    for _ in range(10):
+        await limiter.acquire()
+        limiter.release(monotonic(), 0.1)
+    assert limiter.limit == 5
+
+
+async def test_overload_halves_the_limit_once_per_round():
+    limiter = AdaptiveLimiter(initial_limit=8, min_limit=3)
+
+    started = monotonic()
+    for _ in range(3):
+        await limiter.acquire()
+    limiter.release(started, overloaded=True)
+    limiter.release(started, overloaded=True)
+    assert limiter.limit == 4
+
+    # a request sent after the cut cuts it again, down to the minimum
+    limiter.release(monotonic(), latency=limiter.latency_target + 1)
+    assert limiter.limit == 3
+    assert limiter.in_flight == 0
+
+
+async def test_requests_over_the_limit_queue_then_are_turned_away():
+    limiter = AdaptiveLimiter(initial_limit=1, max_queue=1)
+    await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.saturated and not waiter.done()
+    with pytest.raises(LimiterFullError):
+        await limiter.acquire()
+
+    limiter.release(None)
+    await waiter
+    assert limiter.in_flight == 1
+
+
+async def test_the_slot_is_held_until_the_body_is_read():
+    limiter = AdaptiveLimiter(initial_limit=4, latency_target=0.05)
+    session = LimitedSession(
+        FakeSession(lambda url, headers: FakeResponse(delay=0.1)), limiter
+    )
+
+    request = asyncio.create_task(session.get("https://fake.test"))
+    await asyncio.sleep(0.02)
+    assert limiter.in_flight == 1
+
+    resp = await request
+    assert await resp.read() == b"[]"
+    # reading the body took longer than the target
+    assert limiter.in_flight == 0 and limiter.limit == 2
+
+
+async def test_error_statuses_halve_the_limit():
+    limiter = AdaptiveLimiter(initial_limit=4)
+    session = LimitedSession(
+        FakeSession(lambda url, headers: FakeResponse(status=503)), limiter
+    )
+
+    assert (await session.get("https://fake.test")).status == 503
+    assert limiter.limit == 2
+
+
+async def test_busy_trackers_are_served_their_expired_listings(make_backend):
+    # listings that expire straight away
+    busy, idle = FakePlugin("busy", ttl=0), FakePlugin("idle", ttl=0)
+    searched = []
+
+    def handler(url, headers):  # pylint: disable=unused-argument
+        searched.append(url.split("/")[2])
+        return FakeResponse(body=names_body(f"{searched[-1]} {len(searched)}"))
+
+    backend, _ = make_backend(
+        [busy, idle], handler, limiter_options={"initial_limit": 1}
+    )
+    await backend.search("mint", [], [], [], [])
+    # another search holds the busy tracker's only slot
+    backend.limiter(busy).limit = 1
+    await backend.limiter(busy).acquire()
+
+    listings, cache_hit, entry = await backend.search("mint", [], [], [], [])
+
+    assert not cache_hit and entry is None
+    assert searched[2:] == ["idle.test"]
+    assert sorted(t.name for t in listings) == sorted(
+        [f"busy.test {searched.index('busy.test') + 1}", "idle.test 3"]
+    )
@@ -0,0 +1,53 @@
+"""Offline tests for the suggestions index"""
+
+from cleanbay import suggest_index
+from cleanbay.suggest_index import SuggestIndex
+
+
+def test_completions_are_ranked_by_popularity():
+    index = SuggestIndex(100)
+    for term in ["star wars", "star trek", "star wars", "stargate", "dune"]:
+        index.add(term)
+
+    assert index.complete("sta", 2) == ["star wars", "star trek"]
+    assert index.complete("star ", 10) == ["star wars", "star trek"]
+    assert not index.complete("x", 10)
+
+
+def test_terms_added_between_completions_are_merged():
+    index = SuggestIndex(100)
+    index.add("beta")
+    assert index.complete("b", 10) == ["beta"]
+
+    index.add_names([])
+    for term in ["bravo", "alpha", "blue"]:
+        index.add(term)
+
+    assert sorted(index.complete("b", 10)) == ["beta", "blue", "bravo"]
+    assert index.terms == ["alpha", "beta", "blue", "bravo"]
+    assert len(index) == 4
+
+
+def test_memoized_completions_see_new_terms(monkeypatch):
+    monkeypatch.setattr(suggest_index, "MEMO_MIN_MATCHES", 2)
+    index = SuggestIndex(100)
+    index.add("linux mint", 2)
+    index.add("linux lite")
+    assert index.complete("lin", 1) == ["linux mint"]
+    assert "lin" in index.memo
+
+    index.add("linux lite", 5)
+    index.add("other")
+
+    assert index.complete("lin", 1) == ["linux lite"]
+
+
+def test_least_popular_terms_are_trimmed():
+    index = SuggestIndex(10)
+    for i in range(10):
+        index.add(f"term {i}", i + 1)
+    index.add("newest", 0.5)
+
+    assert len(index) == 9
+    assert "newest" not in index.complete("n", 10)
+    assert index.complete("term", 1) == ["term 9"]